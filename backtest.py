@@ -0,0 +1,80 @@
+"""
+Backtest de la regla de cruce de medias (SMA rápida > SMA lenta, filtro opcional de RSI_14)
+sobre grillas de parámetros, con las barras del almacén local del bot (data/raw).
+
+Uso:
+    python backtest.py
+    python backtest.py --rapidas 10 20 50 --lentas 100 200 --rsi-max 70 100 --costo-bps 5
+    python backtest.py --tickers AAPL MSFT BTC-USD --inicio 2022-01-01 --workers 4 --detalle 10
+"""
+import os
+import sys
+import argparse
+
+# Agregar la raíz del proyecto al sys.path para importar el paquete src
+project_root = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(project_root)
+
+from src.backtester import (DEFAULT_FAST, DEFAULT_SLOW, DEFAULT_RSI_MAX, RESULT_COLUMNS, TICKER_COLUMNS,
+                            Backtester, parameter_grid, stored_tickers)
+from src.output_writers import CsvOutputWriter, prepare_export
+
+# Configuración
+DATA_DIR = os.path.join(project_root, "data")
+RESULTS_PATH = os.path.join(DATA_DIR, "backtest_results.csv")
+BY_TICKER_PATH = os.path.join(DATA_DIR, "backtest_by_ticker.csv")
+# Regla que usa el pipeline para Signal_Trend (referencia en el resumen)
+BASELINE = (50, 200, 100)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rapidas', type=int, nargs='+', default=list(DEFAULT_FAST),
+                        help="Ventanas de la SMA rápida")
+    parser.add_argument('--lentas', type=int, nargs='+', default=list(DEFAULT_SLOW),
+                        help="Ventanas de la SMA lenta")
+    parser.add_argument('--rsi-max', type=int, nargs='+', default=list(DEFAULT_RSI_MAX),
+                        help="RSI_14 máximo para estar comprado (100 = sin filtro)")
+    parser.add_argument('--tickers', nargs='+', help="Tickers a evaluar (por defecto todo el almacén local)")
+    parser.add_argument('--inicio', help="Primera fecha del historial (YYYY-MM-DD)")
+    parser.add_argument('--costo-bps', type=float, default=0.0,
+                        help="Costo por cambio de posición en puntos básicos")
+    parser.add_argument('--workers', type=int, help="Procesos del pool (por defecto, un proceso por CPU)")
+    parser.add_argument('--detalle', type=int, default=5,
+                        help="Combinaciones (las mejores) con tabla por ticker")
+    args = parser.parse_args()
+
+    store_root = os.path.join(DATA_DIR, "raw")
+    tickers = [t.upper() for t in args.tickers] if args.tickers else stored_tickers(store_root)
+    if not tickers:
+        print(f"ERROR: No hay barras en {store_root}; ejecuta primero el bot (main_loop.py)")
+        return
+
+    grid = parameter_grid(args.rapidas, args.lentas, args.rsi_max)
+    backtester = Backtester.from_store(store_root, tickers, start=args.inicio, cost_bps=args.costo_bps)
+    if not backtester.tickers:
+        print("ERROR: Ninguno de los tickers pedidos tiene barras en el almacén local")
+        return
+    print(f"BACKTEST: {len(grid)} combinaciones x {len(backtester.tickers)} tickers "
+          f"({backtester.close.shape[1]} barras)")
+
+    results = backtester.run(grid, workers=args.workers)
+    CsvOutputWriter(RESULTS_PATH).write(prepare_export(results, RESULT_COLUMNS))
+    top = [tuple(row) for row in results[['Fast', 'Slow', 'RSI_Max']].head(args.detalle).itertuples(index=False)]
+    if BASELINE in grid and BASELINE not in top:
+        top.append(BASELINE)
+    CsvOutputWriter(BY_TICKER_PATH).write(prepare_export(backtester.by_ticker(top), TICKER_COLUMNS))
+
+    print(results.head(10).to_string(index=False, float_format=lambda v: f"{v:.2f}"))
+    baseline = results[(results['Fast'] == BASELINE[0]) & (results['Slow'] == BASELINE[1])
+                       & (results['RSI_Max'] == BASELINE[2])]
+    if not baseline.empty:
+        row = baseline.iloc[0]
+        print(f"BACKTEST: Regla del pipeline {BASELINE[:2]}: retorno {row['Total_Return_Pct']:.2f}%, "
+              f"drawdown {row['Max_Drawdown_Pct']:.2f}%, aciertos {row['Hit_Rate_Pct']:.1f}% "
+              f"(puesto {baseline.index[0] + 1} de {len(results)})")
+    print(f"ÉXITO: Resultados en {RESULTS_PATH} y {BY_TICKER_PATH}")
+
+
+if __name__ == "__main__":
+    main()
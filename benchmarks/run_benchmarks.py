@@ -0,0 +1,252 @@
+"""
+Suite de benchmarks fuera de línea: pipeline completo y dashboard con datos sintéticos.
+
+Mide tiempo y memoria pico (tracemalloc) por etapa para varios tamaños de universo.
+tracemalloc ralentiza mucho pandas, así que cada tamaño se ejecuta dos veces con los
+mismos datos: una pasada solo cronometrada y otra solo para la memoria. Etapas:
+    fetch, fetch_incremental, compute, consolidate, round, export,
+    dashboard_load, dashboard_filter, dashboard_kpis (cubo precalculado: carga + búsquedas)
+y guarda los resultados en JSON para comparar versiones.
+
+Uso:
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --sizes 6 100 1000 --history-days 730 --gap-ratio 0.02
+    python benchmarks/run_benchmarks.py --indicator-mode vectorized --backend dataset
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/base.json
+"""
+import os
+import sys
+import io
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import datetime
+import tracemalloc
+import subprocess
+import contextlib
+
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from src.market_analytics import MarketAnalytics
+from src.output_writers import prepare_export
+from src.data_index import MarketDataIndex
+from src.kpi_cube import KpiCube
+from src.synthetic_data import SyntheticDataProvider, synthetic_tickers
+from src.vectorized_indicators import compute_indicators_vectorized, frames_to_long
+from dashboard_app import read_market_data
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+STAGES = ['fetch', 'fetch_incremental', 'compute', 'consolidate', 'round', 'export',
+          'dashboard_load', 'dashboard_filter', 'dashboard_kpis']
+
+
+class StageTimer:
+    """Mide tiempo o memoria pico de cada etapa (la salida por consola se silencia)."""
+    def __init__(self, track_memory=True, verbose=False):
+        self.track_memory = track_memory
+        self.verbose = verbose
+        self.results = {}
+
+    def run(self, stage, func, *args):
+        sink = contextlib.nullcontext() if self.verbose else contextlib.redirect_stdout(io.StringIO())
+        if self.track_memory:
+            tracemalloc.start()
+        t0 = time.perf_counter()
+        try:
+            with sink:
+                result = func(*args)
+        finally:
+            seconds = time.perf_counter() - t0
+            peak = 0
+            if self.track_memory:
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+        self.results[stage] = {'seconds': round(seconds, 4), 'peak_mb': round(peak / 2 ** 20, 2)}
+        return result
+
+
+def filter_workload(index, max_tickers=20):
+    """Combinaciones de filtros típicas del dashboard (Todos, por ticker, año, mes y cruces)."""
+    tickers = index.tickers()[:max_tickers]
+    years = index.years()
+    months = index.months()
+    keys = [(None, None, None)]
+    keys += [(t, None, None) for t in tickers]
+    keys += [(None, y, None) for y in years]
+    keys += [(None, None, m) for m in months]
+    keys += [(t, y, None) for t in tickers for y in years]
+    keys += [(tickers[0], years[0], m) for m in months] if tickers and years else []
+    return keys
+
+
+def run_filters(index, keys):
+    rows = 0
+    for key in keys:
+        rows += len(index.select(*key))
+    return rows
+
+
+def run_kpis(cube_path, keys):
+    cube = KpiCube(cube_path)
+    return [cube.kpis(*key) for key in keys]
+
+
+def run_stages(n_tickers, args, track_memory):
+    """Ejecuta todas las etapas para un universo de 'n_tickers' en un directorio temporal."""
+    work_dir = tempfile.mkdtemp(prefix="fdh_bench_")
+    timer = StageTimer(track_memory=track_memory, verbose=args.verbose)
+    try:
+        provider = SyntheticDataProvider(seed=args.seed, gap_ratio=args.gap_ratio,
+                                         missing_ratio=args.missing_ratio)
+        engine = MarketAnalytics(work_dir, provider=provider, history_days=args.history_days,
+                                 indicator_mode=args.indicator_mode, output_backend=args.backend)
+        engine.tickers = synthetic_tickers(n_tickers, crypto_ratio=args.crypto_ratio)
+
+        # 1. Descarga (almacén vacío) y ciclo incremental (almacén ya poblado)
+        data, changed_from = timer.run('fetch', engine.fetch_data)
+        timer.run('fetch_incremental', engine.fetch_data)
+
+        # 2-3. Indicadores y consolidación (misma separación que MarketAnalytics.compute)
+        if args.indicator_mode == "vectorized":
+            long_df = timer.run('consolidate', frames_to_long, data, engine.tickers)
+            final_df = timer.run('compute', compute_indicators_vectorized, long_df)
+        else:
+            all_data = timer.run('compute', engine._compute_per_ticker, data, changed_from)
+            final_df = timer.run('consolidate', pd.concat, all_data)
+
+        # 4-5. Redondeo / selección de columnas y exportación
+        final_df = timer.run('round', prepare_export, final_df)
+        timer.run('export', engine.export, final_df)
+
+        # 6. Dashboard: carga + índice y resolución de filtros
+        index = timer.run('dashboard_load',
+                          lambda: MarketDataIndex(read_market_data(engine.csv_path, engine.dataset_dir)))
+        keys = filter_workload(index)
+        timer.run('dashboard_filter', run_filters, index, keys)
+        timer.run('dashboard_kpis', run_kpis, engine.kpi_cube_path, keys)
+
+        return {
+            'tickers': n_tickers,
+            'rows': int(len(final_df)),
+            'filters': len(keys),
+            'stages': timer.results,
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def bench_size(n_tickers, args):
+    """Tiempos de una pasada sin tracemalloc y memoria pico de una segunda pasada."""
+    result = run_stages(n_tickers, args, track_memory=False)
+    if not args.no_memory:
+        memory = run_stages(n_tickers, args, track_memory=True)
+        for stage, measures in result['stages'].items():
+            measures['peak_mb'] = memory['stages'][stage]['peak_mb']
+    return result
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+def print_results(results):
+    print(f"{'Tickers':>8} {'Filas':>10} " + " ".join(f"{s:>18}" for s in STAGES))
+    for r in results:
+        cells = []
+        for stage in STAGES:
+            m = r['stages'].get(stage)
+            cells.append(f"{m['seconds']:>8.3f}s {m['peak_mb']:>7.1f}MB" if m else f"{'-':>18}")
+        print(f"{r['tickers']:>8} {r['rows']:>10} " + " ".join(cells))
+
+
+def compare(current, baseline_path, threshold):
+    """Compara contra un JSON anterior. Devuelve la lista de regresiones (etapa más lenta que el umbral)."""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    base_by_size = {r['tickers']: r for r in baseline['results']}
+    regressions = []
+    print(f"\nComparación contra {baseline_path} (revisión {baseline['meta'].get('git_revision')}):")
+    for r in current['results']:
+        base = base_by_size.get(r['tickers'])
+        if base is None:
+            continue
+        for stage in STAGES:
+            now, before = r['stages'].get(stage), base['stages'].get(stage)
+            if not now or not before or not before['seconds']:
+                continue
+            ratio = now['seconds'] / before['seconds']
+            flag = ""
+            if ratio > threshold:
+                flag = "  <-- REGRESIÓN"
+                regressions.append((r['tickers'], stage, ratio))
+            print(f"{r['tickers']:>8} {stage:>18}: {before['seconds']:.3f}s -> {now['seconds']:.3f}s "
+                  f"({ratio:.2f}x){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[6, 100, 1000])
+    parser.add_argument('--history-days', type=int, default=730)
+    parser.add_argument('--gap-ratio', type=float, default=0.0)
+    parser.add_argument('--missing-ratio', type=float, default=0.0)
+    parser.add_argument('--crypto-ratio', type=float, default=0.3)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--indicator-mode', choices=['pandas', 'incremental', 'vectorized'], default='pandas')
+    parser.add_argument('--backend', choices=['csv', 'dataset'], default='csv')
+    parser.add_argument('--no-memory', action='store_true', help="Omitir la pasada de memoria (tracemalloc)")
+    parser.add_argument('--output', help="Ruta del JSON de resultados (por defecto benchmarks/results/)")
+    parser.add_argument('--compare', help="JSON anterior contra el cual comparar")
+    parser.add_argument('--threshold', type=float, default=1.2, help="Ratio de tiempo considerado regresión")
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    results = []
+    for n_tickers in args.sizes:
+        print(f"BENCH: {n_tickers} tickers...")
+        results.append(bench_size(n_tickers, args))
+
+    report = {
+        'meta': {
+            'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+            'git_revision': _git_revision(),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'memory_tracked': not args.no_memory,
+            'config': {k: v for k, v in vars(args).items() if k not in ('output', 'compare', 'verbose')},
+        },
+        'results': results,
+    }
+    print_results(results)
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+        output = os.path.join(RESULTS_DIR, f"bench_{stamp}_{report['meta']['git_revision'] or 'local'}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"ÉXITO: Resultados guardados en {output}")
+
+    if args.compare:
+        regressions = compare(report, args.compare, args.threshold)
+        if regressions:
+            print(f"WARN: {len(regressions)} etapa(s) más lentas que {args.threshold:.2f}x la referencia")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,20 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk
 import pandas as pd
 import matplotlib.pyplot as plt
+import matplotlib.dates as mdates
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+import numpy as np
 import os
+import queue
 import datetime
+import threading
+
+from src.output_writers import load_manifest, read_dataset
+from src.schema import read_csv
+from src.data_watcher import MarketDataSource
+from src.virtual_table import VirtualTable
+from src.downsampling import downsample
 
 # --- CONFIGURACIÓN DE ESTILO ---
 COLOR_BG = "#1e1e1e"        # Fondo oscuro
@@ -14,6 +24,64 @@ COLOR_ACCENT = "#007acc"    # Azul corporativo
 COLOR_SUCCESS = "#4caf50"   # Verde
 COLOR_DANGER = "#f44336"    # Rojo
 
+# Actualización automática: cada cuántos segundos se revisa si el bot publicó datos nuevos
+# y cada cuántos milisegundos la UI recoge los resultados del hilo de trabajo
+REFRESH_SECONDS = 10
+POLL_MS = 100
+
+# Columnas del dataset que necesita el dashboard (proyección al leer, con los tipos de src/schema.py)
+DASHBOARD_COLUMNS = ['Date', 'Ticker', 'Close', 'Daily_Return_Pct', 'Volatility_Annualized',
+                     'RSI_14', 'Signal_Trend', 'Signal_Code']
+
+def read_market_data(data_path, dataset_dir):
+    """Lee los datos del dashboard: dataset particionado si existe, si no el CSV maestro"""
+    if load_manifest(dataset_dir) is not None:
+        # Leer solo las columnas que usa el dashboard
+        return read_dataset(dataset_dir, columns=DASHBOARD_COLUMNS)
+    if not os.path.exists(data_path):
+        raise FileNotFoundError(data_path)
+    return read_csv(data_path, DASHBOARD_COLUMNS)
+
+def compute_kpis(df):
+    """KPIs de las filas filtradas (None si no hay filas)"""
+    if df.empty:
+        return None
+    return {
+        # 1. Último Precio
+        'last_price': df['Close'].iloc[-1],
+        # 2. Retorno Promedio
+        'avg_return': df['Daily_Return_Pct'].mean(),
+        # 3. Volatilidad Promedio
+        'avg_vol': df['Volatility_Annualized'].mean(),
+        # 4. Señales de Compra: filas con señal BULLISH (Signal_Code = 1)
+        'bullish_count': int(df['Signal_Code'].sum()),
+    }
+
+def chart_series(df, n_points, cache, filter_key):
+    """
+    Series (ticker, fechas, cierres) del filtro, reducidas con LTTB a 'n_points' por ticker.
+    Las filas vienen ordenadas por ticker/fecha: cada ticker es un rango contiguo.
+    """
+    if df.empty:
+        return []
+    codes = df['Ticker'].cat.codes.to_numpy()
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    stops = np.r_[starts[1:], len(codes)]
+    categories = df['Ticker'].cat.categories
+
+    series = []
+    for start, stop in zip(starts, stops):
+        ticker = categories[codes[start]]
+        key = (filter_key, ticker, n_points)
+        if key not in cache:
+            rows = df.iloc[start:stop]
+            x = mdates.date2num(rows['Date'].to_numpy())
+            y = rows['Close'].to_numpy(dtype=float)
+            valid = np.isfinite(y)
+            cache[key] = downsample(x[valid], y[valid], n_points)
+        series.append((ticker,) + cache[key])
+    return series
+
 class FinancialDashboard(tk.Tk):
     def __init__(self):
         super().__init__()
@@ -21,18 +89,32 @@ class FinancialDashboard(tk.Tk):
         self.geometry("1400x850")
         self.configure(bg=COLOR_BG)
         
-        # Ruta del CSV
+        # Ruta del CSV (y del dataset particionado, si el bot lo genera)
         self.data_path = os.path.join(os.path.dirname(__file__), "data", "financial_market_data.csv")
+        self.dataset_dir = os.path.join(os.path.dirname(__file__), "data", "market_dataset")
+        self.cube_path = os.path.join(os.path.dirname(__file__), "data", "kpi_cube.csv")
         self.df_original = pd.DataFrame()
         self.df_filtered = pd.DataFrame()
+        self.index = None
+        self.filter_key = None
+        
+        # Hilo de trabajo: carga, detección de cambios y filtrado fuera del hilo de Tk.
+        # Las peticiones y resultados viajan por colas; solo el hilo de Tk toca los widgets.
+        self.source = MarketDataSource(self.data_path, self.dataset_dir, DASHBOARD_COLUMNS, self.cube_path)
+        self.requests = queue.Queue()
+        self.results = queue.Queue()
+        self.filter_seq = 0
+        self.worker = threading.Thread(target=self._worker, daemon=True)
         
         # Inicializar UI
         self._setup_styles()
         self._build_sidebar()
         self._build_main_area()
         
-        # Cargar datos iniciales
+        # Cargar datos iniciales (en segundo plano) y empezar a recoger resultados
+        self.worker.start()
         self.load_data()
+        self.after(POLL_MS, self._poll_results)
 
     def _setup_styles(self):
         """Configura el tema oscuro personalizado para TTK"""
@@ -91,6 +173,11 @@ class FinancialDashboard(tk.Tk):
         btn_reset = tk.Button(sidebar, text="🔄 Recargar Datos", bg="#444", fg="white", 
                               relief="flat", padx=10, pady=5, command=self.load_data)
         btn_reset.pack(fill=tk.X, pady=5)
+        
+        # Estado de la carga / última actualización (en lugar de ventanas emergentes)
+        self.status_label = tk.Label(sidebar, text="Cargando datos...", bg=COLOR_PANEL, fg="#aaaaaa",
+                                     font=("Segoe UI", 9), wraplength=210, justify="left")
+        self.status_label.pack(anchor="w", pady=(15, 0))
 
     def _build_main_area(self):
         """Área principal con KPIs y Gráficos"""
@@ -121,28 +208,34 @@ class FinancialDashboard(tk.Tk):
         self.ax = self.figure.add_subplot(111)
         self.ax.set_facecolor(COLOR_BG)
         
+        # Estilizado fijo del gráfico (una sola vez; las líneas se reutilizan entre filtros)
+        self.ax.set_title("Evolución de Precios", color="white", fontsize=12)
+        self.ax.set_xlabel("Fecha", color="white")
+        self.ax.set_ylabel("Precio de Cierre ($)", color="white")
+        self.ax.tick_params(axis='x', colors='white', rotation=45)
+        self.ax.tick_params(axis='y', colors='white')
+        self.ax.grid(True, linestyle='--', alpha=0.3)
+        self.ax.xaxis_date()
+        self.figure.subplots_adjust(left=0.08, right=0.98, top=0.92, bottom=0.2)
+        
         self.canvas = FigureCanvasTkAgg(self.figure, self.tab_charts)
         self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True, pady=10)
+        self.canvas.mpl_connect('resize_event', self._on_chart_resize)
+        
+        # Estado del gráfico: una línea por ticker y leyenda actual
+        # (las series reducidas se calculan y guardan en caché en el hilo de trabajo)
+        self.lines = {}
+        self.legend_tickers = None
+        self.chart_points = 0
         
         # Pestaña 2: Datos Detallados (Tabla)
         self.tab_data = tk.Frame(notebook, bg=COLOR_BG)
         notebook.add(self.tab_data, text="📋 Datos Detallados")
         
-        # Treeview (Tabla)
+        # Tabla virtual: solo las filas visibles existen como widgets (historial completo navegable)
         columns = ("Date", "Ticker", "Close", "Daily_Return_Pct", "RSI_14", "Signal_Trend")
-        self.tree = ttk.Treeview(self.tab_data, columns=columns, show="headings")
-        
-        # Definir encabezados
-        for col in columns:
-            self.tree.heading(col, text=col)
-            self.tree.column(col, width=120, anchor="center")
-            
-        # Scrollbar para la tabla
-        scrollbar = ttk.Scrollbar(self.tab_data, orient=tk.VERTICAL, command=self.tree.yview)
-        self.tree.configure(yscroll=scrollbar.set)
-        
-        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.table = VirtualTable(self.tab_data, columns, bg=COLOR_BG)
+        self.table.pack(fill=tk.BOTH, expand=True)
 
     def _create_kpi_card(self, parent, title, value, color):
         """Crea una tarjeta KPI estilizada"""
@@ -158,134 +251,185 @@ class FinancialDashboard(tk.Tk):
         return lbl_value # Retornamos la etiqueta del valor para actualizarla después
 
     def load_data(self):
-        """Carga datos desde el CSV y actualiza los filtros"""
-        if not os.path.exists(self.data_path):
-            messagebox.showerror("Error", f"No se encontró el archivo: {self.data_path}")
-            return
-            
+        """Recarga completa de los datos en el hilo de trabajo (botón "Recargar Datos")"""
+        self._set_status("Cargando datos...")
+        self.requests.put(('load', None))
+
+    # --- Hilo de trabajo (no toca widgets) ---
+
+    def _worker(self):
+        """Atiende cargas y filtros; si no hay peticiones, revisa cada REFRESH_SECONDS si hay datos nuevos"""
+        index = None
+        cube = None
+        series_cache = {}
+        while True:
+            try:
+                kind, payload = self.requests.get(timeout=REFRESH_SECONDS)
+            except queue.Empty:
+                kind, payload = 'watch', None
+
+            try:
+                if kind in ('load', 'watch'):
+                    if kind == 'watch' and not self.source.changed():
+                        continue
+                    # Recarga manual: lectura completa; cambio detectado: solo las particiones nuevas
+                    new_index, summary = self.source.load(incremental=(kind == 'watch'))
+                    if new_index is index and self.source.cube is cube:
+                        continue
+                    if new_index is not index:
+                        series_cache = {}
+                    index, cube = new_index, self.source.cube
+                    self.results.put(('data', (index, summary)))
+
+                elif kind == 'filter' and index is not None:
+                    seq, filter_key, n_points = payload
+                    if seq != self.filter_seq:
+                        continue  # Ya hay un filtro más reciente en la cola
+                    df = index.select(*filter_key)
+                    # KPIs: búsqueda en el cubo precalculado; sin cubo vigente, sobre las filas
+                    kpis = cube.kpis(*filter_key) if cube is not None else compute_kpis(df)
+                    result = (seq, filter_key, df, kpis,
+                              chart_series(df, n_points, series_cache, filter_key))
+                    self.results.put(('filter', result))
+            except FileNotFoundError:
+                self.results.put(('error', f"No se encontró el archivo: {self.data_path}"))
+            except Exception as e:
+                self.results.put(('error', f"Falló la carga de datos: {e}"))
+
+    # --- Hilo de Tk ---
+
+    def _poll_results(self):
+        """Aplica en la UI los resultados del hilo de trabajo (sin bloquear el bucle de eventos)"""
         try:
-            # Cargar CSV
-            self.df_original = pd.read_csv(self.data_path)
-            
-            # Procesar Fechas
-            self.df_original['Date'] = pd.to_datetime(self.df_original['Date'])
-            self.df_original['Year'] = self.df_original['Date'].dt.year
-            self.df_original['Month'] = self.df_original['Date'].dt.month_name()
-            
-            # Poblar Filtros
-            tickers = sorted(self.df_original['Ticker'].unique().tolist())
-            years = sorted(self.df_original['Year'].unique().tolist(), reverse=True)
-            months = self.df_original['Month'].unique().tolist()
-            
-            self.combo_ticker['values'] = ["Todos"] + tickers
-            self.combo_year['values'] = ["Todos"] + years
-            self.combo_month['values'] = ["Todos"] + months
-            
-            # Valores por defecto
-            self.combo_ticker.current(0)
-            self.combo_year.current(0)
-            self.combo_month.current(0)
-            
-            # Aplicar filtro inicial (mostrar todo)
-            self.apply_filters()
-            messagebox.showinfo("Éxito", "Datos recargados correctamente.")
-            
-        except Exception as e:
-            messagebox.showerror("Error Crítico", f"Falló la carga de datos:\n{str(e)}")
+            while True:
+                kind, payload = self.results.get_nowait()
+                if kind == 'data':
+                    self._on_data(*payload)
+                elif kind == 'filter':
+                    self._on_filtered(*payload)
+                elif kind == 'error':
+                    self._set_status(payload, COLOR_DANGER)
+        except queue.Empty:
+            pass
+        self.after(POLL_MS, self._poll_results)
+
+    def _set_status(self, text, color="#aaaaaa"):
+        self.status_label.config(text=text, fg=color)
+
+    def _on_data(self, index, summary):
+        """Datos nuevos: actualiza los filtros conservando la selección y vuelve a filtrar"""
+        self.index = index
+        self.df_original = index.df
+        
+        # Poblar Filtros ("Todos" por defecto o si el valor elegido ya no existe)
+        for combo, values in ((self.combo_ticker, self.index.tickers()),
+                              (self.combo_year, self.index.years()),
+                              (self.combo_month, self.index.months())):
+            current = combo.get()
+            combo['values'] = ["Todos"] + values
+            if current not in [str(v) for v in values]:
+                combo.current(0)
+        
+        self.apply_filters()
+        now = datetime.datetime.now().strftime('%H:%M:%S')
+        self._set_status(f"Actualizado {now}: {len(self.df_original):,} filas ({summary})", COLOR_SUCCESS)
 
     def apply_filters(self):
-        """Filtra el DataFrame según la selección del usuario"""
-        df = self.df_original.copy()
-        
-        # Obtener valores
+        """Pide al hilo de trabajo las filas del filtro elegido (rangos precalculados, sin copias)"""
+        if self.index is None:
+            return
+
+        # Obtener valores ("Todos" = sin filtro)
         sel_ticker = self.combo_ticker.get()
         sel_year = self.combo_year.get()
         sel_month = self.combo_month.get()
         
-        # Aplicar lógica
-        if sel_ticker != "Todos":
-            df = df[df['Ticker'] == sel_ticker]
-            
-        if sel_year != "Todos":
-            df = df[df['Year'] == int(sel_year)]
-            
-        if sel_month != "Todos":
-            df = df[df['Month'] == sel_month]
-            
+        filter_key = (
+            None if sel_ticker == "Todos" else sel_ticker,
+            None if sel_year == "Todos" else int(sel_year),
+            None if sel_month == "Todos" else sel_month,
+        )
+        self.chart_points = self._chart_points()
+        self.filter_seq += 1
+        self.requests.put(('filter', (self.filter_seq, filter_key, self.chart_points)))
+
+    def _on_filtered(self, seq, filter_key, df, kpis, series):
+        """Aplica el resultado de un filtro (se descartan los que ya fueron reemplazados)"""
+        if seq != self.filter_seq:
+            return
+        self.filter_key = filter_key
         self.df_filtered = df
         
         # Actualizar UI
-        self.update_kpis()
-        self.update_charts()
+        self.update_kpis(kpis)
+        self.update_charts(series)
         self.update_table()
 
-    def update_kpis(self):
-        """Recalcula KPIs basados en la data filtrada"""
-        if self.df_filtered.empty:
+    def update_kpis(self, kpis):
+        """Muestra los KPIs calculados sobre la data filtrada"""
+        if kpis is None:
             return
 
-        # 1. Último Precio (Promedio si hay varios tickers)
-        last_price = self.df_filtered['Close'].iloc[-1]
-        self.card_1.config(text=f"${last_price:,.2f}")
+        self.card_1.config(text=f"${kpis['last_price']:,.2f}")
         
-        # 2. Retorno Promedio
-        avg_return = self.df_filtered['Daily_Return_Pct'].mean()
-        color = COLOR_SUCCESS if avg_return >= 0 else COLOR_DANGER
-        self.card_2.config(text=f"{avg_return:.2f}%", fg=color)
-        
-        # 3. Volatilidad Promedio
-        avg_vol = self.df_filtered['Volatility_Annualized'].mean()
-        self.card_3.config(text=f"{avg_vol:.2f}%", fg=COLOR_DANGER)
+        color = COLOR_SUCCESS if kpis['avg_return'] >= 0 else COLOR_DANGER
+        self.card_2.config(text=f"{kpis['avg_return']:.2f}%", fg=color)
         
-        # 4. Señales de Compra (Conteo)
-        # Contamos cuántas veces aparece "COMPRA" o "BULLISH"
-        bullish_count = self.df_filtered['Signal_Trend'].str.contains('BULLISH', case=False, na=False).sum()
-        self.card_4.config(text=f"{bullish_count}")
-
-    def update_charts(self):
-        """Dibuja el gráfico con Matplotlib"""
-        self.ax.clear()
+        self.card_3.config(text=f"{kpis['avg_vol']:.2f}%", fg=COLOR_DANGER)
         
-        if self.df_filtered.empty:
-            self.canvas.draw()
+        self.card_4.config(text=f"{kpis['bullish_count']}")
+
+    def _chart_points(self):
+        """Puntos por serie: aprox. el ancho en píxeles del área del gráfico"""
+        return max(100, int(self.ax.bbox.width))
+
+    def update_charts(self, series):
+        """Actualiza el gráfico reutilizando las líneas existentes (sin limpiar los ejes)"""
+        visible = []
+
+        for ticker, x, y in series:
+            line = self.lines.get(ticker)
+            if line is None:
+                line, = self.ax.plot(x, y, label=ticker)
+                self.lines[ticker] = line
+            else:
+                line.set_data(x, y)
+                line.set_visible(True)
+            visible.append(ticker)
+
+        for ticker, line in self.lines.items():
+            if ticker not in visible and line.get_visible():
+                line.set_visible(False)
+
+        if visible:
+            self.ax.relim(visible_only=True)
+            self.ax.autoscale_view()
+
+        # La leyenda solo se reconstruye si cambió el conjunto de tickers visibles
+        if visible != self.legend_tickers:
+            legend = self.ax.get_legend()
+            if legend is not None:
+                legend.remove()
+            if visible:
+                self.ax.legend([self.lines[t] for t in visible], visible,
+                               facecolor=COLOR_PANEL, labelcolor="white")
+            self.legend_tickers = visible
+
+        self.canvas.draw_idle()
+
+    def _on_chart_resize(self, event):
+        """Recalcula la reducción solo si el ancho cambió de forma apreciable"""
+        if self.index is None or not self.chart_points:
             return
-            
-        # Agrupar por Ticker para dibujar líneas separadas
-        tickers = self.df_filtered['Ticker'].unique()
-        
-        for ticker in tickers:
-            data = self.df_filtered[self.df_filtered['Ticker'] == ticker]
-            self.ax.plot(data['Date'], data['Close'], label=ticker)
-            
-        # Estilizado del gráfico
-        self.ax.set_title("Evolución de Precios", color="white", fontsize=12)
-        self.ax.set_xlabel("Fecha", color="white")
-        self.ax.set_ylabel("Precio de Cierre ($)", color="white")
-        self.ax.tick_params(axis='x', colors='white', rotation=45)
-        self.ax.tick_params(axis='y', colors='white')
-        self.ax.grid(True, linestyle='--', alpha=0.3)
-        self.ax.legend(facecolor=COLOR_PANEL, labelcolor="white")
-        
-        self.figure.tight_layout()
-        self.canvas.draw()
+        if abs(self._chart_points() - self.chart_points) > 0.1 * self.chart_points:
+            self.apply_filters()
 
     def update_table(self):
-        """Actualiza la tabla Treeview"""
-        # Limpiar tabla
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-            
-        # Insertar nuevas filas (limitado a las últimas 100 para rendimiento)
-        # Ordenamos descendente por fecha
-        df_show = self.df_filtered.sort_values(by='Date', ascending=False).head(200)
-        
-        for _, row in df_show.iterrows():
-            # Formatear fecha
-            date_str = row['Date'].strftime('%Y-%m-%d')
-            vals = (date_str, row['Ticker'], f"{row['Close']:.2f}", 
-                    f"{row['Daily_Return_Pct']:.2f}%", f"{row['RSI_14']:.1f}", 
-                    row['Signal_Trend'])
-            self.tree.insert("", "end", values=vals)
+        """Actualiza la tabla virtual (por defecto, fechas más recientes primero)"""
+        if self.table.sort_column is None:
+            self.table.set_data(self.df_filtered, sort_by='Date', descending=True)
+        else:
+            self.table.set_data(self.df_filtered)
 
 if __name__ == "__main__":
     app = FinancialDashboard()
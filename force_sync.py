@@ -1,49 +1,44 @@
 import os
 import sys
-from git import Repo
 
-# Agregar ruta correcta al sys.path para importar desde src
+# Agregar la raíz del proyecto al sys.path para importar el paquete src
 project_root = os.path.dirname(os.path.abspath(__file__))
-sys.path.append(os.path.join(project_root, 'src'))
+sys.path.append(project_root)
 
-from market_analytics import MarketAnalytics
+from src.market_analytics import MarketAnalytics
+from src.git_publisher import GitPublisher
+from src.metrics import METRICS
+from src.provider_cache import print_cache_stats
 
 # Configuración
 DATA_DIR = os.path.join(project_root, "data")
 
 def force_sync():
     print("=== INICIANDO LIMPIEZA Y CARGA FORZADA (INTENTO 2) ===")
+    # Mismo historial de métricas que el bot (ciclos 'run_analysis' y 'publicacion')
+    state_dir = os.path.join(DATA_DIR, "state")
+    METRICS.configure(history_path=os.path.join(state_dir, "metrics.json"),
+                      profile_dir=os.path.join(state_dir, "profiles"),
+                      profile_trigger=os.path.join(state_dir, "PROFILE_NEXT_CYCLE"))
     
-    # 1. Generar los datos
+    # 1. Generar los datos (las descargas pasan por la caché compartida con el bot, data/cache)
     engine = MarketAnalytics(DATA_DIR)
     success = engine.run_analysis()
+    print_cache_stats(engine.provider)
     
     if not success:
         print("Error al generar los datos.")
         return
 
-    # 2. Operaciones Git
-    try:
-        repo = Repo(project_root)
-        print("GIT: Agregando archivos...")
-        repo.git.add(all=True)
-        
-        # Verificar si hay cambios antes de hacer commit
-        if repo.is_dirty() or repo.untracked_files:
-            print("GIT: Creando commit...")
-            repo.index.commit("FORCE RESET: Datos Financieros Maestros")
-            
-            print("GIT: Empujando a GitHub (Push)...")
-            origin = repo.remote(name='origin')
-            origin.push()
-            print("=== ÉXITO: GITHUB ACTUALIZADO ===")
-        else:
-            print("GIT: Nada nuevo que subir. Asegurando push...")
-            origin = repo.remote(name='origin')
-            origin.push()
-
-    except Exception as e:
-        print(f"Error en Git: {e}")
+    # 2. Operaciones Git: solo los archivos de salida; push siempre (aunque no haya commit nuevo)
+    publisher = GitPublisher(
+        project_root,
+        engine.output_paths(),
+        state_path=os.path.join(DATA_DIR, "state", "publish_state.json"),
+        commit_message="FORCE RESET: Datos Financieros Maestros",
+    )
+    if publisher.publish(force=True):
+        print("=== ÉXITO: GITHUB ACTUALIZADO ===")
 
 if __name__ == "__main__":
-    force_sync()
\ No newline at end of file
+    force_sync()
@@ -1,6 +1,5 @@
-import time
 import os
-import sys
+import asyncio
 
 # FIX: Configurar ruta de Git explícitamente para GitPython en Windows
 # Esto debe hacerse ANTES de importar git
@@ -24,69 +23,189 @@ if os.name == 'nt': # Solo para Windows
                 os.environ['GIT_PYTHON_GIT_EXECUTABLE'] = path
                 break
 
-from git import Repo
 from src.market_analytics import MarketAnalytics
+from src.data_providers import YahooFinanceProvider
+from src.provider_cache import CachedProvider, print_cache_stats
+from src.scheduler import AssetClassSchedule, MarketHours, PipelineScheduler
+from src.git_publisher import GitPublisher
+from src.metrics import METRICS
+from src.query_service import QueryService
 
 # CONFIGURACIÓN
 GITHUB_REPO_URL = "https://github.com/JUANCITOPENA/FinanceDataHub.git" 
 INTERVALO_MINUTOS = 5
 PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(PROJECT_DIR, "data")
+# "incremental": indicadores con estado por ticker (checkpoint en data/state)
+# "vectorized": todos los tickers en una pasada 2-D; "pandas": recálculo completo por ticker
+INDICATOR_MODE = "incremental"
+# Indicadores adicionales a exportar (se calculan con el grafo de src/indicator_registry.py):
+# "EMA_12", "EMA_26", "MACD", "MACD_Signal", "MACD_Hist", "Bollinger_Upper", "Bollinger_Lower", "ATR_14"
+INDICADORES_EXTRA = []
+# Modo intradía: barras de "1m" o "5m" en buffers circulares por ticker con agregados
+# incrementales en timeframes superiores (None = solo barras diarias)
+# Salida: data/intraday_market_data.csv; historia desalojada en data/intraday/<timeframe>/
+INTRADAY_INTERVALO = None
+INTRADAY_TIMEFRAMES = ["15m", "1h", "1d", "1w"]
+INTRADAY_HORIZONTE_BARRAS = 2016   # 7 días de barras de 5 minutos (24/7) en memoria por ticker
+INTRADAY_BARRAS_AGREGADAS = 500    # barras en memoria por ticker y timeframe superior
+# "csv": CSV maestro completo; "dataset": particiones por ticker/año + CSV de compatibilidad
+OUTPUT_BACKEND = "csv"
+# Archivo de universo (un ticker por línea). Si se define, el ciclo se ejecuta por shards en paralelo.
+# Ejemplo: UNIVERSE_FILE = os.path.join(PROJECT_DIR, "universe.txt")
+UNIVERSE_FILE = None
+# Análisis entre activos: ventana (barras diarias) de covarianza/correlación móvil (None = desactivado),
+# pares con correlación móvil exportada y carteras {nombre: {ticker: peso}} (None = pesos iguales)
+# Salidas: data/cross_asset_correlation.csv, data/cross_asset_rolling_correlation.csv, data/portfolio_risk.csv
+CROSS_ASSET_VENTANA = 60
+CORRELACION_PARES = [("BTC-USD", "NVDA"), ("AAPL", "MSFT"), ("BTC-USD", "ETH-USD")]
+CARTERAS = {"Equiponderado": None, "Cripto": {"BTC-USD": 0.6, "ETH-USD": 0.4}}
+CROSS_ASSET_MAX_ACTIVOS = 500
 
-def git_push_changes():
-    try:
-        repo = Repo(PROJECT_DIR)
-        
-        # Intentar Pull primero para evitar conflictos al hacer Push
+# Cadencia por grupo de activos: cripto 24/7, acciones solo en horario de mercado (NYSE)
+CRYPTO_TICKERS = ["BTC-USD", "ETH-USD"]
+INTERVALO_CRIPTO_MINUTOS = INTERVALO_MINUTOS
+INTERVALO_ACCIONES_MINUTOS = INTERVALO_MINUTOS
+
+# Publicación: un push cada N ciclos con cambios, o antes si pasa la latencia máxima
+PUBLICAR_CADA_CICLOS = 1
+LATENCIA_MAXIMA_PUBLICACION_MIN = 15
+
+# Caché de descargas compartida con force_sync.py (data/cache): tamaño máximo y TTL en segundos
+# por intervalo. TTL corto si el rango incluye la barra de hoy, largo si solo hay barras cerradas.
+# Ejemplo: CACHE_TTL_BARRA_ABIERTA = {"1d": 240, "5m": 120}
+CACHE_MAX_MB = 512
+CACHE_TTL_BARRA_ABIERTA = {}
+CACHE_TTL_BARRAS_CERRADAS = {}
+
+# Métricas: endpoint Prometheus local (None = desactivado) e historial JSON de los últimos ciclos
+# Para perfilar el siguiente ciclo con cProfile sin reiniciar: crear data/state/PROFILE_NEXT_CYCLE
+# (o abrir http://127.0.0.1:9108/profile); el perfil queda en data/state/profiles/
+METRICS_PORT = 9108
+METRICS_HISTORIAL_CICLOS = 288
+
+# Servicio local de consultas de solo lectura sobre los últimos datos (None = desactivado)
+# Ej: http://127.0.0.1:9110/query?ticker=AAPL&start=2024-01-01&columns=Date,Close&format=json
+# Responde 304 si el cliente envía If-None-Match con el ETag de una respuesta que no cambió
+CONSULTAS_PORT = 9110
+CONSULTAS_SONDEO_SEGUNDOS = 10
+
+def build_publisher(engine):
+    """Publicador git: solo confirma cuando cambia el contenido y agrupa ciclos por push."""
+    return GitPublisher(
+        PROJECT_DIR,
+        engine.output_paths(),
+        state_path=os.path.join(DATA_DIR, "state", "publish_state.json"),
+        batch_cycles=PUBLICAR_CADA_CICLOS,
+        max_latency_seconds=LATENCIA_MAXIMA_PUBLICACION_MIN * 60,
+    )
+
+def build_provider():
+    """Yahoo Finance detrás de la caché en disco compartida por todos los procesos."""
+    return CachedProvider(
+        YahooFinanceProvider(),
+        os.path.join(DATA_DIR, "cache"),
+        max_bytes=CACHE_MAX_MB * 2 ** 20,
+        ttl_open=CACHE_TTL_BARRA_ABIERTA,
+        ttl_closed=CACHE_TTL_BARRAS_CERRADAS,
+    )
+
+def configure_metrics():
+    """Historial de métricas, presupuesto por ciclo (intervalo) y disparador de cProfile."""
+    state_dir = os.path.join(DATA_DIR, "state")
+    METRICS.configure(
+        history_path=os.path.join(state_dir, "metrics.json"),
+        history_size=METRICS_HISTORIAL_CICLOS,
+        budget_seconds=INTERVALO_MINUTOS * 60,
+        profile_dir=os.path.join(state_dir, "profiles"),
+        profile_trigger=os.path.join(state_dir, "PROFILE_NEXT_CYCLE"),
+    )
+    if METRICS_PORT:
         try:
-            print("GIT: Sincronizando cambios remotos...")
-            repo.git.pull()
-        except Exception as e:
-            print(f"GIT WARN: No se pudo hacer pull (posiblemente no hay upstream o conflicto): {e}")
-
-        # Verificar si hay cambios reales
-        if not repo.is_dirty(untracked_files=True):
-            print("GIT: No hay cambios nuevos en los datos.")
-            return
-
-        print("GIT: Detectados nuevos datos. Sincronizando...")
-        
-        # Git Add
-        repo.git.add(all=True)
-        
-        # Git Commit
-        timestamp = time.strftime('%Y-%m-%d %H:%M:%S')
-        repo.index.commit(f"Auto-Update: Financial Analytics {timestamp}")
-        
-        # Git Push
-        origin = repo.remote(name='origin')
-        origin.push()
-        print(f"GIT: Push completado exitosamente a las {timestamp}")
-            
-    except Exception as e:
-        print(f"ERROR GIT: {e}")
+            METRICS.start_server(METRICS_PORT)
+        except OSError as e:
+            print(f"WARN: No se pudo iniciar el servidor de métricas en el puerto {METRICS_PORT}: {e}")
+
+def start_query_service(engine):
+    """Servicio HTTP de consultas sobre el dataset publicado (None si está desactivado o falla)."""
+    if not CONSULTAS_PORT:
+        return None
+    service = QueryService(engine.csv_path, engine.dataset_dir, poll_seconds=CONSULTAS_SONDEO_SEGUNDOS,
+                           events_path=engine.signal_events_path)
+    try:
+        service.start(CONSULTAS_PORT)
+    except OSError as e:
+        print(f"WARN: No se pudo iniciar el servicio de consultas en el puerto {CONSULTAS_PORT}: {e}")
+        return None
+    return service
+
+def build_compute(engine, service):
+    """Etapa de cálculo; al terminar un ciclo con datos nuevos avisa al servicio de consultas."""
+    if service is None:
+        return engine.compute_stage
+
+    def compute(payload):
+        success = engine.compute_stage(payload)
+        if success:
+            service.notify()
+        return success
+    return compute
+
+def build_schedules(tickers):
+    """Agrupa los tickers por clase de activo con su cadencia y horario."""
+    if UNIVERSE_FILE:
+        # Universo grande: un solo grupo (el pipeline por shards procesa todo el universo)
+        return [AssetClassSchedule("universo", tickers, INTERVALO_MINUTOS)]
+
+    crypto = [t for t in tickers if t in CRYPTO_TICKERS]
+    equities = [t for t in tickers if t not in CRYPTO_TICKERS]
+    schedules = []
+    if crypto:
+        schedules.append(AssetClassSchedule("cripto", crypto, INTERVALO_CRIPTO_MINUTOS))
+    if equities:
+        schedules.append(AssetClassSchedule("acciones", equities, INTERVALO_ACCIONES_MINUTOS,
+                                            market_hours=MarketHours()))
+    return schedules
 
 def main():
     print("=== SISTEMA DE INTELIGENCIA FINANCIERA (AUTO-BOT) ===")
-    print(f"Monitor: {MarketAnalytics(DATA_DIR).tickers}")
-    print(f"Frecuencia: {INTERVALO_MINUTOS} minutos")
-    
+    configure_metrics()
+
     # Inicializar motor
-    engine = MarketAnalytics(DATA_DIR)
-    
-    while True:
-        print(f"\n[{time.strftime('%H:%M:%S')}] Iniciando escaneo de mercado...")
-        
-        # 1. Ejecutar Análisis Financiero
-        success = engine.run_analysis()
-        
-        # 2. Subir a la nube si todo salió bien
-        if success:
-            git_push_changes()
-        
-        # 3. Esperar
-        print(f"Sistema en espera... Próxima actualización en {INTERVALO_MINUTOS} min.")
-        time.sleep(INTERVALO_MINUTOS * 60)
+    engine = MarketAnalytics(DATA_DIR, provider=build_provider(), indicator_mode=INDICATOR_MODE, output_backend=OUTPUT_BACKEND,
+                             universe_file=UNIVERSE_FILE, extra_indicators=INDICADORES_EXTRA,
+                             intraday_interval=INTRADAY_INTERVALO, intraday_timeframes=INTRADAY_TIMEFRAMES,
+                             intraday_horizon_bars=INTRADAY_HORIZONTE_BARRAS,
+                             intraday_aggregate_bars=INTRADAY_BARRAS_AGREGADAS,
+                             cross_asset_window=CROSS_ASSET_VENTANA, correlation_pairs=CORRELACION_PARES,
+                             portfolios=CARTERAS, cross_asset_max_assets=CROSS_ASSET_MAX_ACTIVOS)
+
+    monitor = engine.tickers if len(engine.tickers) <= 20 else f"{len(engine.tickers)} tickers ({UNIVERSE_FILE})"
+    print(f"Monitor: {monitor}")
+
+    schedules = build_schedules(engine.tickers)
+    for schedule in schedules:
+        horario = "24/7" if schedule.market_hours is None else "horario de mercado"
+        print(f"Frecuencia [{schedule.name}]: {schedule.interval // 60} minutos ({horario})")
+
+    # Etapas encadenadas: descarga -> cálculo -> publicación (git), con cadencia fija
+    publisher = build_publisher(engine)
+    service = start_query_service(engine)
+    scheduler = PipelineScheduler(
+        schedules,
+        fetch=engine.fetch_stage,
+        compute=build_compute(engine, service),
+        publish=publisher.publish,
+    )
+    try:
+        asyncio.run(scheduler.run())
+    except KeyboardInterrupt:
+        print("Bot detenido por el usuario.")
+    finally:
+        # Guardar en disco las barras intradía que solo estaban en memoria
+        if engine.intraday is not None:
+            engine.intraday.flush()
+        print_cache_stats(engine.provider)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,238 @@
+import os
+import time
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .indicator_registry import REGISTRY
+from .metrics import METRICS
+from .ohlcv_store import OHLCVStore
+from .vectorized_indicators import frames_to_long, group_layout, rolling_sums, to_matrix, window_mean
+
+# Grilla por defecto: ventanas rápida/lenta de las medias y RSI máximo para estar comprado
+# (100 = sin filtro de RSI). La regla del pipeline (Signal_Trend) es (50, 200, 100).
+DEFAULT_FAST = (5, 10, 20, 30, 50, 75, 100)
+DEFAULT_SLOW = (50, 100, 150, 200, 250)
+DEFAULT_RSI_MAX = (60, 70, 80, 100)
+PERIODS_PER_YEAR = 252
+
+RESULT_COLUMNS = ['Fast', 'Slow', 'RSI_Max', 'Ticker_Count', 'Total_Return_Pct', 'Median_Return_Pct',
+                  'Annualized_Return_Pct', 'Max_Drawdown_Pct', 'Hit_Rate_Pct', 'Trades', 'Exposure_Pct']
+TICKER_COLUMNS = ['Fast', 'Slow', 'RSI_Max', 'Ticker', 'Total_Return_Pct', 'Annualized_Return_Pct',
+                  'Max_Drawdown_Pct', 'Hit_Rate_Pct', 'Trades', 'Exposure_Pct', 'Buy_Hold_Return_Pct']
+
+
+def parameter_grid(fast=DEFAULT_FAST, slow=DEFAULT_SLOW, rsi_max=DEFAULT_RSI_MAX):
+    """Combinaciones (rápida, lenta, RSI máximo) válidas: la media rápida debe ser más corta."""
+    return [(f, s, r) for f, s, r in itertools.product(sorted(set(fast)), sorted(set(slow)), sorted(set(rsi_max)))
+            if f < s]
+
+
+def load_history(store_root, tickers, start=None):
+    """
+    Cierres del almacén local (data/raw) como matriz ticker x barra (cada fila alineada a la
+    izquierda, rellena con NaN) más el RSI_14 del grafo de indicadores. Devuelve
+    (tickers, cierres, rsi); los tickers sin barras se omiten.
+    """
+    store = OHLCVStore(store_root)
+    frames = {}
+    for ticker in tickers:
+        df = store.load(ticker, start=start)
+        if not df.empty:
+            frames[ticker] = df
+    if not frames:
+        return [], np.zeros((0, 0)), np.zeros((0, 0))
+    long_df = frames_to_long(frames, [t for t in tickers if t in frames])
+    rows, pos, shape = group_layout(long_df['Ticker'].cat.codes.to_numpy())
+    close = to_matrix(long_df['Close'].to_numpy(dtype=float), rows, pos, shape)
+    rsi = REGISTRY.compute({'Close': close}, ['RSI_14'])['RSI_14']
+    return list(long_df['Ticker'].cat.categories), close, rsi
+
+
+def stored_tickers(store_root, interval="1d"):
+    """Tickers con barras en el almacén local (un CSV por ticker)."""
+    base_dir = os.path.join(store_root, interval)
+    if not os.path.isdir(base_dir):
+        return []
+    return sorted(os.path.splitext(name)[0] for name in os.listdir(base_dir) if name.endswith('.csv'))
+
+
+class BacktestData:
+    """
+    Datos compartidos por todas las combinaciones: retornos logarítmicos y sumas acumuladas
+    de los cierres (rolling_sums), de las que sale la media móvil de cualquier ventana en O(n)
+    sin recorrer la serie de nuevo. Las medias ya calculadas se guardan por ventana.
+    """
+    def __init__(self, close, rsi, cost_bps=0.0):
+        self.rsi = rsi
+        self.valid = ~np.isnan(close)
+        log_close = np.log(np.where(close > 0, close, np.nan))
+        returns = np.full(close.shape, np.nan)
+        returns[:, 1:] = log_close[:, 1:] - log_close[:, :-1]
+        self.returns = np.nan_to_num(returns)
+        self.bars = np.maximum(np.isfinite(returns).sum(axis=1), 1)
+        # Filas alineadas a la izquierda: cada ticker termina en su propia última barra válida,
+        # que se trata igual que la última columna (sin entradas nuevas ni costo de salida)
+        self.last_bar = np.zeros(close.shape, dtype=bool)
+        self.last_bar[:, :-1] = self.valid[:, :-1] & ~self.valid[:, 1:]
+        self.last_bar[:, -1] = self.valid[:, -1]
+        self.cost = cost_bps / 1e4
+        self._sums = rolling_sums(close)
+        self._means = {}
+
+    def sma(self, window):
+        if window not in self._means:
+            self._means[window] = window_mean(self._sums, window)
+        return self._means[window]
+
+    def evaluate(self, fast, slow, rsi_max):
+        """
+        Métricas por ticker de una combinación. Posición (comprado/fuera) decidida con el cierre
+        de cada barra y aplicada al retorno de la barra siguiente (sin mirar el futuro).
+        """
+        with np.errstate(invalid='ignore'):
+            position = self.sma(fast) > self.sma(slow)
+            if rsi_max < 100:
+                position &= self.rsi <= rsi_max
+        position &= self.valid
+        held = position[:, :-1] & self.valid[:, 1:]
+        strategy = np.zeros(self.returns.shape)
+        strategy[:, 1:] = np.where(held, self.returns[:, 1:], 0.0)
+
+        # Operaciones: cada entrada abre una; costos por cada cambio de posición
+        previous = np.zeros(position.shape, dtype=bool)
+        previous[:, 1:] = position[:, :-1]
+        entries = position & ~previous & ~self.last_bar  # en la última barra todavía no tiene retorno
+        if self.cost:
+            # Sin costo por el relleno tras la última barra de un ticker (no es una salida) ni por
+            # una señal en esa última barra (no abre operación)
+            changes = (position != previous) & self.valid & ~(self.last_bar & position & ~previous)
+            strategy -= changes * self.cost
+
+        equity = np.cumsum(strategy, axis=1)
+        peak = np.maximum.accumulate(np.maximum(equity, 0.0), axis=1)
+        total = equity[:, -1]
+
+        # Retorno neto de cada operación = equity a la salida - equity a la entrada - costo de
+        # entrada. Entradas y salidas alternan dentro de cada fila: en orden fila-mayor se
+        # emparejan 1 a 1 (una operación abierta al final se cierra en la última barra)
+        exits = previous & ~position & self.valid
+        exits |= position & previous & self.last_bar
+        entry_rows, entry_cols = np.nonzero(entries)
+        exit_rows, exit_cols = np.nonzero(exits)
+        trade_returns = (equity[exit_rows, exit_cols] - equity[entry_rows, entry_cols]) - self.cost
+        trades_per_ticker = np.bincount(entry_rows, minlength=len(total))
+        hits = np.bincount(entry_rows, weights=trade_returns > 0, minlength=len(total))
+
+        return {
+            'total': np.expm1(total) * 100,
+            'annualized': np.expm1(total * PERIODS_PER_YEAR / self.bars) * 100,
+            'drawdown': np.expm1((equity - peak).min(axis=1)) * 100,
+            'trades': trades_per_ticker,
+            'hits': hits,
+            'exposure': held.sum(axis=1) / self.bars * 100,
+        }
+
+    def buy_and_hold(self):
+        return np.expm1(self.returns.sum(axis=1)) * 100
+
+
+# Datos del proceso de trabajo del pool (se cargan una vez por proceso, no por combinación)
+_WORKER_DATA = None
+
+
+def _init_worker(close, rsi, cost_bps):
+    global _WORKER_DATA
+    _WORKER_DATA = BacktestData(close, rsi, cost_bps)
+
+
+def summarize(combo, metrics):
+    """Fila de la tabla por combinación: promedios entre tickers y aciertos sobre todas las operaciones."""
+    trades = int(metrics['trades'].sum())
+    return {
+        'Fast': combo[0], 'Slow': combo[1], 'RSI_Max': combo[2],
+        'Ticker_Count': len(metrics['total']),
+        'Total_Return_Pct': float(np.mean(metrics['total'])),
+        'Median_Return_Pct': float(np.median(metrics['total'])),
+        'Annualized_Return_Pct': float(np.mean(metrics['annualized'])),
+        'Max_Drawdown_Pct': float(np.mean(metrics['drawdown'])),
+        'Hit_Rate_Pct': metrics['hits'].sum() / trades * 100 if trades else np.nan,
+        'Trades': trades,
+        'Exposure_Pct': float(np.mean(metrics['exposure'])),
+    }
+
+
+def _evaluate_chunk(combos):
+    """Trabajo del pool: evalúa un bloque de combinaciones. Devuelve (filas, segundos)."""
+    t0 = time.perf_counter()
+    rows = [summarize(combo, _WORKER_DATA.evaluate(*combo)) for combo in combos]
+    return rows, time.perf_counter() - t0
+
+
+class Backtester:
+    """
+    Backtest vectorizado de la regla de cruce de medias (SMA rápida > SMA lenta, con filtro
+    opcional de RSI_14 máximo) sobre grillas de parámetros y todos los tickers a la vez.
+
+    - Todas las ventanas salen de las mismas sumas acumuladas (una resta por barra y ticker).
+    - Cada combinación se evalúa sobre la matriz completa ticker x barra: retornos, drawdown
+      máximo, operaciones y aciertos sin bucles por ticker ni por barra.
+    - La grilla se divide en bloques que se reparten en un pool de procesos; cada proceso
+      recibe los datos una sola vez (inicializador) y agrupa las combinaciones con las mismas
+      ventanas para reutilizar sus medias.
+    """
+    def __init__(self, tickers, close, rsi, cost_bps=0.0):
+        self.tickers = list(tickers)
+        self.close = close
+        self.rsi = rsi
+        self.cost_bps = cost_bps
+
+    @classmethod
+    def from_store(cls, store_root, tickers, start=None, cost_bps=0.0):
+        with METRICS.timer('backtest_load'):
+            tickers, close, rsi = load_history(store_root, tickers, start)
+        return cls(tickers, close, rsi, cost_bps)
+
+    def run(self, grid, workers=None, chunk_size=None):
+        """Tabla por combinación (RESULT_COLUMNS), ordenada por retorno total promedio."""
+        grid = sorted(grid)  # mismas ventanas juntas dentro de cada bloque
+        if not grid or not self.tickers:
+            return pd.DataFrame(columns=RESULT_COLUMNS)
+        workers = workers or os.cpu_count() or 1
+        chunk_size = chunk_size or max(1, -(-len(grid) // (workers * 4)))
+        chunks = [grid[i:i + chunk_size] for i in range(0, len(grid), chunk_size)]
+
+        rows = []
+        with METRICS.timer('backtest', combos=len(grid)):
+            if workers == 1 or len(chunks) == 1:
+                _init_worker(self.close, self.rsi, self.cost_bps)
+                for chunk in chunks:
+                    rows += _evaluate_chunk(chunk)[0]
+            else:
+                with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                         initargs=(self.close, self.rsi, self.cost_bps)) as pool:
+                    for chunk_rows, _ in pool.map(_evaluate_chunk, chunks):
+                        rows += chunk_rows
+        results = pd.DataFrame(rows, columns=RESULT_COLUMNS)
+        return results.sort_values('Total_Return_Pct', ascending=False, kind='stable').reset_index(drop=True)
+
+    def by_ticker(self, combos):
+        """Tabla por ticker (TICKER_COLUMNS) de algunas combinaciones (ej: las mejores)."""
+        data = BacktestData(self.close, self.rsi, self.cost_bps)
+        buy_hold = data.buy_and_hold()
+        frames = []
+        for fast, slow, rsi_max in combos:
+            m = data.evaluate(fast, slow, rsi_max)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                hit_rate = np.where(m['trades'] > 0, m['hits'] / m['trades'] * 100, np.nan)
+            frames.append(pd.DataFrame({
+                'Fast': fast, 'Slow': slow, 'RSI_Max': rsi_max, 'Ticker': self.tickers,
+                'Total_Return_Pct': m['total'], 'Annualized_Return_Pct': m['annualized'],
+                'Max_Drawdown_Pct': m['drawdown'], 'Hit_Rate_Pct': hit_rate,
+                'Trades': m['trades'], 'Exposure_Pct': m['exposure'], 'Buy_Hold_Return_Pct': buy_hold,
+            }))
+        if not frames:
+            return pd.DataFrame(columns=TICKER_COLUMNS)
+        return pd.concat(frames, ignore_index=True)[TICKER_COLUMNS]
@@ -0,0 +1,311 @@
+import numpy as np
+import pandas as pd
+
+# Barras por año para anualizar según el calendario común
+PERIODS_BUSINESS = 252
+PERIODS_24_7 = 365
+
+
+def reference_calendar(prices):
+    """
+    Calendario común de 'prices' (fechas x tickers). Si hay activos que no operan en fin de
+    semana (acciones) es la unión de sus fechas: las barras de fin de semana de cripto quedan
+    fuera, pero su movimiento entra en el retorno del lunes (cierre del viernes -> lunes).
+    Si todos operan 24/7 es la unión de todas las fechas. Devuelve (fechas, barras por año).
+    """
+    has_bar = prices.notna()
+    weekend = prices.index.dayofweek >= 5
+    trades_weekend = has_bar.loc[weekend].any(axis=0).to_numpy()
+    business = prices.columns[~trades_weekend]
+    if len(business) == 0:
+        return prices.index[has_bar.any(axis=1).to_numpy()], PERIODS_24_7
+    return prices.index[has_bar[business].any(axis=1).to_numpy()], PERIODS_BUSINESS
+
+
+def aligned_log_returns(prices, calendar):
+    """
+    Retornos logarítmicos en el calendario común. Un activo sin barra en una fecha del
+    calendario (feriado de su mercado) queda como faltante ese día y su retorno siguiente
+    abarca todo el hueco: no se rellena con 0, que subestimaría la varianza.
+    """
+    log_prices = np.log(prices.reindex(calendar).where(lambda p: p > 0))
+    return log_prices - log_prices.ffill().shift(1)
+
+
+class RollingCovariance:
+    """
+    Sumas móviles de una ventana de retornos con datos faltantes, como matrices N x N:
+
+        count[i, j]    = sum(m_i * m_j)          observaciones comunes
+        sums[i, j]     = sum(x_i * m_j)          suma de x_i en las fechas comunes con j
+        products[i, j] = sum(x_i * x_j)
+        squares[i, j]  = sum(x_i^2 * m_j)
+
+    (x con 0 donde falta el dato, m = 1 si hay dato). Agregar o quitar una barra es una
+    actualización de rango 1 de las cuatro matrices (O(N^2), un producto de matrices), sin
+    recorrer la ventana ni los pares uno por uno. La covarianza y la correlación de cada par
+    usan solo las fechas en que ambos activos tienen dato (pairwise complete).
+    """
+    def __init__(self, n_assets):
+        shape = (n_assets, n_assets)
+        self.count = np.zeros(shape)
+        self.sums = np.zeros(shape)
+        self.products = np.zeros(shape)
+        self.squares = np.zeros(shape)
+
+    def update(self, x, m, signs):
+        """Agrega (+1) o quita (-1) las filas de 'x'/'m' (k x N) de la ventana."""
+        xs = x * signs[:, None]
+        self.count += (m * signs[:, None]).T @ m
+        self.sums += xs.T @ m
+        self.products += xs.T @ x
+        self.squares += (xs * x).T @ m
+
+    def _stats(self, rows, cols):
+        """Cantidad, covarianza y varianzas (de i y de j) en las fechas comunes de cada par."""
+        count = self.count[rows, cols]
+        sums_i = self.sums[rows, cols]
+        sums_j = self.sums[cols, rows]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cov = (self.products[rows, cols] - sums_i * sums_j / count) / (count - 1)
+            var_i = (self.squares[rows, cols] - sums_i * sums_i / count) / (count - 1)
+            var_j = (self.squares[cols, rows] - sums_j * sums_j / count) / (count - 1)
+        return count, cov, var_i, var_j
+
+    def pairs(self, rows, cols, min_periods):
+        """Correlación de los pares (rows[k], cols[k]) (NaN con menos de 'min_periods' datos comunes)."""
+        count, cov, var_i, var_j = self._stats(rows, cols)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = np.clip(cov / np.sqrt(var_i * var_j), -1.0, 1.0)
+        corr[count < min_periods] = np.nan
+        return corr
+
+    def _block(self, assets):
+        """Submatrices (count, sums, products, squares) de 'assets' (None = todas, sin copiar)."""
+        if assets is None:
+            return self.count, self.sums, self.products, self.squares
+        index = np.ix_(assets, assets)
+        return self.count[index], self.sums[index], self.products[index], self.squares[index]
+
+    def covariance(self, min_periods, assets=None):
+        """Matriz de covarianza (NaN con menos de 'min_periods' datos comunes)."""
+        count, sums, products, _ = self._block(assets)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cov = (products - sums * sums.T / count) / (count - 1)
+        cov[count < min_periods] = np.nan
+        return cov
+
+    def matrices(self, min_periods):
+        """(observaciones, covarianza, correlación) N x N de la ventana actual."""
+        count, sums, products, squares = self._block(None)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cov = (products - sums * sums.T / count) / (count - 1)
+            var_i = (squares - sums * sums / count) / (count - 1)
+            corr = np.clip(cov / np.sqrt(var_i * var_i.T), -1.0, 1.0)
+        few = count < min_periods
+        cov[few] = np.nan
+        corr[few] = np.nan
+        return count.copy(), cov, corr
+
+
+class CrossAssetEngine:
+    """
+    Matrices móviles de covarianza/correlación entre activos y volatilidad de carteras.
+
+    - Los cierres de todos los tickers se guardan en un panel fecha x ticker; update_prices()
+      reemplaza solo los tickers recibidos (ciclos por grupo de activos o por shards).
+    - Los retornos se alinean a un calendario común (ver reference_calendar): acciones y cripto
+      se comparan sobre los mismos intervalos.
+    - run() avanza la ventana barra a barra con RollingCovariance (O(N^2) por barra, nunca por
+      par). Si solo cambiaron las últimas barras (barra del día abierta, barras nuevas) se
+      deshacen esos pasos y se vuelven a aplicar; si cambia el conjunto de tickers, el inicio
+      de la historia o una barra antigua se recalcula todo. Cada 'resync_steps' pasos también,
+      para no acumular error de redondeo.
+    - Volatilidad de cada cartera en cada fecha: sqrt(w' S w) anualizada, con S la covarianza
+      de la ventana. Los activos sin historia suficiente en la ventana se excluyen y los pesos
+      del resto se renormalizan.
+    """
+    def __init__(self, window=60, min_periods=None, portfolios=None, pairs=(), max_assets=500,
+                 resync_steps=5000):
+        self.window = window
+        self.min_periods = max(2, min_periods or window // 2)
+        # {nombre: {ticker: peso}}; None = pesos iguales entre todos los tickers
+        self.portfolios = dict(portfolios) if portfolios is not None else {"Equiponderado": None}
+        self.pairs = [tuple(pair) for pair in pairs]
+        self.max_assets = max_assets
+        self.resync_steps = resync_steps
+        self.prices = pd.DataFrame(dtype=np.float64)
+        self.tickers = []
+        self.dates = pd.DatetimeIndex([])
+        self.periods = PERIODS_BUSINESS
+        self.x = None
+        self.m = None
+        self.acc = None
+        self.pair_index = ([], [], [])
+        self.weights = {}
+        self.pair_corr = None
+        self.portfolio_vol = None
+        self.steps_since_sync = 0
+
+    # --- Panel de precios ---
+
+    def update_prices(self, df):
+        """Incorpora los cierres (Date, Ticker, Close) de los tickers de 'df' (historia completa de cada uno)."""
+        if df is None or df.empty:
+            return
+        closes = pd.DataFrame({'Date': pd.to_datetime(df['Date']).to_numpy(),
+                               'Ticker': df['Ticker'].astype(str).to_numpy(),
+                               'Close': df['Close'].to_numpy(dtype=np.float64)})
+        wide = closes.pivot(index='Date', columns='Ticker', values='Close')
+        kept = self.prices.drop(columns=[t for t in wide.columns if t in self.prices.columns])
+        prices = kept.join(wide, how='outer') if len(kept.columns) else wide
+        prices = prices.dropna(how='all')
+        self.prices = prices.sort_index().reindex(columns=sorted(prices.columns))
+
+    # --- Cálculo ---
+
+    def _configure(self, tickers):
+        """Índices de los pares pedidos y pesos de cada cartera para el conjunto de tickers."""
+        position = {ticker: i for i, ticker in enumerate(tickers)}
+        pairs = [(a, b) for a, b in self.pairs if a in position and b in position]
+        self.pair_index = (pairs, np.array([position[a] for a, _ in pairs], dtype=np.int64),
+                           np.array([position[b] for _, b in pairs], dtype=np.int64))
+        self.weights = {}
+        for name, weights in self.portfolios.items():
+            w = np.zeros(len(tickers))
+            if weights is None:
+                w[:] = 1.0
+            else:
+                for ticker, weight in weights.items():
+                    if ticker in position:
+                        w[position[ticker]] = weight
+            if w.any():
+                self.weights[name] = w
+
+    def _first_change(self, tickers, dates, x, m):
+        """Primer paso que cambió respecto del último cálculo (0 = todo; None = sin cambios)."""
+        if self.x is None or tickers != self.tickers:
+            return 0
+        common = min(len(dates), len(self.dates))
+        same = ((self.dates[:common] == dates[:common]) &
+                (self.m[:common] == m[:common]).all(axis=1) &
+                (self.x[:common] == x[:common]).all(axis=1))
+        first = common if same.all() else int(np.argmin(same))
+        if first == common and len(dates) == len(self.dates):
+            return None
+        return first
+
+    def _step(self, t, x, m, sign):
+        """Aplica (+1) o deshace (-1) el paso t: entra la barra t y sale la barra t - window."""
+        rows = [t]
+        signs = [sign]
+        if t - self.window >= 0:
+            rows.append(t - self.window)
+            signs.append(-sign)
+        self.acc.update(x[rows], m[rows], np.array(signs, dtype=np.float64))
+
+    def _record(self, t):
+        """Guarda la correlación de los pares pedidos y la volatilidad de cada cartera en el paso t."""
+        pairs, rows, cols = self.pair_index
+        if pairs:
+            self.pair_corr[t] = self.acc.pairs(rows, cols, self.min_periods)
+        if not self.weights:
+            return
+        ready = np.diag(self.acc.count) >= self.min_periods
+        for k, w in enumerate(self.weights.values()):
+            held = ready & (w != 0)
+            if not held.any():
+                continue
+            assets = None if held.all() else np.flatnonzero(held)
+            weights = w[held] / w[held].sum()
+            cov = self.acc.covariance(self.min_periods, assets)
+            variance = weights @ np.nan_to_num(cov, copy=False) @ weights
+            self.portfolio_vol[t, k] = np.sqrt(max(variance, 0.0) * self.periods) * 100
+
+    def run(self):
+        """
+        Procesa las barras nuevas o modificadas del panel. Devuelve la cantidad de pasos
+        calculados (0 si no hubo cambios, None si no hay suficientes activos o hay demasiados).
+        """
+        n_assets = len(self.prices.columns)
+        if n_assets < 2:
+            return None
+        if n_assets > self.max_assets:
+            print(f"WARN: Análisis entre activos omitido: {n_assets} tickers (máximo {self.max_assets})")
+            return None
+
+        calendar, periods = reference_calendar(self.prices)
+        returns = aligned_log_returns(self.prices, calendar)
+        values = returns.to_numpy()
+        m = np.isfinite(values).astype(np.float64)
+        x = np.where(m > 0, values, 0.0)
+        tickers = list(returns.columns)
+        dates = returns.index
+
+        start = self._first_change(tickers, dates, x, m)
+        if start is None:
+            return 0
+        undo = len(self.dates) - start
+        full = (start == 0 or periods != self.periods or undo > len(dates) // 2 or
+                self.steps_since_sync + undo + len(dates) - start > self.resync_steps)
+
+        if full:
+            start = 0
+            self.acc = RollingCovariance(len(tickers))
+            self.steps_since_sync = 0
+            self._configure(tickers)
+        else:
+            # Deshacer los pasos que cambiaron (con las barras anteriores) antes de reaplicarlos
+            for t in range(len(self.dates) - 1, start - 1, -1):
+                self._step(t, self.x, self.m, -1.0)
+            self.steps_since_sync += undo
+
+        pair_corr = np.full((len(dates), len(self.pair_index[0])), np.nan)
+        portfolio_vol = np.full((len(dates), len(self.weights)), np.nan)
+        if not full:
+            pair_corr[:start] = self.pair_corr[:start]
+            portfolio_vol[:start] = self.portfolio_vol[:start]
+        self.pair_corr, self.portfolio_vol = pair_corr, portfolio_vol
+        self.tickers, self.dates, self.periods, self.x, self.m = tickers, dates, periods, x, m
+
+        for t in range(start, len(dates)):
+            self._step(t, x, m, 1.0)
+            self._record(t)
+        self.steps_since_sync += len(dates) - start
+        return len(dates) - start
+
+    # --- Resultados ---
+
+    def correlation_frame(self):
+        """Matriz de la última ventana en formato largo (todos los pares ordenados, con la diagonal)."""
+        count, cov, corr = self.acc.matrices(self.min_periods)
+        n = len(self.tickers)
+        tickers = np.array(self.tickers, dtype=object)
+        return pd.DataFrame({
+            'Date': self.dates[-1],
+            'Ticker': np.repeat(tickers, n),
+            'Ticker_B': np.tile(tickers, n),
+            'Correlation': corr.ravel(),
+            # Covarianza anualizada en %^2 (mismas unidades que Volatility_Annualized al cuadrado)
+            'Covariance_Annualized': cov.ravel() * self.periods * 1e4,
+            'Observations': count.ravel().round().astype(np.int64),
+        })
+
+    def pairs_frame(self):
+        """Correlación móvil de los pares pedidos (Date, Ticker, Ticker_B, Correlation)."""
+        pairs = self.pair_index[0]
+        frames = [pd.DataFrame({'Date': self.dates, 'Ticker': a, 'Ticker_B': b,
+                                'Correlation': self.pair_corr[:, k]})
+                  for k, (a, b) in enumerate(pairs)]
+        if not frames:
+            return pd.DataFrame(columns=['Date', 'Ticker', 'Ticker_B', 'Correlation'])
+        return pd.concat(frames, ignore_index=True).dropna(subset=['Correlation'])
+
+    def portfolio_frame(self):
+        """Volatilidad anualizada (%) de cada cartera por fecha (Date, Portfolio, Volatility_Annualized)."""
+        frames = [pd.DataFrame({'Date': self.dates, 'Portfolio': name,
+                                'Volatility_Annualized': self.portfolio_vol[:, k]})
+                  for k, name in enumerate(self.weights)]
+        if not frames:
+            return pd.DataFrame(columns=['Date', 'Portfolio', 'Volatility_Annualized'])
+        return pd.concat(frames, ignore_index=True).dropna(subset=['Volatility_Annualized'])
@@ -0,0 +1,143 @@
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Nombres de mes tal como los muestra el dashboard (dt.month_name())
+MONTH_NAMES = ['January', 'February', 'March', 'April', 'May', 'June', 'July',
+               'August', 'September', 'October', 'November', 'December']
+
+
+class MarketDataIndex:
+    """
+    Índice en memoria para filtrar el dataset por ticker / año / mes sin copiar ni escanear
+    la tabla completa.
+
+    Las filas se ordenan una sola vez por (ticker, fecha); así cada combinación
+    (ticker, año, mes) es un rango contiguo de filas ("run"). Los filtros se resuelven
+    sobre la lista de runs (decenas de miles como máximo, no millones de filas):
+    - un solo rango contiguo  -> slice iloc (sin copia)
+    - varios rangos           -> take() solo de las filas resultantes
+    Los resultados recientes se guardan en un LRU pequeño.
+    """
+    def __init__(self, df, cache_size=32):
+        df = df.copy()
+        df['Date'] = pd.to_datetime(df['Date'])
+        df['Ticker'] = df['Ticker'].astype('category')
+        df['Ticker'] = df['Ticker'].cat.reorder_categories(sorted(df['Ticker'].cat.categories))
+        df['Year'] = df['Date'].dt.year.astype(np.int16)
+        df['Month'] = df['Date'].dt.month.astype(np.int8)
+        self.df = df.sort_values(['Ticker', 'Date'], kind='stable').reset_index(drop=True)
+
+        self._build_runs()
+        self._cache = OrderedDict()
+        self.cache_size = cache_size
+
+    def _build_runs(self):
+        codes = self.df['Ticker'].cat.codes.to_numpy()
+        years = self.df['Year'].to_numpy()
+        months = self.df['Month'].to_numpy()
+        n = len(self.df)
+
+        if n:
+            is_start = np.r_[True, (codes[1:] != codes[:-1]) | (years[1:] != years[:-1]) |
+                             (months[1:] != months[:-1])]
+            starts = np.flatnonzero(is_start)
+        else:
+            starts = np.zeros(0, dtype=np.int64)
+        stops = np.r_[starts[1:], n].astype(np.int64)
+
+        categories = self.df['Ticker'].cat.categories
+        self.runs = pd.DataFrame({
+            'ticker': categories[codes[starts]] if n else [],
+            'year': years[starts] if n else [],
+            'month': months[starts] if n else [],
+            'start': starts,
+            'stop': stops,
+        })
+
+        # Grupos precalculados: para cada patrón de filtro, clave -> índices de runs
+        self._groups = {}
+        for fields in (('ticker',), ('year',), ('month',), ('ticker', 'year'),
+                       ('ticker', 'month'), ('year', 'month'), ('ticker', 'year', 'month')):
+            grouped = self.runs.groupby(list(fields), sort=False, observed=True).indices
+            self._groups[fields] = {k if isinstance(k, tuple) else (k,): v for k, v in grouped.items()}
+
+    def replace_partitions(self, new_rows, keys):
+        """
+        Nuevo índice con las filas de las particiones 'keys' ("TICKER/AÑO") reemplazadas por
+        'new_rows' (o eliminadas si no vienen). Las filas descartadas se ubican por los runs,
+        sin escanear la tabla; el índice actual no se modifica (lo puede estar usando la UI).
+        """
+        replaced = {(key.rsplit('/', 1)[0], int(key.rsplit('/', 1)[1])) for key in keys}
+        keep = np.ones(len(self.df), dtype=bool)
+        for ticker, year, start, stop in self.runs[['ticker', 'year', 'start', 'stop']].itertuples(index=False):
+            if (ticker, int(year)) in replaced:
+                keep[start:stop] = False
+
+        kept = self.df.loc[keep, [c for c in self.df.columns if c not in ('Year', 'Month')]]
+        if new_rows is not None and len(new_rows):
+            kept['Ticker'] = kept['Ticker'].astype(str)
+            kept = pd.concat([kept, new_rows[[c for c in kept.columns if c in new_rows.columns]]],
+                             ignore_index=True)
+        return MarketDataIndex(kept, cache_size=self.cache_size)
+
+    # --- Valores para los filtros ---
+
+    def tickers(self):
+        return list(self.df['Ticker'].cat.categories)
+
+    def years(self):
+        return sorted(self.runs['year'].unique().tolist(), reverse=True)
+
+    def months(self):
+        return [MONTH_NAMES[m - 1] for m in sorted(self.runs['month'].unique().tolist())]
+
+    # --- Selección ---
+
+    def _ranges(self, ticker, year, month):
+        fields = tuple(name for name, value in (('ticker', ticker), ('year', year), ('month', month))
+                       if value is not None)
+        if not fields:
+            return [(0, len(self.df))]
+        key = tuple(value for value in (ticker, year, month) if value is not None)
+        run_ids = self._groups[fields].get(key)
+        if run_ids is None:
+            return []
+
+        # Fusionar runs adyacentes en rangos contiguos
+        starts = self.runs['start'].to_numpy()[run_ids]
+        stops = self.runs['stop'].to_numpy()[run_ids]
+        ranges = []
+        for start, stop in zip(starts, stops):
+            if ranges and ranges[-1][1] == start:
+                ranges[-1] = (ranges[-1][0], stop)
+            else:
+                ranges.append((start, stop))
+        return ranges
+
+    def select(self, ticker=None, year=None, month=None):
+        """
+        Devuelve las filas del filtro (None = "Todos"). 'month' puede ser número (1-12)
+        o nombre de mes. El resultado no debe modificarse (puede ser una vista compartida).
+        """
+        if isinstance(month, str):
+            month = MONTH_NAMES.index(month) + 1
+        key = (ticker, year, month)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        ranges = self._ranges(ticker, year, month)
+        if not ranges:
+            result = self.df.iloc[0:0]
+        elif len(ranges) == 1:
+            result = self.df.iloc[ranges[0][0]:ranges[0][1]]
+        else:
+            rows = np.concatenate([np.arange(start, stop) for start, stop in ranges])
+            result = self.df.take(rows)
+
+        self._cache[key] = result
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return result
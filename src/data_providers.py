@@ -0,0 +1,114 @@
+import os
+import pandas as pd
+import yfinance as yf
+
+# Columnas OHLCV estándar que todo proveedor debe devolver
+OHLCV_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+
+def normalize_ohlcv(df):
+    """
+    Normaliza un DataFrame OHLCV: índice de fechas sin zona horaria llamado 'Date',
+    solo columnas OHLCV, ordenado y sin fechas duplicadas.
+    """
+    if df is None or df.empty:
+        return pd.DataFrame(columns=OHLCV_COLUMNS, index=pd.DatetimeIndex([], name='Date'))
+
+    df = df[[c for c in OHLCV_COLUMNS if c in df.columns]].copy()
+    index = pd.to_datetime(df.index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    df.index = index
+    df.index.name = 'Date'
+    df = df[~df.index.duplicated(keep='last')].sort_index()
+    return df
+
+
+class MarketDataProvider:
+    """
+    Interfaz base para las fuentes de datos de mercado.
+    Cualquier proveedor (Yahoo Finance, archivos locales, otra API) debe implementar fetch().
+    """
+    name = "base"
+
+    def fetch(self, tickers, start, end=None, interval="1d"):
+        """
+        Descarga barras OHLCV desde 'start' (inclusive) hasta 'end' (exclusivo, None = hoy).
+        Devuelve un dict {ticker: DataFrame} con el formato de normalize_ohlcv().
+        Los tickers sin datos simplemente no aparecen en el resultado.
+        """
+        raise NotImplementedError
+
+
+class YahooFinanceProvider(MarketDataProvider):
+    """Proveedor en línea basado en yfinance (fuente por defecto del bot)."""
+    name = "yahoo"
+
+    def __init__(self, threads=True):
+        self.threads = threads
+
+    def fetch(self, tickers, start, end=None, interval="1d"):
+        tickers = list(tickers)
+        if not tickers:
+            return {}
+
+        data = yf.download(
+            tickers,
+            start=start,
+            end=end,
+            interval=interval,
+            group_by='ticker',
+            auto_adjust=True,
+            progress=False,
+            threads=self.threads
+        )
+
+        if data is None or data.empty:
+            return {}
+
+        frames = {}
+        for ticker in tickers:
+            # Si solo hay 1 ticker, la estructura puede no tener nivel superior de columnas
+            if isinstance(data.columns, pd.MultiIndex):
+                if ticker not in data.columns.levels[0]:
+                    continue
+                df = data[ticker]
+            else:
+                df = data
+
+            df = normalize_ohlcv(df.dropna(how='all'))
+            if not df.empty:
+                frames[ticker] = df
+        return frames
+
+
+class FileDataProvider(MarketDataProvider):
+    """
+    Proveedor fuera de línea que lee un CSV por ticker desde un directorio de fixtures
+    (ej: fixtures/AAPL.csv con columnas Date, Open, High, Low, Close, Volume).
+    Permite probar el pipeline completo sin conexión a internet.
+    """
+    name = "file"
+
+    def __init__(self, fixture_dir):
+        self.fixture_dir = fixture_dir
+
+    def _path(self, ticker):
+        return os.path.join(self.fixture_dir, f"{ticker}.csv")
+
+    def fetch(self, tickers, start, end=None, interval="1d"):
+        frames = {}
+        for ticker in tickers:
+            path = self._path(ticker)
+            if not os.path.exists(path):
+                continue
+
+            df = pd.read_csv(path, index_col='Date', parse_dates=['Date'])
+            df = normalize_ohlcv(df)
+            if start is not None:
+                df = df[df.index >= pd.Timestamp(start)]
+            if end is not None:
+                df = df[df.index < pd.Timestamp(end)]
+            if not df.empty:
+                frames[ticker] = df
+        return frames
@@ -0,0 +1,108 @@
+import os
+
+import pandas as pd
+
+from .data_index import MarketDataIndex
+from .kpi_cube import KpiCube
+from .output_writers import MANIFEST_NAME, load_manifest, read_dataset, read_partition
+from .schema import RUN_TIMESTAMP_KEY, cast_columns, load_metadata, metadata_path, read_csv
+
+
+class MarketDataSource:
+    """
+    Origen de datos del dashboard con detección de cambios.
+
+    - changed() solo hace un stat() del manifiesto (dataset particionado) o del CSV maestro:
+      se puede llamar cada pocos segundos sin costo.
+    - load() con el dataset particionado compara los hashes del manifiesto con los de la
+      última carga y lee solo las particiones nuevas o modificadas (normalmente el año en
+      curso de los tickers que actualizó el bot); el resto del índice se reutiliza.
+    - El CSV maestro se reescribe completo en cada ciclo del bot, así que en ese caso se
+      relee entero, solo con las columnas necesarias y con los tipos del esquema.
+    - Con 'cube_path' también se carga el cubo de KPIs (self.cube) si corresponde a la misma
+      ejecución del bot que los datos; si está desfasado queda en None (KPIs sobre las filas).
+
+    No toca la interfaz: está pensado para ejecutarse en un hilo de trabajo.
+    """
+    def __init__(self, data_path, dataset_dir, columns=None, cube_path=None):
+        self.data_path = data_path
+        self.dataset_dir = dataset_dir
+        self.columns = list(columns) if columns else None
+        self.manifest_path = os.path.join(dataset_dir, MANIFEST_NAME)
+        self.cube_path = cube_path
+        self.index = None
+        self.cube = None
+        # Firma (origen, mtime, tamaño) y hashes de particiones de la última carga
+        self.loaded_signature = None
+        self.partitions = None
+
+    def signature(self):
+        # El cubo se escribe después de los datos: su fecha de modificación también cuenta
+        cube = None
+        if self.cube_path:
+            try:
+                cube = os.stat(metadata_path(self.cube_path)).st_mtime_ns
+            except FileNotFoundError:
+                pass
+        for kind, path in (('dataset', self.manifest_path), ('csv', self.data_path)):
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            return kind, st.st_mtime_ns, st.st_size, cube
+        return None
+
+    def changed(self):
+        """True si el bot publicó datos nuevos desde la última carga."""
+        return self.signature() != self.loaded_signature
+
+    def _read_csv(self):
+        # Tipos explícitos del esquema (sin inferencia) y solo las columnas necesarias
+        return read_csv(self.data_path, self.columns)
+
+    def load(self, incremental=True):
+        """
+        Carga los datos y devuelve (índice, resumen). Con incremental=True y un índice previo
+        del dataset particionado solo se leen las particiones que cambiaron.
+        """
+        signature = self.signature()
+        if signature is None:
+            raise FileNotFoundError(self.data_path)
+
+        if signature[0] == 'dataset':
+            manifest = load_manifest(self.dataset_dir)
+            entries = manifest.get('partitions', {})
+            hashes = {key: entry['hash'] for key, entry in entries.items()}
+            if incremental and self.index is not None and self.partitions is not None:
+                changed = [key for key, digest in hashes.items() if self.partitions.get(key) != digest]
+                removed = [key for key in self.partitions if key not in hashes]
+                if changed or removed:
+                    parts = [read_partition(self.dataset_dir, entries[key], self.columns, typed=False)
+                             for key in changed]
+                    new_rows = cast_columns(pd.concat(parts, ignore_index=True)) if parts else None
+                    self.index = self.index.replace_partitions(new_rows, changed + removed)
+                summary = f"{len(changed)} particiones nuevas o modificadas, {len(removed)} retiradas"
+            else:
+                self.index = MarketDataIndex(read_dataset(self.dataset_dir, columns=self.columns))
+                summary = f"{len(hashes)} particiones"
+            self.partitions = hashes
+            metadata = manifest
+        else:
+            self.index = MarketDataIndex(self._read_csv())
+            self.partitions = None
+            summary = "CSV maestro"
+            metadata = load_metadata(self.data_path) or {}
+
+        # Marca de la ejecución del bot (metadato del dataset, ya no es una columna)
+        if metadata.get(RUN_TIMESTAMP_KEY):
+            summary += f"; bot: {metadata[RUN_TIMESTAMP_KEY]}"
+
+        self.cube = None
+        if self.cube_path and os.path.exists(self.cube_path):
+            cube = KpiCube(self.cube_path)
+            if cube.timestamp is not None and cube.timestamp == metadata.get(RUN_TIMESTAMP_KEY):
+                self.cube = cube
+                summary += "; KPIs del cubo"
+
+        self.loaded_signature = signature
+        return self.index, summary
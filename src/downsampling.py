@@ -0,0 +1,49 @@
+import numpy as np
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets: elige 'n_out' puntos de la serie (x, y) que conservan
+    su forma visual (picos, valles y tendencias) y devuelve sus índices.
+
+    El primer y el último punto se conservan siempre; el resto de la serie se reparte en
+    n_out - 2 cubetas y de cada una se elige el punto que forma el triángulo de mayor área
+    con el punto elegido en la cubeta anterior y el promedio de la cubeta siguiente.
+    'x' debe ser creciente y los valores finitos (sin NaN).
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # Límites de las cubetas intermedias (entre el primer y el último punto)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+
+    # Promedios de todas las cubetas de una vez (sumas acumuladas); el "siguiente" de la
+    # última cubeta es el último punto de la serie
+    csum_x = np.r_[0.0, np.cumsum(x)]
+    csum_y = np.r_[0.0, np.cumsum(y)]
+    counts = edges[1:] - edges[:-1]
+    avg_x = np.r_[(csum_x[edges[1:]] - csum_x[edges[:-1]]) / counts, x[-1]]
+    avg_y = np.r_[(csum_y[edges[1:]] - csum_y[edges[:-1]]) / counts, y[-1]]
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        ax, ay = x[a], y[a]
+        cx, cy = avg_x[i + 1], avg_y[i + 1]
+        # Área (duplicada) del triángulo a-b-c para cada candidato b de la cubeta
+        area = np.abs((ax - cx) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (cy - ay))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def downsample(x, y, n_out):
+    """Devuelve (x, y) reducidos a como máximo 'n_out' puntos con LTTB."""
+    idx = lttb_indices(x, y, n_out)
+    return np.asarray(x)[idx], np.asarray(y)[idx]
@@ -0,0 +1,193 @@
+import os
+import json
+import time
+import hashlib
+
+from git import Repo, GitCommandError, PushInfo
+
+from .metrics import METRICS
+from .output_writers import VOLATILE_COLUMNS, content_hash, load_manifest
+from .schema import RUN_TIMESTAMP_KEY, read_csv
+
+
+class GitPublisher:
+    """
+    Publicador de datos a GitHub consciente del contenido.
+
+    - Calcula un hash del payload publicado (CSV sin columnas volátiles como 'Last_Updated',
+      hashes de particiones del manifiesto, metadatos sin la marca de la ejecución, bytes de
+      otros archivos) y solo hace commit
+      cuando el contenido realmente cambió.
+    - Solo agrega (git add) los archivos de salida, nunca todo el árbol.
+    - Permite agrupar varios ciclos en un único push ('batch_cycles') con una latencia
+      máxima ('max_latency_seconds') desde el primer cambio pendiente.
+    - No hace pull en cada ciclo: solo si el push es rechazado (pull --rebase y reintento).
+    """
+    def __init__(self, repo_path, output_paths, state_path, batch_cycles=1,
+                 max_latency_seconds=0, remote_name='origin',
+                 commit_message="Auto-Update: Financial Analytics"):
+        self.repo_path = repo_path
+        self.output_paths = list(output_paths)
+        self.state_path = state_path
+        self.batch_cycles = max(1, batch_cycles)
+        self.max_latency_seconds = max_latency_seconds
+        self.remote_name = remote_name
+        self.commit_message = commit_message
+        self.state = self._load_state()
+
+    # --- Estado persistente (último hash publicado y cambios pendientes) ---
+
+    def _load_state(self):
+        if os.path.exists(self.state_path):
+            try:
+                with open(self.state_path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except Exception as e:
+                print(f"GIT WARN: Estado de publicación ilegible ({e}); se reinicia.")
+        return {'published_hash': None, 'pending_cycles': 0, 'first_pending_at': None}
+
+    def _save_state(self):
+        os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    # --- Hash del contenido ---
+
+    def _hash_path(self, path):
+        if os.path.isdir(path):
+            manifest = load_manifest(path)
+            if manifest is None:
+                return "empty"
+            parts = sorted(f"{k}:{v['hash']}" for k, v in manifest.get('partitions', {}).items())
+            return hashlib.sha1("\n".join(parts).encode('utf-8')).hexdigest()
+        if not os.path.exists(path):
+            return "missing"
+        if path.endswith('.csv'):
+            return content_hash(read_csv(path), exclude=VOLATILE_COLUMNS)
+        if path.endswith('.json'):
+            with open(path, 'r', encoding='utf-8') as f:
+                metadata = json.load(f)
+            metadata.pop(RUN_TIMESTAMP_KEY, None)
+            return hashlib.sha1(json.dumps(metadata, sort_keys=True).encode('utf-8')).hexdigest()
+        with open(path, 'rb') as f:
+            return hashlib.sha1(f.read()).hexdigest()
+
+    def payload_hash(self):
+        """Hash combinado de todas las salidas publicadas (sin metadatos volátiles)."""
+        digest = hashlib.sha1()
+        for path in self.output_paths:
+            digest.update(os.path.relpath(path, self.repo_path).encode('utf-8'))
+            digest.update(self._hash_path(path).encode('utf-8'))
+        return digest.hexdigest()
+
+    # --- Publicación ---
+
+    def publish(self, force=False):
+        """
+        Llamar al final de cada ciclo. Registra si hubo cambios de contenido y hace
+        commit + push cuando se completa el lote o vence la latencia máxima.
+        Devuelve True si se hizo push.
+        """
+        cycle = METRICS.start_cycle("publicacion")
+        try:
+            with METRICS.activate(cycle), METRICS.profile("git"):
+                return self._publish(force)
+        finally:
+            METRICS.finish_cycle(cycle)
+
+    def _publish(self, force):
+        with METRICS.timer('git', op='hash'):
+            current = self.payload_hash()
+        if current != self.state.get('published_hash') and current != self.state.get('pending_hash'):
+            self.state['pending_hash'] = current
+            self.state['pending_cycles'] = self.state.get('pending_cycles', 0) + 1
+            if not self.state.get('first_pending_at'):
+                self.state['first_pending_at'] = time.time()
+            self._save_state()
+
+        pending = self.state.get('pending_cycles', 0)
+        if not pending and not force:
+            print("GIT: No hay cambios de contenido en los datos.")
+            return False
+
+        waited = time.time() - (self.state.get('first_pending_at') or time.time())
+        if not force and pending < self.batch_cycles and waited < self.max_latency_seconds:
+            print(f"GIT: Cambios en lote ({pending}/{self.batch_cycles} ciclos, "
+                  f"{waited:.0f}s de {self.max_latency_seconds}s).")
+            return False
+
+        return self.flush(current, force=force)
+
+    def flush(self, current_hash=None, force=False):
+        """Hace commit de los archivos de salida y push al remoto."""
+        current_hash = current_hash or self.payload_hash()
+        try:
+            repo = Repo(self.repo_path)
+            paths = [os.path.relpath(p, self.repo_path) for p in self.output_paths if os.path.exists(p)]
+            if paths:
+                with METRICS.timer('git', op='add'):
+                    repo.git.add('--', *paths)
+
+            staged = repo.index.diff('HEAD', paths=paths) if repo.head.is_valid() else paths
+            if staged:
+                timestamp = time.strftime('%Y-%m-%d %H:%M:%S')
+                cycles = self.state.get('pending_cycles', 0)
+                suffix = f" ({cycles} ciclos)" if cycles > 1 else ""
+                with METRICS.timer('git', op='commit'):
+                    repo.index.commit(f"{self.commit_message} {timestamp}{suffix}")
+                METRICS.inc('git_commits')
+                print(f"GIT: Commit creado con {len(staged)} archivo(s) modificados{suffix}.")
+            elif not force:
+                print("GIT: Nada que confirmar en los archivos de salida.")
+
+            # Se empuja según los commits sin publicar, no según lo confirmado en este ciclo:
+            # un commit cuyo push falló queda esperando y se reintenta en el ciclo siguiente
+            ahead = self._unpushed_commits(repo)
+            if ahead and not staged:
+                print(f"GIT: {ahead} commit(s) pendientes de push de un ciclo anterior.")
+            if ahead or force:
+                self._push(repo)
+
+            # Solo tras un push exitoso (o sin nada que empujar) el contenido cuenta como publicado
+            self.state.update({'published_hash': current_hash, 'pending_hash': None,
+                               'pending_cycles': 0, 'first_pending_at': None})
+            self._save_state()
+            return bool(ahead) or force
+        except Exception as e:
+            print(f"ERROR GIT: {e}")
+            METRICS.failure('git', e)
+            return False
+
+    def _unpushed_commits(self, repo):
+        """Commits locales que la rama remota todavía no tiene (todos si nunca se publicó)."""
+        if not repo.head.is_valid():
+            return 0
+        try:
+            return sum(1 for _ in repo.iter_commits(f"{self.remote_name}/{repo.active_branch.name}..HEAD"))
+        except GitCommandError:
+            return sum(1 for _ in repo.iter_commits('HEAD'))
+
+    def _push_once(self, origin):
+        results = origin.push()
+        results.raise_if_error()
+        for info in results:
+            if info.flags & (PushInfo.ERROR | PushInfo.REJECTED | PushInfo.REMOTE_REJECTED):
+                raise GitCommandError('push', 1, info.summary)
+
+    def _push(self, repo):
+        origin = repo.remote(name=self.remote_name)
+        try:
+            with METRICS.timer('git', op='push'):
+                self._push_once(origin)
+        except GitCommandError as e:
+            # Solo sincronizamos con el remoto cuando el push es rechazado
+            print(f"GIT WARN: Push rechazado ({e.status}); sincronizando con pull --rebase...")
+            METRICS.inc('git_push_rejections')
+            with METRICS.timer('git', op='pull_rebase'):
+                repo.git.pull('--rebase', self.remote_name, repo.active_branch.name)
+            with METRICS.timer('git', op='push'):
+                self._push_once(origin)
+        METRICS.inc('git_pushes')
+        print(f"GIT: Push completado exitosamente a las {time.strftime('%Y-%m-%d %H:%M:%S')}")
@@ -0,0 +1,315 @@
+import os
+import json
+import math
+from collections import deque
+
+import pandas as pd
+import numpy as np
+
+# Columnas que produce el motor (mismos nombres que el cálculo con pandas)
+INDICATOR_COLUMNS = [
+    'Daily_Return_Pct', 'Log_Return', 'SMA_20', 'SMA_50', 'SMA_200',
+    'Volatility_Annualized', 'RSI_14', 'Signal_Trend'
+]
+
+SMA_WINDOWS = (20, 50, 200)
+VOLATILITY_WINDOW = 20
+RSI_PERIOD = 14
+SIGNAL_BULLISH = 'BULLISH (Alcista)'
+SIGNAL_BEARISH = 'BEARISH (Bajista)'
+
+
+class RollingWindow:
+    """
+    Ventana deslizante de tamaño fijo con suma y suma de cuadrados acumuladas.
+    push() es O(1); mean() y std() replican rolling(window).mean()/std() de pandas
+    (NaN hasta que la ventana está llena o si contiene algún NaN).
+    """
+    def __init__(self, size):
+        self.size = size
+        self.values = deque()
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.nan_count = 0
+        self.nonzero_count = 0
+
+    def push(self, value):
+        if len(self.values) == self.size:
+            self._remove(self.values.popleft())
+        self.values.append(value)
+        if math.isnan(value):
+            self.nan_count += 1
+        else:
+            self.total += value
+            self.total_sq += value * value
+            if value != 0:
+                self.nonzero_count += 1
+
+    def _remove(self, value):
+        if math.isnan(value):
+            self.nan_count -= 1
+        else:
+            self.total -= value
+            self.total_sq -= value * value
+            if value != 0:
+                self.nonzero_count -= 1
+
+    def ready(self):
+        return len(self.values) == self.size and self.nan_count == 0
+
+    def mean(self):
+        if not self.ready():
+            return np.nan
+        # Si todos los valores son cero devolvemos 0 exacto (evita residuos de punto flotante)
+        if self.nonzero_count == 0:
+            return 0.0
+        return self.total / self.size
+
+    def std(self):
+        if not self.ready() or self.size < 2:
+            return np.nan
+        var = (self.total_sq - self.total * self.total / self.size) / (self.size - 1)
+        return math.sqrt(max(var, 0.0))
+
+
+class TickerState:
+    """
+    Estado incremental de indicadores para un ticker.
+    Guarda las ventanas deslizantes y una historia corta de cierres (fecha, cierre)
+    que permite rebobinar cuando llegan cierres revisados.
+    """
+    def __init__(self, history_size):
+        self.history = deque(maxlen=history_size)
+        self.total_bars = 0
+        self.prev_close = None
+        self.sma = {w: RollingWindow(w) for w in SMA_WINDOWS}
+        self.returns = RollingWindow(VOLATILITY_WINDOW)
+        self.gains = RollingWindow(RSI_PERIOD)
+        self.losses = RollingWindow(RSI_PERIOD)
+
+    @property
+    def last_date(self):
+        return self.history[-1][0] if self.history else None
+
+    def push(self, date, close):
+        """Procesa una barra nueva en O(1) y devuelve sus indicadores."""
+        if self.prev_close is None:
+            ret_pct = np.nan
+            log_ret = np.nan
+            # pandas: delta.where(delta > 0, 0) convierte el primer NaN en 0
+            gain = loss = 0.0
+        else:
+            delta = close - self.prev_close
+            ret_pct = (close / self.prev_close - 1) * 100
+            log_ret = math.log(close / self.prev_close) if close > 0 and self.prev_close > 0 else np.nan
+            gain = delta if delta > 0 else 0.0
+            loss = -delta if delta < 0 else 0.0
+
+        for window in self.sma.values():
+            window.push(close)
+        self.returns.push(ret_pct)
+        self.gains.push(gain)
+        self.losses.push(loss)
+
+        self.history.append((date, close))
+        self.total_bars += 1
+        self.prev_close = close
+
+        avg_gain = self.gains.mean()
+        avg_loss = self.losses.mean()
+        if np.isnan(avg_gain) or np.isnan(avg_loss) or (avg_gain == 0 and avg_loss == 0):
+            rsi = np.nan
+        elif avg_loss == 0:
+            rsi = 100.0
+        else:
+            rsi = 100 - (100 / (1 + avg_gain / avg_loss))
+
+        sma_50 = self.sma[50].mean()
+        sma_200 = self.sma[200].mean()
+        return (
+            ret_pct,
+            log_ret,
+            self.sma[20].mean(),
+            sma_50,
+            sma_200,
+            self.returns.std() * np.sqrt(252),
+            rsi,
+            SIGNAL_BULLISH if sma_50 > sma_200 else SIGNAL_BEARISH,
+        )
+
+    def to_dict(self):
+        return {
+            'total_bars': self.total_bars,
+            'history': [[d.strftime('%Y-%m-%d %H:%M:%S'), c] for d, c in self.history],
+        }
+
+    @classmethod
+    def from_history(cls, history_size, history, total_bars=None):
+        """Reconstruye las ventanas a partir de la historia corta (O(tamaño de historia))."""
+        state = cls(history_size)
+        for date, close in history:
+            state.push(pd.Timestamp(date), float(close))
+        if total_bars is not None:
+            state.total_bars = total_bars
+        return state
+
+
+class IncrementalIndicatorEngine:
+    """
+    Motor de indicadores con estado por ticker: cada barra nueva actualiza SMA, RSI,
+    volatilidad y retornos en tiempo constante en lugar de recalcular toda la historia.
+
+    - El estado se guarda en <state_dir>/indicator_state.json (checkpoint) para que un
+      reinicio continúe sin recálculo completo.
+    - Las filas de indicadores ya calculadas se guardan en <state_dir>/indicators/<TICKER>.csv
+      y solo se agregan (append) las nuevas.
+    - Si llegan cierres revisados (ventana de solapamiento) se rebobina el estado hasta la
+      fecha revisada; si no hay historia suficiente se recalcula ese ticker desde cero.
+    """
+    def __init__(self, state_dir, rewind_margin=30):
+        self.state_dir = state_dir
+        self.rows_dir = os.path.join(state_dir, "indicators")
+        self.state_path = os.path.join(state_dir, "indicator_state.json")
+        self.rewind_margin = rewind_margin
+        # Historia mínima: ventana más larga + 1 cierre previo + margen para rebobinar
+        self.history_size = max(SMA_WINDOWS) + 1 + rewind_margin
+        self.states = {}
+        self.rows = {}
+        self.load()
+
+    # --- Persistencia ---
+
+    def load(self):
+        """Carga el checkpoint del disco (si existe)."""
+        if not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                payload = json.load(f)
+            for ticker, data in payload.get('tickers', {}).items():
+                self.states[ticker] = TickerState.from_history(
+                    self.history_size, data['history'], data.get('total_bars'))
+        except Exception as e:
+            print(f"WARN: Checkpoint de indicadores ilegible, se recalculará desde cero: {e}")
+            self.states = {}
+
+    def save(self):
+        """Guarda el checkpoint de forma atómica (archivo temporal + reemplazo)."""
+        os.makedirs(self.state_dir, exist_ok=True)
+        payload = {'tickers': {t: s.to_dict() for t, s in self.states.items()}}
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, self.state_path)
+
+    def _rows_path(self, ticker):
+        safe_name = ticker.replace('/', '_').replace('\\', '_')
+        return os.path.join(self.rows_dir, f"{safe_name}.csv")
+
+    def _load_rows(self, ticker):
+        if ticker not in self.rows:
+            path = self._rows_path(ticker)
+            if os.path.exists(path):
+                self.rows[ticker] = pd.read_csv(path, index_col='Date', parse_dates=['Date'])
+            else:
+                self.rows[ticker] = pd.DataFrame(columns=INDICATOR_COLUMNS,
+                                                 index=pd.DatetimeIndex([], name='Date'))
+        return self.rows[ticker]
+
+    # --- Cálculo ---
+
+    def _process(self, state, bars):
+        """Aplica barras nuevas al estado y devuelve sus filas de indicadores."""
+        closes = bars['Close'].to_numpy(dtype=float)
+        records = [state.push(date, close) for date, close in zip(bars.index, closes)]
+        return pd.DataFrame.from_records(records, columns=INDICATOR_COLUMNS, index=bars.index)
+
+    def _rewind(self, state, changed_from):
+        """
+        Recorta el estado hasta antes de 'changed_from'. Devuelve el estado rebobinado,
+        o None si la historia guardada no alcanza para rebobinar con exactitud.
+        """
+        kept = [(d, c) for d, c in state.history if d < changed_from]
+        truncated = state.total_bars > len(state.history)
+        if truncated and len(kept) < max(SMA_WINDOWS) + 1:
+            return None
+        dropped = len(state.history) - len(kept)
+        return TickerState.from_history(self.history_size, kept, state.total_bars - dropped)
+
+    def update(self, ticker, bars, changed_from=None):
+        """
+        Actualiza los indicadores de un ticker con sus barras OHLCV (índice de fechas).
+        'changed_from' es la primera fecha nueva o revisada según el almacén de barras.
+        Devuelve la historia de indicadores alineada con 'bars'.
+        """
+        bars = bars.dropna()
+        if bars.empty:
+            return pd.DataFrame(columns=INDICATOR_COLUMNS, index=bars.index)
+
+        state = self.states.get(ticker)
+        rows = self._load_rows(ticker)
+        consistent = state is not None and len(rows) > 0 and rows.index[-1] == state.last_date
+        rewrite = False
+
+        if consistent and changed_from is not None and changed_from <= state.last_date:
+            state = self._rewind(state, changed_from)
+            rows = rows[rows.index < changed_from]
+            rewrite = True
+
+        if not consistent or state is None:
+            # Arranque en frío (o checkpoint inconsistente): recalcular este ticker completo
+            state = TickerState(self.history_size)
+            rows = rows.iloc[0:0]
+            new_bars = bars
+            rewrite = True
+        else:
+            new_bars = bars[bars.index > state.last_date]
+
+        new_rows = self._process(state, new_bars)
+        self.states[ticker] = state
+        if not new_rows.empty:
+            rows = pd.concat([rows, new_rows]) if len(rows) else new_rows
+        self.rows[ticker] = rows
+
+        os.makedirs(self.rows_dir, exist_ok=True)
+        path = self._rows_path(ticker)
+        if rewrite:
+            rows.to_csv(path)
+        elif not new_rows.empty:
+            new_rows.to_csv(path, mode='a', header=False)
+
+        return rows.reindex(bars.index)
+
+    # --- Verificación ---
+
+    @staticmethod
+    def verify(engine_df, reference_df, tolerance=1e-6, ticker=""):
+        """
+        Compara las columnas del motor incremental contra el cálculo de pandas.
+        Se ignoran filas donde pandas da NaN por recorte de la ventana de historia
+        (el motor conserva la historia real y puede tener valor ahí).
+        Devuelve una lista de mensajes de discrepancia (vacía si coincide).
+        """
+        problems = []
+        for col in INDICATOR_COLUMNS:
+            if col not in reference_df.columns:
+                continue
+            if col == 'Signal_Trend':
+                both = reference_df['SMA_200'].notna() & engine_df['SMA_200'].notna()
+                mismatches = (engine_df.loc[both, col] != reference_df.loc[both, col]).sum()
+                if mismatches:
+                    problems.append(f"{ticker} {col}: {mismatches} señales distintas")
+                continue
+
+            a = engine_df[col].to_numpy(dtype=float)
+            b = reference_df[col].to_numpy(dtype=float)
+            mask = ~np.isnan(b)
+            missing = int(np.isnan(a[mask]).sum())
+            if missing:
+                problems.append(f"{ticker} {col}: {missing} valores NaN donde pandas tiene dato")
+            both = mask & ~np.isnan(a)
+            if both.any():
+                err = np.max(np.abs(a[both] - b[both]) / np.maximum(1.0, np.abs(b[both])))
+                if err > tolerance:
+                    problems.append(f"{ticker} {col}: error máximo {err:.2e} > {tolerance:.0e}")
+        return problems
@@ -0,0 +1,229 @@
+import numpy as np
+import pandas as pd
+
+from .indicator_engine import SIGNAL_BULLISH, SIGNAL_BEARISH
+from .metrics import METRICS
+from .output_writers import EXPORT_COLUMNS
+from .vectorized_indicators import (OHLCV_FIELDS, ewm_2d, lag_2d, rolling_std_2d, rolling_sums,
+                                    window_mean)
+
+
+class IndicatorNode:
+    """
+    Nodo del grafo de indicadores: 'func' recibe las matrices (ticker x barra) de sus
+    'inputs' (campos OHLCV u otros nodos) y los 'params' como argumentos con nombre.
+    Los nodos con output=True son columnas que se pueden pedir en el esquema de salida;
+    el resto son intermedios compartidos (diferencias, retornos, sumas acumuladas...).
+    'categories' indica que la matriz contiene códigos de una columna categórica.
+    """
+    def __init__(self, name, inputs, func, params=None, output=False, categories=None, description=""):
+        self.name = name
+        self.inputs = tuple(inputs)
+        self.func = func
+        self.params = params or {}
+        self.output = output
+        self.categories = categories
+        self.description = description
+
+
+class IndicatorRegistry:
+    """
+    Registro declarativo de indicadores con resolución de dependencias (DAG).
+
+    compute() calcula solo los nodos necesarios para las columnas pedidas, cada nodo una sola
+    vez (los intermedios se comparten: SMA_20/50/200 usan las mismas sumas acumuladas, RSI y
+    retornos la misma diferencia de cierres) y libera cada intermedio tras su último uso.
+    """
+    def __init__(self, base_fields=OHLCV_FIELDS):
+        self.base_fields = list(base_fields)
+        self.nodes = {}
+
+    def add(self, name, inputs, func, output=False, categories=None, description="", **params):
+        if name in self.nodes or name in self.base_fields:
+            raise ValueError(f"Indicador duplicado: {name}")
+        self.nodes[name] = IndicatorNode(name, inputs, func, params, output, categories, description)
+        return self.nodes[name]
+
+    def outputs(self):
+        """Nombres de las columnas de indicadores disponibles."""
+        return [name for name, node in self.nodes.items() if node.output]
+
+    def plan(self, requested):
+        """Orden topológico de los nodos necesarios para 'requested' (error si falta o hay ciclo)."""
+        order, state = [], {}
+
+        def visit(name, path):
+            if name in self.base_fields or state.get(name) == 'done':
+                return
+            if name not in self.nodes:
+                raise KeyError(f"Indicador desconocido: {name}" + (f" (requerido por {path[-1]})" if path else ""))
+            if state.get(name) == 'visiting':
+                raise ValueError(f"Dependencia circular: {' -> '.join(path + [name])}")
+            state[name] = 'visiting'
+            for dependency in self.nodes[name].inputs:
+                visit(dependency, path + [name])
+            state[name] = 'done'
+            order.append(name)
+
+        for name in requested:
+            visit(name, [])
+        return order
+
+    def required_inputs(self, requested):
+        """Campos OHLCV que necesitan las columnas pedidas (solo esos se convierten a matriz)."""
+        needed = set()
+        for name in self.plan(requested):
+            needed.update(i for i in self.nodes[name].inputs if i in self.base_fields)
+        needed.update(name for name in requested if name in self.base_fields)
+        return [f for f in self.base_fields if f in needed]
+
+    def compute(self, base, requested, ticker=None):
+        """
+        Evalúa el grafo. 'base' es {campo OHLCV: matriz}; devuelve {columna pedida: matriz}.
+        Cada nodo se cronometra en METRICS ('indicator', indicator=<nodo>).
+        """
+        requested = list(requested)
+        order = self.plan(requested)
+
+        # Usos pendientes de cada resultado para liberar intermedios lo antes posible
+        uses = {}
+        for name in order:
+            for dependency in self.nodes[name].inputs:
+                uses[dependency] = uses.get(dependency, 0) + 1
+        keep = set(requested)
+
+        results = dict(base)
+        for name in order:
+            node = self.nodes[name]
+            with METRICS.timer('indicator', ticker, indicator=name):
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    results[name] = node.func(*(results[i] for i in node.inputs), **node.params)
+            for dependency in node.inputs:
+                uses[dependency] -= 1
+                if uses[dependency] == 0 and dependency not in keep and dependency not in base:
+                    del results[dependency]
+        return {name: results[name] for name in requested}
+
+    def to_column(self, name, values):
+        """Convierte los valores de un nodo al tipo de su columna (categórica si corresponde)."""
+        node = self.nodes.get(name)
+        if node is not None and node.categories is not None:
+            return pd.Categorical.from_codes(values.astype(np.int8), categories=node.categories)
+        return values
+
+    def compute_frame(self, df, columns, ticker=None):
+        """
+        Calcula 'columns' para un solo ticker (DataFrame OHLCV con índice de fechas).
+        Devuelve un DataFrame con el mismo índice.
+        """
+        columns = list(columns)
+        base = {field: df[field].to_numpy(dtype=float)[np.newaxis, :]
+                for field in self.required_inputs(columns)}
+        results = self.compute(base, columns, ticker)
+        return pd.DataFrame({name: self.to_column(name, results[name][0]) for name in columns},
+                            index=df.index)
+
+
+# --- Funciones de los nodos (matrices ticker x barra) ---
+
+def _ratio(a, b):
+    return a / b
+
+
+def _difference(a, b):
+    return a - b
+
+
+def _positive_part(delta):
+    # pandas: delta.where(delta > 0, 0) -> el NaN de la primera barra cuenta como 0
+    return np.where(delta > 0, delta, 0.0)
+
+
+def _negative_part(delta):
+    return np.where(delta < 0, -delta, 0.0)
+
+
+def _pct_change(ratio):
+    return (ratio - 1) * 100
+
+
+def _log(ratio):
+    return np.log(ratio)
+
+
+def _annualized_std(returns, window):
+    return rolling_std_2d(returns, window) * np.sqrt(252)
+
+
+def _rsi(gain_sums, loss_sums, period):
+    avg_gain = window_mean(gain_sums, period)
+    avg_loss = window_mean(loss_sums, period)
+    return 100 - (100 / (1 + avg_gain / avg_loss))
+
+
+def _greater(a, b):
+    # Códigos de la categoría: 1 = BULLISH, 0 = BEARISH (NaN compara como False, igual que pandas)
+    return (a > b).astype(np.int8)
+
+
+def _ema(matrix, span):
+    return ewm_2d(matrix, 2.0 / (span + 1), min_periods=span)
+
+
+def _band(mid, std, width):
+    return mid + width * std
+
+
+def _true_range(high, low, prev_close):
+    # La primera barra no tiene cierre previo: fmax ignora el NaN y queda High - Low
+    return np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+
+
+def _wilder(matrix, period):
+    return ewm_2d(matrix, 1.0 / period, min_periods=period)
+
+
+REGISTRY = IndicatorRegistry()
+
+# Intermedios compartidos
+REGISTRY.add('prev_close', ['Close'], lag_2d, description="Cierre de la barra anterior")
+REGISTRY.add('close_ratio', ['Close', 'prev_close'], _ratio, description="Close / Close anterior")
+REGISTRY.add('close_diff', ['Close', 'prev_close'], _difference, description="Close - Close anterior")
+REGISTRY.add('gain', ['close_diff'], _positive_part)
+REGISTRY.add('loss', ['close_diff'], _negative_part)
+REGISTRY.add('close_sums', ['Close'], rolling_sums, description="Sumas acumuladas para todas las SMA")
+REGISTRY.add('gain_sums', ['gain'], rolling_sums)
+REGISTRY.add('loss_sums', ['loss'], rolling_sums)
+REGISTRY.add('close_std_20', ['Close'], rolling_std_2d, window=20)
+REGISTRY.add('true_range', ['High', 'Low', 'prev_close'], _true_range)
+
+# Columnas del esquema de salida
+REGISTRY.add('Daily_Return_Pct', ['close_ratio'], _pct_change, output=True)
+REGISTRY.add('Log_Return', ['close_ratio'], _log, output=True)
+REGISTRY.add('SMA_20', ['close_sums'], window_mean, output=True, window=20)
+REGISTRY.add('SMA_50', ['close_sums'], window_mean, output=True, window=50)
+REGISTRY.add('SMA_200', ['close_sums'], window_mean, output=True, window=200)
+REGISTRY.add('Volatility_Annualized', ['Daily_Return_Pct'], _annualized_std, output=True, window=20)
+REGISTRY.add('RSI_14', ['gain_sums', 'loss_sums'], _rsi, output=True, period=14)
+REGISTRY.add('Signal_Trend', ['SMA_50', 'SMA_200'], _greater, output=True,
+             categories=[SIGNAL_BEARISH, SIGNAL_BULLISH], description="Cruce dorado / de la muerte")
+
+# Indicadores opcionales (agregar a INDICADORES_EXTRA en main_loop.py)
+REGISTRY.add('EMA_12', ['Close'], _ema, output=True, span=12)
+REGISTRY.add('EMA_26', ['Close'], _ema, output=True, span=26)
+REGISTRY.add('MACD', ['EMA_12', 'EMA_26'], _difference, output=True)
+REGISTRY.add('MACD_Signal', ['MACD'], _ema, output=True, span=9)
+REGISTRY.add('MACD_Hist', ['MACD', 'MACD_Signal'], _difference, output=True)
+REGISTRY.add('Bollinger_Upper', ['SMA_20', 'close_std_20'], _band, output=True, width=2.0)
+REGISTRY.add('Bollinger_Lower', ['SMA_20', 'close_std_20'], _band, output=True, width=-2.0)
+REGISTRY.add('ATR_14', ['true_range'], _wilder, output=True, period=14,
+             description="Average True Range con suavizado de Wilder")
+
+
+def export_indicators(extra=None):
+    """Indicadores del esquema de exportación (más los extra pedidos), sin duplicados."""
+    columns = [c for c in EXPORT_COLUMNS if c in REGISTRY.nodes and REGISTRY.nodes[c].output]
+    for name in extra or []:
+        if name not in columns:
+            columns.append(name)
+    return columns
@@ -0,0 +1,303 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from .data_providers import OHLCV_COLUMNS, normalize_ohlcv
+from .metrics import METRICS
+from .ohlcv_store import OHLCVStore
+from .vectorized_indicators import compute_indicators_vectorized, frames_to_long
+
+# Duración de cada timeframe soportado (las semanas empiezan el lunes)
+TIMEFRAME_SECONDS = {
+    '1m': 60, '2m': 120, '5m': 300, '15m': 900, '30m': 1800,
+    '1h': 3600, '1d': 86400, '1w': 7 * 86400,
+}
+TIMEFRAME_NS = {tf: seconds * 10 ** 9 for tf, seconds in TIMEFRAME_SECONDS.items()}
+# 1970-01-01 fue jueves: el primer lunes de la época está 4 días después
+_MONDAY_OFFSET_NS = 4 * TIMEFRAME_NS['1d']
+
+
+def bucket_start(times, timeframe):
+    """Inicio del intervalo de 'timeframe' al que pertenece cada marca de tiempo (int64 ns)."""
+    step = TIMEFRAME_NS[timeframe]
+    if timeframe == '1w':
+        return (times - _MONDAY_OFFSET_NS) // step * step + _MONDAY_OFFSET_NS
+    return times // step * step
+
+
+def _empty_bars():
+    return np.empty(0, dtype=np.int64), np.empty((0, len(OHLCV_COLUMNS)))
+
+
+def bars_to_frame(times, values):
+    """Arreglos (marcas int64 ns, matriz OHLCV) -> DataFrame con el formato de normalize_ohlcv()."""
+    index = pd.DatetimeIndex(times.astype('datetime64[ns]'), name='Date')
+    return pd.DataFrame(values, index=index, columns=OHLCV_COLUMNS)
+
+
+def frame_to_bars(df):
+    """DataFrame OHLCV -> (marcas int64 ns, matriz OHLCV); Volume faltante cuenta como 0."""
+    values = df[OHLCV_COLUMNS].to_numpy(dtype=float, copy=True)
+    values[:, 4] = np.nan_to_num(values[:, 4])
+    return df.index.to_numpy(dtype='datetime64[ns]').astype(np.int64), values
+
+
+class BarRingBuffer:
+    """
+    Buffer circular de capacidad fija con barras OHLCV ordenadas por tiempo.
+    La memoria no crece con la historia: al llenarse, las barras más antiguas se desalojan
+    y extend() las devuelve para que se guarden en el almacén en disco.
+    """
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.times = np.empty(capacity, dtype=np.int64)
+        self.values = np.empty((capacity, len(OHLCV_COLUMNS)))
+        self.start = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def _positions(self, offset, count):
+        return (self.start + offset + np.arange(count)) % self.capacity
+
+    def last_time(self):
+        if self.size == 0:
+            return None
+        return int(self.times[(self.start + self.size - 1) % self.capacity])
+
+    def extend(self, times, values):
+        """
+        Agrega barras (ordenadas y posteriores a la última del buffer).
+        Devuelve (times, values) de las barras desalojadas, en orden cronológico.
+        """
+        n = len(times)
+        overflow = max(0, self.size + n - self.capacity)
+        if overflow == 0:
+            evicted = _empty_bars()
+        else:
+            from_buffer = min(overflow, self.size)
+            pos = self._positions(0, from_buffer)
+            from_input = overflow - from_buffer  # barras nuevas que no caben ni en un buffer vacío
+            evicted = (np.concatenate([self.times[pos], times[:from_input]]),
+                       np.concatenate([self.values[pos], values[:from_input]]))
+            self.start = (self.start + from_buffer) % self.capacity
+            self.size -= from_buffer
+            times, values = times[from_input:], values[from_input:]
+
+        pos = self._positions(self.size, len(times))
+        self.times[pos] = times
+        self.values[pos] = values
+        self.size += len(times)
+        return evicted
+
+    def arrays(self):
+        """Copia cronológica del contenido: (times, values)."""
+        pos = self._positions(0, self.size)
+        return self.times[pos], self.values[pos]
+
+
+class TimeframeAggregate:
+    """
+    Barras de un timeframe superior (15m, 1h, 1d, 1w) mantenidas de forma incremental:
+    cada barra base cerrada se combina con la barra en formación (máximo, mínimo, último
+    cierre, suma de volumen) y, cuando llega una barra de un intervalo posterior, la barra
+    en formación se cierra y pasa al buffer circular. Nunca se remuestrea la historia.
+    """
+    def __init__(self, timeframe, capacity):
+        self.timeframe = timeframe
+        self.bars = BarRingBuffer(capacity)
+        # Barra en formación: (inicio del intervalo, vector OHLCV) o None
+        self.partial = None
+
+    def update(self, times, values):
+        """Incorpora barras base cerradas (ordenadas). Devuelve las barras desalojadas del buffer."""
+        buckets = bucket_start(times, self.timeframe)
+        last = self.bars.last_time()
+        if last is not None:
+            # Intervalos ya cerrados (ej: barras repetidas tras un reinicio) se ignoran
+            keep = buckets > last
+            times, values, buckets = times[keep], values[keep], buckets[keep]
+        if len(times) == 0:
+            return _empty_bars()
+
+        # Una barra agregada por intervalo, con reduceat sobre los cortes de intervalo
+        starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+        ends = np.r_[starts[1:], len(times)] - 1
+        group_times = buckets[starts]
+        groups = np.column_stack([
+            values[starts, 0],
+            np.maximum.reduceat(values[:, 1], starts),
+            np.minimum.reduceat(values[:, 2], starts),
+            values[ends, 3],
+            np.add.reduceat(values[:, 4], starts),
+        ])
+
+        closed_times, closed_values = [], []
+        if self.partial is not None:
+            partial_time, partial = self.partial
+            if partial_time == group_times[0]:
+                first = groups[0]
+                groups[0] = [partial[0], max(partial[1], first[1]), min(partial[2], first[2]),
+                             first[3], partial[4] + first[4]]
+            else:
+                closed_times.append([partial_time])
+                closed_values.append(partial[np.newaxis, :])
+
+        closed_times.append(group_times[:-1])
+        closed_values.append(groups[:-1])
+        self.partial = (int(group_times[-1]), groups[-1])
+        return self.bars.extend(np.concatenate(closed_times).astype(np.int64),
+                                np.concatenate(closed_values))
+
+    def arrays(self, include_partial=True):
+        times, values = self.bars.arrays()
+        if include_partial and self.partial is not None:
+            times = np.r_[times, self.partial[0]]
+            values = np.vstack([values, self.partial[1]])
+        return times, values
+
+
+class IntradayFeed:
+    """
+    Ingesta intradía (barras de 1m/5m) con buffers circulares por ticker y agregados en caché
+    para timeframes superiores.
+
+    - poll() pide al proveedor solo las barras desde el último día ingerido; la última barra de
+      cada descarga se considera abierta y se vuelve a pedir en el siguiente ciclo.
+    - Cada barra base cerrada actualiza los agregados de todos los timeframes (sin remuestrear).
+    - Las barras que salen del horizonte de un buffer se escriben en el almacén en disco
+      (<store_dir>/<timeframe>/<TICKER>.csv); flush() guarda también el contenido en memoria.
+    - Al crear el buffer de un ticker se precarga con la cola del almacén (reinicios en caliente).
+    - compute() calcula los indicadores del grafo sobre cualquier timeframe desde la caché
+      (las ventanas se cuentan en barras de ese timeframe).
+    """
+    def __init__(self, store_dir, provider, interval="5m", timeframes=("15m", "1h", "1d", "1w"),
+                 horizon_bars=2016, aggregate_bars=500, lookback_days=5):
+        if interval not in TIMEFRAME_NS:
+            raise ValueError(f"Intervalo intradía no soportado: {interval}")
+        for timeframe in timeframes:
+            if timeframe not in TIMEFRAME_NS or TIMEFRAME_NS[timeframe] <= TIMEFRAME_NS[interval]:
+                raise ValueError(f"Timeframe '{timeframe}' no es superior al intervalo base '{interval}'")
+            if TIMEFRAME_NS[timeframe] % TIMEFRAME_NS[interval]:
+                raise ValueError(f"Timeframe '{timeframe}' no es múltiplo del intervalo base '{interval}'")
+        self.provider = provider
+        self.interval = interval
+        self.timeframes = list(timeframes)
+        self.horizon_bars = horizon_bars
+        self.aggregate_bars = aggregate_bars
+        # Historia pedida al proveedor para un ticker sin barras (yfinance: 7 días en 1m, 60 en 5m)
+        self.lookback_days = lookback_days
+        self.stores = {tf: OHLCVStore(store_dir, tf) for tf in [interval] + self.timeframes}
+        self.buffers = {}
+        self.aggregates = {}
+        # La descarga del ciclo siguiente puede coincidir con el cálculo del anterior
+        self.lock = threading.Lock()
+
+    def _ensure(self, ticker):
+        """Crea los buffers del ticker precargados con la cola del almacén."""
+        if ticker in self.buffers:
+            return
+        base = BarRingBuffer(self.horizon_bars)
+        base.extend(*frame_to_bars(self.stores[self.interval].load(ticker).tail(self.horizon_bars)))
+        aggregates = {}
+        for timeframe in self.timeframes:
+            aggregate = TimeframeAggregate(timeframe, self.aggregate_bars)
+            stored = self.stores[timeframe].load(ticker).tail(self.aggregate_bars)
+            aggregate.bars.extend(*frame_to_bars(stored))
+            # Reconstruir la barra en formación con las barras base posteriores al último cierre
+            aggregate.update(*base.arrays())
+            aggregates[timeframe] = aggregate
+        self.buffers[ticker] = base
+        self.aggregates[ticker] = aggregates
+
+    def _persist(self, ticker, timeframe, bars):
+        """Escribe en el almacén las barras (times, values) que aún no estén guardadas."""
+        times, values = bars
+        if len(times):
+            written = self.stores[timeframe].append(ticker, bars_to_frame(times, values))
+            METRICS.inc('intraday_bars_persisted', written, timeframe=timeframe)
+
+    def ingest(self, ticker, bars):
+        """Incorpora barras base cerradas (DataFrame OHLCV). Devuelve cuántas eran nuevas."""
+        bars = normalize_ohlcv(bars).dropna(subset=['Close'])
+        with self.lock:
+            self._ensure(ticker)
+            base = self.buffers[ticker]
+            last = base.last_time()
+            times, values = frame_to_bars(bars)
+            if last is not None:
+                keep = times > last
+                times, values = times[keep], values[keep]
+            if len(times) == 0:
+                return 0
+            self._persist(ticker, self.interval, base.extend(times, values))
+            for timeframe, aggregate in self.aggregates[ticker].items():
+                self._persist(ticker, timeframe, aggregate.update(times, values))
+        return len(times)
+
+    def poll(self, tickers, now=None):
+        """
+        Descarga e ingiere las barras nuevas de 'tickers'. Devuelve {ticker: barras nuevas}.
+        """
+        now = pd.Timestamp(now) if now is not None else pd.Timestamp.now()
+        requests = {}
+        with self.lock:
+            for ticker in tickers:
+                self._ensure(ticker)
+                last = self.buffers[ticker].last_time()
+                if last is None:
+                    start = now.normalize() - pd.Timedelta(days=self.lookback_days)
+                else:
+                    start = pd.Timestamp(last).normalize()
+                requests.setdefault(start, []).append(ticker)
+
+        counts = {}
+        for start, group in sorted(requests.items()):
+            with METRICS.timer('download', interval=self.interval):
+                downloaded = self.provider.fetch(group, start=start.strftime('%Y-%m-%d'),
+                                                 interval=self.interval)
+            for ticker in group:
+                if ticker not in downloaded or len(downloaded[ticker]) < 2:
+                    counts[ticker] = 0
+                    continue
+                # La última barra sigue abierta: solo se ingieren las cerradas
+                with METRICS.timer('intraday_ingest', ticker=ticker):
+                    counts[ticker] = self.ingest(ticker, downloaded[ticker].iloc[:-1])
+                METRICS.inc('bars_downloaded', counts[ticker])
+        return counts
+
+    def frame(self, ticker, timeframe=None, include_partial=True):
+        """Barras en memoria de un ticker en 'timeframe' (None = intervalo base)."""
+        with self.lock:
+            if ticker not in self.buffers:
+                return normalize_ohlcv(None)
+            if timeframe is None or timeframe == self.interval:
+                return bars_to_frame(*self.buffers[ticker].arrays())
+            return bars_to_frame(*self.aggregates[ticker][timeframe].arrays(include_partial))
+
+    def compute(self, timeframe=None, columns=None, tickers=None, include_partial=True):
+        """
+        Indicadores de todos los tickers en 'timeframe' a partir de la caché (una pasada
+        vectorizada). Devuelve el DataFrame largo con la columna 'Timeframe'.
+        """
+        tickers = list(tickers or self.buffers)
+        frames = {}
+        for ticker in tickers:
+            df = self.frame(ticker, timeframe, include_partial)
+            if not df.empty:
+                frames[ticker] = df
+        if not frames:
+            return None
+        long_df = compute_indicators_vectorized(frames_to_long(frames, tickers), columns)
+        long_df.insert(2, 'Timeframe', timeframe or self.interval)
+        return long_df
+
+    def flush(self):
+        """Guarda en el almacén todas las barras cerradas en memoria (ej: al detener el bot)."""
+        with self.lock:
+            for ticker, base in self.buffers.items():
+                self._persist(ticker, self.interval, base.arrays())
+                for timeframe, aggregate in self.aggregates[ticker].items():
+                    self._persist(ticker, timeframe, aggregate.bars.arrays())
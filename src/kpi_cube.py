@@ -0,0 +1,210 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from .data_index import MONTH_NAMES
+from .metrics import METRICS
+from .output_writers import CsvOutputWriter
+from .schema import RUN_TIMESTAMP_KEY, add_signal_code, column_dtype, load_metadata, read_csv
+
+# Etiqueta de los totales (igual que la opción "Todos" de los filtros del dashboard)
+ALL = "Todos"
+KEY_COLUMNS = ['Ticker', 'Year', 'Month']
+# Agregados aditivos: los totales se obtienen sumando celdas
+SUM_COLUMNS = ['Rows', 'Return_Count', 'Return_Sum', 'Return_SumSq',
+               'Volatility_Count', 'Volatility_Sum', 'Volatility_SumSq', 'Bullish_Count']
+CUBE_COLUMNS = KEY_COLUMNS + SUM_COLUMNS + ['First_Date', 'Last_Date', 'Last_Close']
+# Niveles de agregación: celda base (ticker, año, mes) y los totales de cada combinación con "Todos"
+GROUPINGS = [('Ticker', 'Year', 'Month'), ('Ticker', 'Year'), ('Ticker', 'Month'), ('Ticker',),
+             ('Year', 'Month'), ('Year',), ('Month',), ()]
+
+
+def _typed(cells):
+    """Tipos del esquema para las columnas del cubo (el ticker queda como texto)."""
+    for column in cells.columns:
+        if column != 'Ticker':
+            cells[column] = cells[column].astype(column_dtype(column))
+    return cells
+
+
+def month_cells(df):
+    """
+    Agregados por (ticker, año, mes) de las filas exportadas: cantidad de filas, sumas y sumas
+    de cuadrados de retorno y volatilidad (sin contar nulos), señales BULLISH y último cierre.
+    """
+    if 'Signal_Code' not in df.columns:
+        df = add_signal_code(df.copy())
+    dates = pd.to_datetime(df['Date'])
+    returns = df['Daily_Return_Pct'].to_numpy(dtype=np.float64)
+    volatility = df['Volatility_Annualized'].to_numpy(dtype=np.float64)
+    has_return = np.isfinite(returns)
+    has_volatility = np.isfinite(volatility)
+    work = pd.DataFrame({
+        'Ticker': df['Ticker'].astype(str).to_numpy(),
+        'Year': dates.dt.year.to_numpy(),
+        'Month': dates.dt.month.to_numpy(),
+        'Rows': np.ones(len(df), dtype=np.int64),
+        'Return_Count': has_return.astype(np.int64),
+        'Return_Sum': np.where(has_return, returns, 0.0),
+        'Return_SumSq': np.where(has_return, returns * returns, 0.0),
+        'Volatility_Count': has_volatility.astype(np.int64),
+        'Volatility_Sum': np.where(has_volatility, volatility, 0.0),
+        'Volatility_SumSq': np.where(has_volatility, volatility * volatility, 0.0),
+        'Bullish_Count': df['Signal_Code'].to_numpy(dtype=np.int64),
+        'First_Date': dates.to_numpy(),
+        'Last_Date': dates.to_numpy(),
+        'Last_Close': df['Close'].to_numpy(dtype=np.float64),
+    })
+    work = work.sort_values(['Ticker', 'Last_Date'], kind='stable')
+    return _typed(_aggregate(work, KEY_COLUMNS).reset_index())
+
+
+def _aggregate(cells, fields):
+    """
+    Suma los agregados de 'cells' (ordenadas por ticker y fecha) agrupando por 'fields'.
+    El último cierre es el de la última fila en orden (ticker, fecha): el mismo criterio que
+    la tabla del dashboard, cuyas filas filtradas vienen ordenadas así.
+    """
+    grouped = cells.groupby(list(fields), sort=True)
+    result = grouped[SUM_COLUMNS].sum()
+    result['First_Date'] = grouped['First_Date'].min()
+    result['Last_Date'] = grouped['Last_Date'].last()
+    result['Last_Close'] = grouped['Last_Close'].last()
+    return result
+
+
+def rollup(cells):
+    """Tabla completa: celdas base más los totales de cada nivel (Ticker = "Todos", Year/Month vacíos)."""
+    if cells.empty:
+        return pd.DataFrame(columns=CUBE_COLUMNS)
+    frames = [cells[CUBE_COLUMNS]]
+    for fields in GROUPINGS[1:]:
+        if fields:
+            totals = _aggregate(cells, fields).reset_index()
+        else:
+            last = cells.iloc[-1]
+            totals = pd.DataFrame([{
+                **cells[SUM_COLUMNS].sum().to_dict(),
+                'First_Date': cells['First_Date'].min(),
+                'Last_Date': last['Last_Date'],
+                'Last_Close': last['Last_Close'],
+            }])
+        if 'Ticker' not in fields:
+            totals['Ticker'] = ALL
+        for field in ('Year', 'Month'):
+            if field not in fields:
+                totals[field] = pd.NA
+        frames.append(totals[CUBE_COLUMNS])
+    return _typed(pd.concat(frames, ignore_index=True))
+
+
+class KpiCube:
+    """
+    Cubo de KPIs precalculado al exportar: agregados por ticker/año/mes y totales "Todos".
+
+    Guarda conteos, sumas y sumas de cuadrados (retorno diario y volatilidad), señales BULLISH
+    y último cierre; cualquier combinación de filtros del dashboard (o segmentación en Power BI)
+    se responde con una búsqueda en un diccionario, sin recorrer las filas del dataset.
+
+    Actualización incremental (update): solo se recalculan las celdas de los tickers recibidos
+    desde el mes de su primera barra nueva o revisada; los totales se rehacen sumando celdas
+    (miles de filas, no millones). Si la ventana de historia de un ticker se desplazó (su
+    primera fecha cambió) se recalcula ese ticker completo: los primeros valores de retorno,
+    volatilidad y señal dependen del inicio de la ventana.
+
+    Se persiste como CSV (data/kpi_cube.csv) con su archivo de metadatos; la marca de la
+    ejecución es la misma que la de los datos, así el dashboard detecta un cubo desfasado.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.timestamp = None
+        self.cells = _typed(pd.DataFrame({c: [] for c in CUBE_COLUMNS}))
+        self.changed = False
+        if os.path.exists(path):
+            table = read_csv(path, CUBE_COLUMNS, float_precision='round_trip')
+            base = (table['Ticker'].astype(str) != ALL) & table['Year'].notna() & table['Month'].notna()
+            self.cells = _typed(table.loc[base].astype({'Ticker': str}).reset_index(drop=True))
+            self.timestamp = (load_metadata(path) or {}).get(RUN_TIMESTAMP_KEY)
+        self._rebuild()
+
+    def _rebuild(self):
+        """Tabla con totales y diccionario (ticker, año, mes) -> fila; None = "Todos"."""
+        self.table = rollup(self.cells)
+        tickers = [None if t == ALL else t for t in self.table['Ticker']]
+        years = [None if pd.isna(y) else int(y) for y in self.table['Year']]
+        months = [None if pd.isna(m) else int(m) for m in self.table['Month']]
+        self._rows = {key: i for i, key in enumerate(zip(tickers, years, months))}
+        self._values = {c: self.table[c].to_numpy() for c in
+                        ('Last_Close', 'Return_Sum', 'Return_Count', 'Volatility_Sum',
+                         'Volatility_Count', 'Bullish_Count')}
+
+    def update(self, df, since=None):
+        """
+        Incorpora las filas exportadas de los tickers de 'df' (historia completa de cada uno).
+        'since' es {ticker: primera fecha nueva o revisada}; sin 'since' se recalculan los
+        tickers completos. Devuelve la cantidad de celdas recalculadas.
+        """
+        if df is None or df.empty:
+            return 0
+        dates = pd.to_datetime(df['Date'])
+        tickers = df['Ticker'].astype(str)
+        first_dates = dates.groupby(tickers.to_numpy()).min()
+
+        known = self.cells.groupby('Ticker')
+        cube_first = known['First_Date'].min()
+        cube_last = known['Last_Date'].max()
+        starts = {}
+        for ticker, first in first_dates.items():
+            if since is None or ticker not in cube_first.index or cube_first[ticker] != first:
+                starts[ticker] = pd.Timestamp.min
+                continue
+            start = cube_last[ticker]
+            if ticker in since:
+                start = min(start, pd.Timestamp(since[ticker]))
+            starts[ticker] = start.to_period('M').start_time
+
+        # Filas a reagregar y celdas que reemplazan (mismo ticker, meses >= inicio)
+        row_start = tickers.map(starts)
+        fresh = month_cells(df.loc[(dates >= row_start).to_numpy()])
+        cell_start = self.cells['Ticker'].map(starts)
+        cell_month = pd.to_datetime(pd.DataFrame({'year': self.cells['Year'].astype('int64'),
+                                                  'month': self.cells['Month'].astype('int64'),
+                                                  'day': 1}))
+        replaced = cell_start.notna() & (cell_month >= cell_start)
+
+        old = self.cells.loc[replaced].reset_index(drop=True)
+        self.changed = self.changed or not old.equals(fresh)
+        self.cells = pd.concat([self.cells.loc[~replaced], fresh], ignore_index=True)
+        self.cells = self.cells.sort_values(KEY_COLUMNS, kind='stable').reset_index(drop=True)
+        self._rebuild()
+        METRICS.inc('kpi_cells_updated', len(fresh))
+        return len(fresh)
+
+    def write(self, timestamp=None):
+        """Escribe la tabla (celdas + totales) si cambió o si los datos tienen otra marca de ejecución."""
+        if not self.changed and timestamp == self.timestamp and os.path.exists(self.path):
+            return False
+        CsvOutputWriter(self.path).write(self.table, timestamp)
+        self.timestamp = timestamp
+        self.changed = False
+        return True
+
+    def kpis(self, ticker=None, year=None, month=None):
+        """
+        KPIs de un filtro (None = "Todos"; 'month' número o nombre de mes) con las mismas
+        claves que compute_kpis() del dashboard. None si el filtro no tiene filas.
+        """
+        if isinstance(month, str):
+            month = MONTH_NAMES.index(month) + 1
+        row = self._rows.get((ticker, year, month))
+        if row is None:
+            return None
+        v = self._values
+        return {
+            'last_price': v['Last_Close'][row],
+            'avg_return': v['Return_Sum'][row] / v['Return_Count'][row] if v['Return_Count'][row] else np.nan,
+            'avg_vol': (v['Volatility_Sum'][row] / v['Volatility_Count'][row]
+                        if v['Volatility_Count'][row] else np.nan),
+            'bullish_count': int(v['Bullish_Count'][row]),
+        }
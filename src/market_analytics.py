@@ -1,19 +1,204 @@
-import yfinance as yf
 import pandas as pd
 import numpy as np
 import os
 import datetime
 
+from .cross_asset import CrossAssetEngine
+from .data_providers import YahooFinanceProvider
+from .metrics import METRICS
+from .provider_cache import CachedProvider
+from .schema import RUN_TIMESTAMP_KEY, load_metadata, metadata_path, run_timestamp
+from .ohlcv_store import OHLCVStore
+from .indicator_engine import INDICATOR_COLUMNS, IncrementalIndicatorEngine
+from .indicator_registry import REGISTRY, export_indicators
+from .intraday import IntradayFeed
+from .kpi_cube import KpiCube
+from .output_writers import (CsvOutputWriter, PartitionedDatasetWriter, export_columns, load_manifest,
+                             prepare_export)
+from .sharded_pipeline import ShardedPipeline, load_universe
+from .signal_events import SignalEventLog
+from .vectorized_indicators import compute_indicators_vectorized, frames_to_long, wide_to_long
+
 class MarketAnalytics:
     """
     Motor de análisis financiero que descarga datos de Yahoo Finance,
     calcula indicadores técnicos y genera un dataset consolidado para Power BI.
+
+    Modos de descarga (fetch_mode):
+    - "incremental": solo pide al proveedor las barras posteriores a la última almacenada
+      en el almacén local (menos 'overlap_days' para recoger cierres revisados).
+    - "full": descarga siempre 'history_days' completos (comportamiento original).
+
+    Indicadores: se calculan con el grafo de indicator_registry solo las columnas del esquema
+    de exportación más 'extra_indicators' (ej: ["MACD", "ATR_14"]); los intermedios
+    (diferencias, retornos, sumas acumuladas) se comparten entre indicadores.
+
+    Modos de indicadores (indicator_mode):
+    - "pandas": recalcula todas las ventanas sobre la historia completa en cada ciclo.
+    - "incremental": usa IncrementalIndicatorEngine (estado por ticker con checkpoint en disco).
+      Con verify_indicators=True se contrasta contra el cálculo de pandas en cada ciclo.
+    - "vectorized": todos los tickers en una sola pasada con matrices 2-D de NumPy.
+
+    Salida (output_backend):
+    - "csv": reescribe data/financial_market_data.csv completo (comportamiento original).
+    - "dataset": dataset columnar particionado por ticker/año en data/market_dataset, con
+      manifiesto atómico; con export_csv=True también genera el CSV como vista de compatibilidad.
+    En ambos casos se actualiza el cubo de KPIs por ticker/año/mes (data/kpi_cube.csv) y se
+    registran los eventos de señal de las barras nuevas (cruces de medias y umbrales del RSI)
+    en data/signal_events.csv (append-only, con índice por ticker y tipo de evento).
+
+    Análisis entre activos (cross_asset_window): matrices móviles de covarianza/correlación de
+    todos los tickers y volatilidad de las carteras 'portfolios' ({nombre: {ticker: peso}},
+    None = pesos iguales) con CrossAssetEngine. Se exportan la matriz de la última ventana
+    (data/cross_asset_correlation.csv), la correlación móvil de 'correlation_pairs'
+    (data/cross_asset_rolling_correlation.csv) y la volatilidad de cada cartera
+    (data/portfolio_risk.csv). cross_asset_window=None lo desactiva.
+
+    Universo grande (universe_file): los tickers se leen de un archivo y cada ciclo se ejecuta
+    con ShardedPipeline (shards descargados en paralelo y calculados en un pool de procesos).
+
+    Modo intradía (intraday_interval="1m"/"5m"): además del ciclo diario, cada ciclo ingiere las
+    barras intradía cerradas en buffers circulares por ticker (IntradayFeed) con agregados
+    incrementales en 'intraday_timeframes' y exporta los indicadores de cada timeframe a
+    data/intraday_market_data.csv (columna Timeframe). No se combina con el modo universo.
     """
-    def __init__(self, output_dir):
+    def __init__(self, output_dir, provider=None, store=None, fetch_mode="incremental",
+                 overlap_days=5, history_days=730, indicator_mode="pandas",
+                 verify_indicators=False, verify_tolerance=1e-6,
+                 output_backend="csv", export_csv=True,
+                 universe_file=None, shard_size=200, fetch_workers=4, compute_workers=None,
+                 extra_indicators=None, intraday_interval=None,
+                 intraday_timeframes=("15m", "1h", "1d", "1w"), intraday_horizon_bars=2016,
+                 intraday_aggregate_bars=500, cross_asset_window=60, correlation_pairs=(),
+                 portfolios=None, cross_asset_max_assets=500):
         self.output_dir = output_dir
         # Tickers solicitados explícitamente por el usuario
         self.tickers = ["AAPL", "MSFT", "TSLA", "NVDA", "BTC-USD", "ETH-USD"]
-        
+
+        # Modo universo: los tickers vienen de un archivo y se procesan por shards
+        self.universe_file = universe_file
+        self.pipeline = None
+        self.last_summary = None
+        if universe_file:
+            self.tickers = load_universe(universe_file)
+            self.pipeline = ShardedPipeline(self, shard_size=shard_size, fetch_workers=fetch_workers,
+                                            compute_workers=compute_workers)
+
+        # Fuente de datos intercambiable (Yahoo Finance por defecto, archivos para pruebas offline).
+        # Por defecto pasa por la caché en disco compartida (data/cache) con los demás procesos
+        self.provider = provider or CachedProvider(YahooFinanceProvider(), os.path.join(output_dir, "cache"))
+        # Almacén local de barras crudas (un archivo por ticker)
+        self.store = store or OHLCVStore(os.path.join(output_dir, "raw"))
+        self.fetch_mode = fetch_mode
+        self.overlap_days = overlap_days
+        # 2 años de historia: suficiente para las medias móviles largas (200 días)
+        self.history_days = history_days
+
+        self.indicator_mode = indicator_mode
+        self.indicator_engine = None
+        if indicator_mode == "incremental":
+            self.indicator_engine = IncrementalIndicatorEngine(os.path.join(output_dir, "state"))
+        self.verify_indicators = verify_indicators
+        self.verify_tolerance = verify_tolerance
+        # Columnas de indicadores pedidas y esquema de exportación (con los indicadores extra)
+        self.indicator_columns = export_indicators(extra_indicators)
+        self.export_columns = export_columns(extra_indicators)
+
+        self.output_backend = output_backend
+        self.run_timestamp = None
+        # Últimos resultados por ticker (para combinar ciclos parciales en el CSV maestro)
+        self.latest_results = {}
+        self.csv_path = os.path.join(output_dir, "financial_market_data.csv")
+        self.dataset_dir = os.path.join(output_dir, "market_dataset")
+        if output_backend == "dataset":
+            self.writer = PartitionedDatasetWriter(
+                self.dataset_dir, csv_view_path=self.csv_path if export_csv else None)
+        else:
+            self.writer = CsvOutputWriter(self.csv_path)
+        # Agregados por ticker/año/mes con totales "Todos" (KPIs del dashboard y Power BI)
+        self.kpi_cube_path = os.path.join(output_dir, "kpi_cube.csv")
+        self.kpi_cube = KpiCube(self.kpi_cube_path)
+        # Eventos de señal (golden/death cross, RSI 30/70) evaluados solo sobre las barras nuevas
+        self.signal_events_path = os.path.join(output_dir, "signal_events.csv")
+        self.signal_events = SignalEventLog(self.signal_events_path)
+        # Covarianza/correlación móvil entre activos y riesgo de carteras (opcional)
+        self.cross_asset = None
+        self.correlation_path = os.path.join(output_dir, "cross_asset_correlation.csv")
+        self.rolling_correlation_path = os.path.join(output_dir, "cross_asset_rolling_correlation.csv")
+        self.portfolio_risk_path = os.path.join(output_dir, "portfolio_risk.csv")
+        if cross_asset_window:
+            self.cross_asset = CrossAssetEngine(window=cross_asset_window, portfolios=portfolios,
+                                                pairs=correlation_pairs, max_assets=cross_asset_max_assets)
+
+        # Ingesta intradía con agregados por timeframe (opcional)
+        self.intraday = None
+        self.intraday_csv_path = os.path.join(output_dir, "intraday_market_data.csv")
+        if intraday_interval:
+            if universe_file:
+                raise ValueError("El modo intradía no está disponible con universe_file (pipeline por shards)")
+            self.intraday = IntradayFeed(os.path.join(output_dir, "intraday"), self.provider,
+                                         interval=intraday_interval, timeframes=intraday_timeframes,
+                                         horizon_bars=intraday_horizon_bars,
+                                         aggregate_bars=intraday_aggregate_bars)
+            self.intraday_writer = CsvOutputWriter(self.intraday_csv_path)
+
+    def history_start(self):
+        """Primera fecha de la ventana de historia exportada."""
+        return pd.Timestamp(datetime.date.today()) - pd.Timedelta(days=self.history_days)
+
+    def update_store(self, tickers=None):
+        """
+        Descarga solo las barras nuevas (más la ventana de solapamiento) y las guarda
+        en el almacén local. Devuelve {ticker: primera fecha nueva o revisada}.
+        """
+        tickers = list(tickers or self.tickers)
+        history_start = self.history_start()
+
+        # Agrupar tickers por fecha de inicio para hacer una sola llamada por grupo
+        requests = {}
+        for ticker in tickers:
+            last = self.store.last_timestamp(ticker) if self.fetch_mode == "incremental" else None
+            if last is None:
+                start = history_start
+            else:
+                start = max(history_start, last.normalize() - pd.Timedelta(days=self.overlap_days))
+            requests.setdefault(start, []).append(ticker)
+
+        changed_from = {}
+        for start, group in sorted(requests.items()):
+            print(f"Descargando datos para: {group if len(group) <= 10 else f'{len(group)} tickers'} desde {start.date()}...")
+            with METRICS.timer('download'):
+                downloaded = self.provider.fetch(group, start=start.strftime('%Y-%m-%d'), interval="1d")
+            for ticker in group:
+                if ticker not in downloaded:
+                    print(f"WARN: No se encontraron datos nuevos para {ticker}")
+                    METRICS.inc('tickers_without_data')
+                    continue
+                METRICS.inc('bars_downloaded', len(downloaded[ticker]))
+                with METRICS.timer('store_upsert', ticker=ticker):
+                    changed = self.store.upsert(ticker, downloaded[ticker])
+                if changed is not None:
+                    changed_from[ticker] = changed
+        return changed_from
+
+    def fetch_data(self, tickers=None):
+        """
+        Actualiza el almacén local con las barras nuevas y devuelve la historia completa.
+        Devuelve (frames, changed_from): frames es {ticker: DataFrame OHLCV} con la ventana
+        de 'history_days' y changed_from es {ticker: primera fecha nueva o revisada}.
+        """
+        tickers = list(tickers or self.tickers)
+        changed_from = self.update_store(tickers)
+
+        history_start = self.history_start()
+        frames = {}
+        for ticker in tickers:
+            with METRICS.timer('store_load', ticker=ticker):
+                df = self.store.load(ticker, start=history_start)
+            if not df.empty:
+                frames[ticker] = df
+        return frames, changed_from
+
     def calculate_rsi(self, series, period=14):
         """Calcula el Índice de Fuerza Relativa (RSI)."""
         delta = series.diff()
@@ -22,118 +207,363 @@ class MarketAnalytics:
         rs = gain / loss
         return 100 - (100 / (1 + rs))
 
+    def compute_indicators(self, df, ticker=None):
+        """Calcula los indicadores pedidos sobre la historia completa de un ticker (grafo de indicadores)."""
+        return df.join(REGISTRY.compute_frame(df, self.indicator_columns, ticker))
+
+    def compute_indicators_reference(self, df):
+        """Cálculo de referencia con pandas (Serie a Serie), usado para verificar los otros motores."""
+        # a) Retornos
+        df['Daily_Return_Pct'] = df['Close'].pct_change() * 100
+        df['Log_Return'] = np.log(df['Close'] / df['Close'].shift(1))
+        
+        # b) Tendencias (Medias Móviles)
+        df['SMA_20'] = df['Close'].rolling(window=20).mean()   # Corto Plazo
+        df['SMA_50'] = df['Close'].rolling(window=50).mean()   # Medio Plazo
+        df['SMA_200'] = df['Close'].rolling(window=200).mean() # Largo Plazo (Tendencia Secular)
+        
+        # c) Volatilidad Histórica (Anualizada basada en ventana de 20 días)
+        # Volatilidad = Desv. Est. de retornos * Raíz cuadrada de (252 días de trading)
+        df['Volatility_Annualized'] = df['Daily_Return_Pct'].rolling(window=20).std() * np.sqrt(252)
+        
+        # d) RSI (Oscilador de Momento)
+        df['RSI_14'] = self.calculate_rsi(df['Close'])
+
+        # e) Señales de Trading (Cruce Dorado / Cruce de la Muerte)
+        df['Signal_Trend'] = np.where(df['SMA_50'] > df['SMA_200'], 'BULLISH (Alcista)', 'BEARISH (Bajista)')
+        return df
+
+    def _compute_per_ticker(self, data, changed_from, tickers=None):
+        """Calcula los indicadores ticker por ticker (pandas o motor incremental). Devuelve la lista de DataFrames."""
+        all_data = []
+
+        for ticker in (tickers or self.tickers):
+            try:
+                if ticker not in data:
+                    print(f"WARN: No se encontraron datos para {ticker}")
+                    continue
+                df = data[ticker].copy()
+
+                df = df.dropna()
+
+                if df.empty:
+                    print(f"WARN: Datos vacíos para {ticker}")
+                    continue
+
+                # --- CÁLCULO DE KPIs E INDICADORES ---
+                if self.indicator_engine is not None:
+                    with METRICS.timer('indicator', ticker, indicator='incremental'):
+                        indicators = self.indicator_engine.update(ticker, df, changed_from.get(ticker))
+                    if self.verify_indicators:
+                        with METRICS.timer('indicator', ticker, indicator='verify'):
+                            reference = self.compute_indicators_reference(df.copy())
+                            problems = IncrementalIndicatorEngine.verify(
+                                indicators, reference, self.verify_tolerance, ticker)
+                        for problem in problems:
+                            print(f"WARN VERIFICACIÓN: {problem}")
+                            METRICS.inc('verify_mismatches')
+                    df = df.join(indicators)
+                    # Indicadores extra (fuera del motor incremental): grafo sobre la historia
+                    extra = [c for c in self.indicator_columns if c not in INDICATOR_COLUMNS]
+                    if extra:
+                        df = df.join(REGISTRY.compute_frame(df, extra, ticker))
+                else:
+                    df = self.compute_indicators(df, ticker)
+
+                # f) Metadatos para Power BI
+                df['Ticker'] = ticker
+                df['Date'] = df.index
+
+                # Reset index para que 'Date' sea una columna normal y no el índice
+                # Esto facilita la lectura en Power BI
+                all_data.append(df)
+                print(f"-> Procesado OK: {ticker}")
+
+            except KeyError as e:
+                print(f"ERROR procesando {ticker}: {e}")
+                METRICS.failure('indicator', e, ticker)
+            except Exception as e:
+                print(f"ERROR inesperado en {ticker}: {e}")
+                METRICS.failure('indicator', e, ticker)
+
+        if self.indicator_engine is not None:
+            with METRICS.timer('indicator_state_save'):
+                self.indicator_engine.save()
+        return all_data
+
+    def compute(self, data, changed_from=None, tickers=None):
+        """Calcula los indicadores según indicator_mode y prepara las columnas de exportación."""
+        # Marca de la ejecución: se guarda una sola vez en los metadatos del dataset
+        self.run_timestamp = run_timestamp()
+        if self.indicator_mode == "vectorized":
+            final_df = self.compute_vectorized(data)
+        else:
+            all_data = self._compute_per_ticker(data, changed_from or {}, tickers)
+            # Consolidación de todos los tickers en una sola tabla
+            with METRICS.timer('concat'):
+                final_df = pd.concat(all_data) if all_data else None
+        if final_df is None or final_df.empty:
+            return None
+        # Selección de columnas y redondeo
+        with METRICS.timer('round'):
+            final_df = prepare_export(final_df, self.export_columns)
+        METRICS.inc('rows_processed', len(final_df))
+        return final_df
+
+    def export(self, final_df, changed_from=None):
+        """
+        Escribe el resultado. El dataset particionado solo toca los tickers presentes; para el
+        CSV se combinan con los últimos resultados de los demás tickers (ciclos por grupo de activos).
+        Después actualiza el cubo de KPIs (solo los meses con barras nuevas o revisadas según
+        'changed_from'; sin él, los tickers completos), los eventos de señal y el análisis
+        entre activos.
+        """
+        # Crear directorio si no existe
+        if not os.path.exists(self.output_dir):
+            os.makedirs(self.output_dir)
+
+        with METRICS.timer('export'):
+            if self.output_backend == "dataset":
+                self.writer.write(final_df, timestamp=self.run_timestamp)
+                output_path = self.dataset_dir
+            else:
+                for ticker, part in final_df.groupby('Ticker', sort=False, observed=True):
+                    self.latest_results[ticker] = part
+                ordered = [self.latest_results[t] for t in self.tickers if t in self.latest_results]
+                self.writer.write(pd.concat(ordered) if len(ordered) > 1 else ordered[0],
+                                  timestamp=self.run_timestamp)
+                output_path = self.csv_path
+
+        with METRICS.timer('kpi_cube'):
+            self.kpi_cube.update(final_df, changed_from)
+            self.kpi_cube.write(self.data_timestamp())
+        with METRICS.timer('signal_events'):
+            self.signal_events.update(final_df, changed_from, self.run_timestamp)
+        self.export_cross_asset(final_df)
+        return output_path
+
+    def export_cross_asset(self, final_df=None):
+        """
+        Incorpora los cierres de 'final_df' al panel entre activos (sin él, usa el panel ya
+        cargado: modo universo), avanza las ventanas móviles y escribe sus salidas si hubo
+        barras nuevas o revisadas. Un fallo no detiene el ciclo.
+        """
+        if self.cross_asset is None:
+            return None
+        try:
+            with METRICS.timer('cross_asset'):
+                self.cross_asset.update_prices(final_df)
+                steps = self.cross_asset.run()
+                if not steps:
+                    return steps
+                outputs = [
+                    (self.correlation_path, self.cross_asset.correlation_frame(),
+                     ['Date', 'Ticker', 'Ticker_B', 'Correlation', 'Covariance_Annualized', 'Observations']),
+                    (self.rolling_correlation_path, self.cross_asset.pairs_frame(),
+                     ['Date', 'Ticker', 'Ticker_B', 'Correlation']),
+                    (self.portfolio_risk_path, self.cross_asset.portfolio_frame(),
+                     ['Date', 'Portfolio', 'Volatility_Annualized']),
+                ]
+                for path, df, columns in outputs:
+                    CsvOutputWriter(path).write(prepare_export(df, columns), timestamp=self.run_timestamp)
+        except Exception as e:
+            print(f"ERROR en el análisis entre activos: {e}")
+            METRICS.failure('cross_asset', e)
+            return None
+        print(f"ÉXITO: Correlaciones y riesgo de cartera de {len(self.cross_asset.tickers)} activos "
+              f"({steps} barras recalculadas, ventana {self.cross_asset.window})")
+        return steps
+
+    def data_timestamp(self):
+        """Marca de la ejecución que produjo los datos publicados (la de sus metadatos)."""
+        if self.output_backend == "dataset":
+            metadata = load_manifest(self.dataset_dir)
+        else:
+            metadata = load_metadata(self.csv_path)
+        return (metadata or {}).get(RUN_TIMESTAMP_KEY)
+
+    def output_paths(self):
+        """Archivos/directorios de salida que se publican (los únicos que se agregan a git)."""
+        paths = [self.csv_path, metadata_path(self.csv_path),
+                 self.kpi_cube_path, metadata_path(self.kpi_cube_path),
+                 self.signal_events_path, self.signal_events.index_path]
+        if self.cross_asset is not None:
+            for path in (self.correlation_path, self.rolling_correlation_path, self.portfolio_risk_path):
+                paths += [path, metadata_path(path)]
+        if self.output_backend == "dataset":
+            paths.append(self.dataset_dir)
+        if self.intraday is not None:
+            paths += [self.intraday_csv_path, metadata_path(self.intraday_csv_path)]
+        return paths
+
+    # --- Modo intradía ---
+
+    def fetch_intraday(self, tickers=None):
+        """Ingiere las barras intradía cerradas. Un fallo no detiene el ciclo diario."""
+        try:
+            counts = self.intraday.poll(list(tickers or self.tickers))
+            print(f"Intradía ({self.intraday.interval}): {sum(counts.values())} barras nuevas")
+        except Exception as e:
+            print(f"ERROR descargando barras intradía: {e}")
+            METRICS.failure('download', e)
+
+    def compute_intraday(self):
+        """
+        Calcula los indicadores de cada timeframe desde la caché intradía (todos los tickers
+        en memoria, también los de otros grupos de activos) y escribe el CSV intradía.
+        """
+        parts = []
+        for timeframe in [self.intraday.interval] + self.intraday.timeframes:
+            with METRICS.timer('indicator', indicator='intradia', timeframe=timeframe):
+                df = self.intraday.compute(timeframe, self.indicator_columns)
+            if df is not None:
+                parts.append(df)
+        if not parts:
+            return None
+
+        final_df = pd.concat(parts, ignore_index=True)
+        columns = list(self.export_columns)
+        columns.insert(columns.index('Ticker') + 1, 'Timeframe')
+        final_df = prepare_export(final_df, columns)
+        with METRICS.timer('export', output='intradia'):
+            self.intraday_writer.write(final_df)
+        print(f"ÉXITO: {len(final_df)} barras intradía escritas en: {self.intraday_csv_path}")
+        return final_df
+
+    # --- Etapas para el planificador (fetch -> compute -> publish) ---
+
+    def fetch_stage(self, tickers=None):
+        """
+        Etapa de descarga. En modo universo la descarga ocurre dentro del pipeline por shards.
+        Abre las métricas del ciclo, que viajan con el payload hasta compute_stage().
+        """
+        tickers = list(tickers or self.tickers)
+        cycle = METRICS.start_cycle("ciclo")
+        if self.pipeline is not None:
+            return tickers, None, None, cycle
+        try:
+            with METRICS.activate(cycle), METRICS.profile("descarga"):
+                data, changed_from = self.fetch_data(tickers)
+                if self.intraday is not None:
+                    self.fetch_intraday(tickers)
+        except Exception as e:
+            with METRICS.activate(cycle):
+                METRICS.failure('download', e)
+            METRICS.finish_cycle(cycle)
+            raise
+        return tickers, data, changed_from, cycle
+
+    def compute_stage(self, payload):
+        """Etapa de cálculo + escritura del dataset. Devuelve True si se generaron datos."""
+        tickers, data, changed_from, cycle = payload
+        try:
+            with METRICS.activate(cycle), METRICS.profile("calculo"):
+                return self._compute_stage(tickers, data, changed_from)
+        except Exception as e:
+            with METRICS.activate(cycle):
+                METRICS.failure('compute', e)
+            raise
+        finally:
+            METRICS.finish_cycle(cycle)
+
+    def _compute_stage(self, tickers, data, changed_from):
+        if self.pipeline is not None:
+            self.last_summary = self.pipeline.run(tickers)
+            return self.last_summary['rows'] > 0
+        if not data:
+            print(f"ERROR: No se descargaron datos para {tickers}.")
+            METRICS.failure('download', "sin datos")
+            return False
+        final_df = self.compute(data, changed_from, tickers)
+        if final_df is None:
+            print("ERROR: No se procesó ningún dato correctamente.")
+            return False
+        output_path = self.export(final_df, changed_from)
+        print(f"ÉXITO: {len(final_df)} registros de {final_df['Ticker'].nunique()} tickers escritos en: {output_path}")
+        if self.intraday is not None:
+            self.compute_intraday()
+        return True
+
+    def compute_vectorized(self, data):
+        """
+        Calcula los indicadores de todos los tickers en una sola pasada vectorizada
+        (matrices 2-D ticker x barra, sin copias ni bucles por ticker).
+        'data' puede ser {ticker: DataFrame} o el DataFrame ancho de yf.download(group_by='ticker').
+        """
+        with METRICS.timer('concat'):
+            if isinstance(data, dict):
+                long_df = frames_to_long(data, self.tickers)
+            else:
+                long_df = wide_to_long(data, self.tickers)
+        if long_df.empty:
+            return None
+
+        with METRICS.timer('indicator', indicator='vectorized'):
+            long_df = compute_indicators_vectorized(long_df, self.indicator_columns)
+        print(f"-> Procesados OK (vectorizado): {long_df['Ticker'].nunique()} tickers")
+        return long_df
+
     def run_analysis(self):
         print(f"[{datetime.datetime.now()}] --- INICIANDO ANÁLISIS DE MERCADO ---")
+        cycle = METRICS.start_cycle("run_analysis")
         try:
-            # 1. Descarga Masiva de Datos
-            # Se descargan 2 años de historia para tener suficiente data para las medias móviles largas (200 días)
-            print(f"Descargando datos para: {self.tickers}...")
-            data = yf.download(
-                self.tickers, 
-                period="2y", 
-                interval="1d", 
-                group_by='ticker', 
-                auto_adjust=True, 
-                progress=False,
-                threads=True
-            )
-            
-            if data.empty:
+            with METRICS.activate(cycle), METRICS.profile("ciclo"):
+                if self.pipeline is not None:
+                    return self.run_sharded()
+                return self._run_analysis()
+        finally:
+            METRICS.finish_cycle(cycle)
+
+    def _run_analysis(self):
+        try:
+            # 1. Descarga de Datos (incremental contra el almacén local)
+            data, changed_from = self.fetch_data()
+
+            if not data:
                 print("ERROR: No se descargaron datos. Verifique su conexión a internet.")
+                METRICS.failure('download', "sin datos")
                 return False
 
-            all_data = []
-
-            # 2. Procesamiento de cada Ticker
-            for ticker in self.tickers:
-                try:
-                    # Manejo de estructura de datos de yfinance
-                    # Si solo hay 1 ticker, la estructura es diferente (no hay nivel superior de columnas)
-                    if len(self.tickers) == 1:
-                        df = data.copy()
-                    else:
-                        if ticker not in data.columns.levels[0]:
-                            print(f"WARN: No se encontraron datos para {ticker}")
-                            continue
-                        df = data[ticker].copy()
-
-                    df = df.dropna()
-
-                    if df.empty:
-                        print(f"WARN: Datos vacíos para {ticker}")
-                        continue
-
-                    # --- CÁLCULO DE KPIs E INDICADORES ---
-                    
-                    # a) Retornos
-                    df['Daily_Return_Pct'] = df['Close'].pct_change() * 100
-                    df['Log_Return'] = np.log(df['Close'] / df['Close'].shift(1))
-                    
-                    # b) Tendencias (Medias Móviles)
-                    df['SMA_20'] = df['Close'].rolling(window=20).mean()   # Corto Plazo
-                    df['SMA_50'] = df['Close'].rolling(window=50).mean()   # Medio Plazo
-                    df['SMA_200'] = df['Close'].rolling(window=200).mean() # Largo Plazo (Tendencia Secular)
-                    
-                    # c) Volatilidad Histórica (Anualizada basada en ventana de 20 días)
-                    # Volatilidad = Desv. Est. de retornos * Raíz cuadrada de (252 días de trading)
-                    df['Volatility_Annualized'] = df['Daily_Return_Pct'].rolling(window=20).std() * np.sqrt(252)
-                    
-                    # d) RSI (Oscilador de Momento)
-                    df['RSI_14'] = self.calculate_rsi(df['Close'])
-
-                    # e) Señales de Trading (Cruce Dorado / Cruce de la Muerte)
-                    df['Signal_Trend'] = np.where(df['SMA_50'] > df['SMA_200'], 'BULLISH (Alcista)', 'BEARISH (Bajista)')
-                    
-                    # f) Metadatos para Power BI
-                    df['Ticker'] = ticker
-                    df['Date'] = df.index
-                    df['Last_Updated'] = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-
-                    # Reset index para que 'Date' sea una columna normal y no el índice
-                    # Esto facilita la lectura en Power BI
-                    all_data.append(df)
-                    print(f"-> Procesado OK: {ticker}")
-                    
-                except KeyError as e:
-                    print(f"ERROR procesando {ticker}: {e}")
-                except Exception as e:
-                    print(f"ERROR inesperado en {ticker}: {e}")
+            # 2. Cálculo de indicadores
+            final_df = self.compute(data, changed_from)
 
             # 3. Consolidación y Exportación
-            if not all_data:
+            if final_df is None:
                 print("ERROR: No se procesó ningún dato correctamente.")
                 return False
 
-            final_df = pd.concat(all_data)
-            
-            # Selección y orden de columnas final
-            cols = [
-                'Date', 'Ticker', 'Close', 'Open', 'High', 'Low', 'Volume', 
-                'Daily_Return_Pct', 'Volatility_Annualized', 'RSI_14', 
-                'SMA_20', 'SMA_50', 'SMA_200', 'Signal_Trend', 'Last_Updated'
-            ]
-            
-            # Aseguramos que existan las columnas (por si alguna falló, aunque no debería)
-            cols_to_export = [c for c in cols if c in final_df.columns]
-            final_df = final_df[cols_to_export].copy()
-            
-            # Redondear solo columnas numéricas para evitar warnings con fechas
-            numeric_cols = final_df.select_dtypes(include=[np.number]).columns
-            final_df[numeric_cols] = final_df[numeric_cols].round(4)
-            
-            # Crear directorio si no existe
-            if not os.path.exists(self.output_dir):
-                os.makedirs(self.output_dir)
-
-            output_path = os.path.join(self.output_dir, "financial_market_data.csv")
-            final_df.to_csv(output_path, index=False)
+            output_path = self.export(final_df, changed_from)
             
             print(f"ÉXITO: Dataset maestro generado en: {output_path}")
             print(f"Total registros: {len(final_df)}")
+
+            # 4. Barras intradía y timeframes superiores (opcional)
+            if self.intraday is not None:
+                self.fetch_intraday()
+                self.compute_intraday()
             return True
             
         except Exception as e:
             print(f"ERROR CRÍTICO EN MOTOR DE ANÁLISIS: {e}")
+            METRICS.failure('cycle', e)
+            import traceback
+            traceback.print_exc()
+            return False
+
+    def run_sharded(self):
+        """Ciclo para universos grandes: descarga/cálculo por shards con escritura en streaming."""
+        try:
+            # Releer el universo en cada ciclo permite agregar tickers sin reiniciar el bot
+            self.tickers = load_universe(self.universe_file)
+            self.last_summary = self.pipeline.run(self.tickers)
+            if self.last_summary['rows'] == 0:
+                print("ERROR: No se procesó ningún dato correctamente.")
+                return False
+            print(f"ÉXITO: Dataset maestro generado ({self.last_summary['rows']} registros)")
+            return True
+        except Exception as e:
+            print(f"ERROR CRÍTICO EN PIPELINE POR SHARDS: {e}")
+            METRICS.failure('cycle', e)
             import traceback
             traceback.print_exc()
             return False
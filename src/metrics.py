@@ -0,0 +1,339 @@
+import io
+import os
+import re
+import json
+import time
+import pstats
+import cProfile
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRIC_PREFIX = "financedatahub"
+
+
+def _metric_name(name):
+    return f"{METRIC_PREFIX}_{re.sub(r'[^a-zA-Z0-9_]', '_', name)}"
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    body = ",".join(f'{k}="{str(v)}"' for k, v in labels)
+    return "{" + body + "}"
+
+
+class CycleMetrics:
+    """
+    Métricas de un ciclo (descarga -> cálculo -> exportación, o una publicación git).
+    Acumula segundos por etapa y por ticker, contadores y fallos del ciclo.
+    """
+    def __init__(self, name):
+        self.name = name
+        self.started_at = time.time()
+        self._t0 = time.perf_counter()
+        self.seconds = None
+        self.stages = {}
+        self.tickers = {}
+        self.counters = {}
+        self.failures = []
+        self.profile = False
+        self.profiles = []
+        # Un ciclo puede recibir métricas desde varios hilos (descarga por shards)
+        self._lock = threading.Lock()
+
+    def add_time(self, key, seconds, ticker=None):
+        with self._lock:
+            self.stages[key] = self.stages.get(key, 0.0) + seconds
+            if ticker is not None:
+                per_ticker = self.tickers.setdefault(ticker, {})
+                per_ticker[key] = per_ticker.get(key, 0.0) + seconds
+
+    def inc(self, key, value=1):
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def to_dict(self, top_tickers=20):
+        # Solo los tickers más lentos: con universos de miles de tickers el archivo crecería sin límite
+        slowest = sorted(self.tickers.items(), key=lambda item: -sum(item[1].values()))[:top_tickers]
+        return {
+            'cycle': self.name,
+            'started_at': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.started_at)),
+            'seconds': round(self.seconds or 0.0, 4),
+            'stages': {k: round(v, 4) for k, v in sorted(self.stages.items())},
+            'counters': dict(sorted(self.counters.items())),
+            'failures': self.failures,
+            'slowest_tickers': {t: {k: round(v, 4) for k, v in s.items()} for t, s in slowest},
+            'profiles': self.profiles,
+        }
+
+
+class MetricsRegistry:
+    """
+    Instrumentación ligera del bot (sin dependencias externas).
+
+    - Tiempos (count/sum/max/last) y contadores acumulados, exportados en formato de texto
+      Prometheus (los tickers no se usan como etiqueta para no disparar la cardinalidad).
+    - Métricas por ciclo (etapas, tickers más lentos, fallos), guardadas en un archivo JSON
+      rotativo con los últimos 'history_size' ciclos.
+    - El ciclo activo es por hilo (activate()), así las etapas del planificador que corren
+      en hilos distintos no se mezclan.
+    - cProfile bajo demanda: creando el archivo 'profile_trigger' (o GET /profile en el
+      servidor) el siguiente ciclo se perfila y se guarda en 'profile_dir'.
+    """
+    def __init__(self, history_path=None, history_size=288, budget_seconds=None,
+                 profile_dir=None, profile_trigger=None, top_tickers=20):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.timings = {}
+        self.counters = {}
+        self.gauges = {}
+        self.history = []
+        self.profile_requested = False
+        self.server = None
+        self.configure(history_path, history_size, budget_seconds, profile_dir, profile_trigger, top_tickers)
+
+    def configure(self, history_path=None, history_size=288, budget_seconds=None,
+                  profile_dir=None, profile_trigger=None, top_tickers=20):
+        self.history_path = history_path
+        self.history_size = history_size
+        self.budget_seconds = budget_seconds
+        self.profile_dir = profile_dir
+        self.profile_trigger = profile_trigger
+        self.top_tickers = top_tickers
+        self.history = self._load_history()
+
+    # --- Registro ---
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def observe(self, name, seconds, ticker=None, **labels):
+        """Registra una duración. En el ciclo activo se guarda como 'name' o 'name:etiqueta'."""
+        key = self._key(name, labels)
+        with self._lock:
+            stats = self.timings.setdefault(key, [0, 0.0, 0.0, 0.0])  # count, sum, max, last
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+            stats[3] = seconds
+        cycle = self.current_cycle()
+        if cycle is not None:
+            cycle_key = name if not labels else f"{name}:{':'.join(str(v) for v in labels.values())}"
+            cycle.add_time(cycle_key, seconds, ticker)
+
+    @contextmanager
+    def timer(self, name, ticker=None, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - t0, ticker, **labels)
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+        cycle = self.current_cycle()
+        if cycle is not None:
+            cycle.inc(name if not labels else f"{name}:{':'.join(str(v) for v in labels.values())}", value)
+
+    def set_gauge(self, name, value, **labels):
+        with self._lock:
+            self.gauges[self._key(name, labels)] = value
+
+    def failure(self, stage, error, ticker=None):
+        """Cuenta un fallo (por etapa) y lo anota en el ciclo activo."""
+        self.inc('failures', stage=stage)
+        cycle = self.current_cycle()
+        if cycle is not None:
+            with cycle._lock:
+                cycle.failures.append({'stage': stage, 'ticker': ticker, 'error': str(error)[:300]})
+
+    # --- Ciclos ---
+
+    def current_cycle(self):
+        return getattr(self._local, 'cycle', None)
+
+    @contextmanager
+    def activate(self, cycle):
+        """Hace de 'cycle' el ciclo activo del hilo actual mientras dure el bloque."""
+        previous = self.current_cycle()
+        self._local.cycle = cycle
+        try:
+            yield cycle
+        finally:
+            self._local.cycle = previous
+
+    def start_cycle(self, name):
+        cycle = CycleMetrics(name)
+        cycle.profile = self._consume_profile_request()
+        return cycle
+
+    def finish_cycle(self, cycle):
+        """Cierra el ciclo: actualiza gauges, agrega el registro al historial y lo imprime."""
+        cycle.seconds = time.perf_counter() - cycle._t0
+        self.inc('cycles', cycle=cycle.name)
+        self.set_gauge('cycle_last_seconds', cycle.seconds, cycle=cycle.name)
+        self.set_gauge('cycle_last_timestamp', time.time(), cycle=cycle.name)
+        if self.budget_seconds:
+            self.set_gauge('cycle_budget_ratio', cycle.seconds / self.budget_seconds, cycle=cycle.name)
+
+        record = cycle.to_dict(self.top_tickers)
+        with self._lock:
+            self.history.append(record)
+            del self.history[:-self.history_size]
+            history = list(self.history)
+        self._save_history(history)
+        self._print_cycle(cycle)
+        return record
+
+    def _print_cycle(self, cycle):
+        top = sorted(cycle.stages.items(), key=lambda item: -item[1])[:5]
+        stages = ", ".join(f"{k} {v:.2f}s" for k, v in top)
+        budget = f" ({cycle.seconds / self.budget_seconds:.0%} del presupuesto)" if self.budget_seconds else ""
+        failures = f" | fallos: {len(cycle.failures)}" if cycle.failures else ""
+        print(f"MÉTRICAS [{cycle.name}]: {cycle.seconds:.2f}s{budget} | {stages}{failures}")
+
+    # --- Historial JSON rotativo ---
+
+    def _load_history(self):
+        if not self.history_path or not os.path.exists(self.history_path):
+            return []
+        try:
+            with open(self.history_path, 'r', encoding='utf-8') as f:
+                return json.load(f).get('cycles', [])[-self.history_size:]
+        except Exception as e:
+            print(f"WARN: Historial de métricas ilegible ({e}); se reinicia.")
+            return []
+
+    def _save_history(self, history):
+        if not self.history_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.history_path) or ".", exist_ok=True)
+            tmp_path = self.history_path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'budget_seconds': self.budget_seconds, 'cycles': history}, f, indent=1)
+            os.replace(tmp_path, self.history_path)
+        except Exception as e:
+            print(f"WARN: No se pudo guardar el historial de métricas: {e}")
+
+    # --- cProfile bajo demanda ---
+
+    def request_profile(self):
+        self.profile_requested = True
+
+    def _consume_profile_request(self):
+        requested = self.profile_requested
+        self.profile_requested = False
+        if self.profile_trigger and os.path.exists(self.profile_trigger):
+            requested = True
+            try:
+                os.remove(self.profile_trigger)
+            except OSError:
+                pass
+        return requested
+
+    @contextmanager
+    def profile(self, label):
+        """Perfila el bloque con cProfile si el ciclo activo lo pidió (un archivo por etapa)."""
+        cycle = self.current_cycle()
+        if cycle is None or not cycle.profile or not self.profile_dir:
+            yield
+            return
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            os.makedirs(self.profile_dir, exist_ok=True)
+            base = os.path.join(self.profile_dir, f"{time.strftime('%Y%m%d_%H%M%S')}_{cycle.name}_{label}")
+            profiler.dump_stats(base + ".prof")
+            summary = io.StringIO()
+            pstats.Stats(profiler, stream=summary).sort_stats('cumulative').print_stats(40)
+            with open(base + ".txt", 'w', encoding='utf-8') as f:
+                f.write(summary.getvalue())
+            cycle.profiles.append(base + ".prof")
+            print(f"MÉTRICAS: Perfil de '{label}' guardado en {base}.prof")
+
+    # --- Exportación ---
+
+    def render_prometheus(self):
+        """Texto en formato de exposición Prometheus."""
+        with self._lock:
+            timings = dict(self.timings)
+            counters = dict(self.counters)
+            gauges = dict(self.gauges)
+
+        lines = []
+        for name in sorted({n for n, _ in timings}):
+            metric = _metric_name(f"{name}_seconds")
+            series = sorted((labels, stats) for (n, labels), stats in timings.items() if n == name)
+            lines.append(f"# TYPE {metric} summary")
+            for labels, (count, total, _, _) in series:
+                lines.append(f"{metric}_count{_format_labels(labels)} {count}")
+                lines.append(f"{metric}_sum{_format_labels(labels)} {total:.6f}")
+            for suffix, position in (("max", 2), ("last", 3)):
+                lines.append(f"# TYPE {metric}_{suffix} gauge")
+                for labels, stats in series:
+                    lines.append(f"{metric}_{suffix}{_format_labels(labels)} {stats[position]:.6f}")
+        for name in sorted({n for n, _ in counters}):
+            metric = _metric_name(f"{name}_total")
+            lines.append(f"# TYPE {metric} counter")
+            for (n, labels), value in sorted(counters.items()):
+                if n == name:
+                    lines.append(f"{metric}{_format_labels(labels)} {value}")
+        for name in sorted({n for n, _ in gauges}):
+            metric = _metric_name(name)
+            lines.append(f"# TYPE {metric} gauge")
+            for (n, labels), value in sorted(gauges.items()):
+                if n == name:
+                    lines.append(f"{metric}{_format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        with self._lock:
+            return {'budget_seconds': self.budget_seconds, 'cycles': list(self.history)}
+
+    def start_server(self, port=9108, host="127.0.0.1"):
+        """
+        Servidor HTTP local en un hilo de fondo:
+        /metrics (Prometheus), /metrics.json (historial de ciclos), /profile (perfilar el siguiente ciclo).
+        """
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body, content_type = registry.render_prometheus(), "text/plain; version=0.0.4"
+                elif self.path == "/metrics.json":
+                    body, content_type = json.dumps(registry.snapshot()), "application/json"
+                elif self.path == "/profile":
+                    registry.request_profile()
+                    body, content_type = "El siguiente ciclo se perfilará.\n", "text/plain"
+                else:
+                    self.send_error(404)
+                    return
+                data = body.encode('utf-8')
+                self.send_response(200)
+                self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass  # Sin ruido en la consola del bot
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        thread = threading.Thread(target=self.server.serve_forever, name="metrics-server", daemon=True)
+        thread.start()
+        print(f"MÉTRICAS: Servidor en http://{host}:{self.server.server_address[1]}/metrics")
+        return self.server
+
+
+# Registro por defecto del proceso (los módulos registran aquí; main_loop lo configura)
+METRICS = MetricsRegistry()
@@ -0,0 +1,123 @@
+import os
+import pandas as pd
+import numpy as np
+
+from .data_providers import OHLCV_COLUMNS, normalize_ohlcv
+from .metrics import METRICS
+
+
+class OHLCVStore:
+    """
+    Almacén local de barras OHLCV crudas: un CSV por ticker e intervalo, indexado por fecha.
+    Estructura: <root_dir>/<interval>/<TICKER>.csv
+    """
+    def __init__(self, root_dir, interval="1d"):
+        self.root_dir = root_dir
+        self.interval = interval
+        self.base_dir = os.path.join(root_dir, interval)
+
+    def _path(self, ticker):
+        safe_name = ticker.replace('/', '_').replace('\\', '_')
+        return os.path.join(self.base_dir, f"{safe_name}.csv")
+
+    def has(self, ticker):
+        return os.path.exists(self._path(ticker))
+
+    def load(self, ticker, start=None):
+        """Carga las barras almacenadas de un ticker (opcionalmente desde 'start')."""
+        path = self._path(ticker)
+        if not os.path.exists(path):
+            return normalize_ohlcv(None)
+
+        df = pd.read_csv(path, index_col='Date', parse_dates=['Date'])
+        df = normalize_ohlcv(df)
+        if start is not None:
+            df = df[df.index >= pd.Timestamp(start)]
+        return df
+
+    def last_timestamp(self, ticker):
+        """Devuelve la fecha de la última barra almacenada, o None si no hay datos."""
+        path = self._path(ticker)
+        if not os.path.exists(path):
+            return None
+
+        # Solo se necesita la última línea: evitamos parsear todo el archivo
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            block = min(size, 4096)
+            f.seek(size - block)
+            lines = f.read().decode('utf-8').strip().splitlines()
+
+        if not lines or lines[-1].startswith('Date'):
+            return None  # Archivo vacío o solo encabezado
+        last_line = lines[-1]
+        return pd.Timestamp(last_line.split(',')[0])
+
+    def upsert(self, ticker, new_bars):
+        """
+        Inserta o reemplaza barras por fecha (las barras revisadas en la ventana de solapamiento
+        sobrescriben a las almacenadas).
+
+        Devuelve la fecha de la primera barra que realmente cambió (nueva o revisada),
+        o None si los datos recibidos ya estaban almacenados tal cual.
+        """
+        new_bars = normalize_ohlcv(new_bars)
+        if new_bars.empty:
+            return None
+
+        os.makedirs(self.base_dir, exist_ok=True)
+        path = self._path(ticker)
+        old = self.load(ticker)
+
+        if old.empty:
+            new_bars.to_csv(path)
+            METRICS.inc('bytes_written', os.path.getsize(path), output='raw')
+            return new_bars.index[0]
+
+        # Detectar la primera barra que difiere de lo almacenado
+        common = new_bars.index.intersection(old.index)
+        fresh = new_bars.index.difference(old.index)
+        changed = []
+        if len(common):
+            a = old.loc[common, OHLCV_COLUMNS].to_numpy(dtype=float)
+            b = new_bars.loc[common, OHLCV_COLUMNS].to_numpy(dtype=float)
+            diff = ~np.isclose(a, b, rtol=1e-9, atol=0, equal_nan=True).all(axis=1)
+            changed = list(common[diff])
+        if len(fresh):
+            changed.append(fresh.min())
+
+        if not changed:
+            return None
+        changed_from = min(changed)
+
+        size_before = os.path.getsize(path)
+        if changed_from > old.index[-1]:
+            # Caso común: solo barras nuevas al final -> append sin reescribir el archivo
+            new_bars[new_bars.index > old.index[-1]].to_csv(path, mode='a', header=False)
+            METRICS.inc('bytes_written', os.path.getsize(path) - size_before, output='raw')
+        else:
+            merged = pd.concat([old[~old.index.isin(new_bars.index)], new_bars]).sort_index()
+            merged.to_csv(path)
+            METRICS.inc('bytes_written', os.path.getsize(path), output='raw')
+
+        return changed_from
+
+    def append(self, ticker, bars):
+        """
+        Agrega al final solo las barras posteriores a la última almacenada, sin cargar ni
+        reescribir el archivo (desalojo de los buffers intradía). Devuelve cuántas se escribieron.
+        """
+        bars = normalize_ohlcv(bars)
+        last = self.last_timestamp(ticker)
+        if last is not None:
+            bars = bars[bars.index > last]
+        if bars.empty:
+            return 0
+
+        os.makedirs(self.base_dir, exist_ok=True)
+        path = self._path(ticker)
+        size_before = os.path.getsize(path) if os.path.exists(path) else 0
+        bars.to_csv(path, mode='a', header=size_before == 0)
+        METRICS.inc('bytes_written', os.path.getsize(path) - size_before, output='raw')
+        return len(bars)
@@ -0,0 +1,338 @@
+import os
+import json
+import hashlib
+import datetime
+
+import pandas as pd
+
+from .metrics import METRICS
+from .schema import (RUN_TIMESTAMP_KEY, apply_schema, cast_columns, complete_columns, dataset_metadata,
+                     read_csv, write_metadata)
+
+# Parquet es opcional: si pyarrow no está instalado las particiones se escriben en CSV
+try:
+    import pyarrow.parquet
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+# Selección y orden de columnas final del dataset exportado (tipos en src/schema.py).
+# La marca de la ejecución (Last_Updated) va en los metadatos, no en cada fila.
+EXPORT_COLUMNS = [
+    'Date', 'Ticker', 'Close', 'Open', 'High', 'Low', 'Volume',
+    'Daily_Return_Pct', 'Volatility_Annualized', 'RSI_14',
+    'SMA_20', 'SMA_50', 'SMA_200', 'Signal_Trend', 'Signal_Code'
+]
+
+MANIFEST_NAME = "manifest.json"
+# Columnas que no forman parte del contenido (no deben forzar la reescritura de una partición).
+# Solo aparecen en archivos de la versión 1 del esquema.
+VOLATILE_COLUMNS = ['Last_Updated']
+
+
+def content_hash(df, exclude=VOLATILE_COLUMNS):
+    """Hash estable del contenido de un DataFrame, ignorando metadatos volátiles."""
+    stable = df.drop(columns=[c for c in exclude if c in df.columns])
+    row_hashes = pd.util.hash_pandas_object(stable, index=False).to_numpy()
+    digest = hashlib.sha1(row_hashes.tobytes())
+    digest.update(','.join(stable.columns).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def export_columns(extra=None):
+    """Esquema de exportación con columnas adicionales (indicadores extra) al final."""
+    extra = [c for c in (extra or []) if c not in EXPORT_COLUMNS]
+    return EXPORT_COLUMNS + extra
+
+
+def prepare_export(df, columns=None):
+    """Selecciona las columnas de exportación, redondea a 4 decimales y aplica los tipos del esquema."""
+    return apply_schema(df, columns or EXPORT_COLUMNS)
+
+
+def _atomic_write_json(path, payload):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+class CsvOutputWriter:
+    """Exportador clásico: reescribe el CSV maestro completo en cada ciclo."""
+    def __init__(self, output_path):
+        self.output_path = output_path
+
+    def write(self, df, timestamp=None):
+        """Escribe el CSV y su archivo de metadatos (esquema + marca de la ejecución)."""
+        os.makedirs(os.path.dirname(self.output_path) or ".", exist_ok=True)
+        tmp_path = self.output_path + ".tmp"
+        df.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, self.output_path)
+        write_metadata(self.output_path, df.columns, timestamp)
+        METRICS.inc('bytes_written', os.path.getsize(self.output_path), output='csv')
+        return self.output_path
+
+    # --- Escritura en streaming (por lotes) ---
+
+    def begin(self):
+        """Inicia una escritura por lotes sobre un archivo temporal."""
+        os.makedirs(os.path.dirname(self.output_path) or ".", exist_ok=True)
+        self._stream_path = self.output_path + ".tmp"
+        self._stream_header = True
+        self._stream_columns = []
+        if os.path.exists(self._stream_path):
+            os.remove(self._stream_path)
+
+    def append(self, df):
+        """
+        Agrega un lote al archivo temporal (no hace falta tener todo el dataset en memoria).
+        Si la escritura falla a mitad, el archivo se recorta al tamaño previo: el lote no
+        deja filas parciales.
+        """
+        size = os.path.getsize(self._stream_path) if os.path.exists(self._stream_path) else 0
+        try:
+            df.to_csv(self._stream_path, index=False, mode='a', header=self._stream_header)
+        except Exception:
+            if os.path.exists(self._stream_path):
+                with open(self._stream_path, 'r+b') as f:
+                    f.truncate(size)
+            raise
+        if self._stream_header:
+            self._stream_columns = list(df.columns)
+        self._stream_header = False
+
+    def commit(self, timestamp=None):
+        """Publica el archivo completo de forma atómica (y sus metadatos)."""
+        if not self._stream_header:
+            os.replace(self._stream_path, self.output_path)
+            write_metadata(self.output_path, self._stream_columns, timestamp)
+            METRICS.inc('bytes_written', os.path.getsize(self.output_path), output='csv')
+
+
+class PartitionedDatasetWriter:
+    """
+    Dataset columnar particionado por ticker y año:
+
+        <dataset_dir>/ticker=AAPL/year=2025/part-<hash>.parquet
+        <dataset_dir>/manifest.json
+
+    Cada partición es un archivo inmutable nombrado por el hash de su contenido; en cada
+    ciclo solo se escriben las particiones que cambiaron y al final se reemplaza el
+    manifiesto de forma atómica. Los lectores siempre leen el manifiesto primero, por lo
+    que nunca ven un archivo a medio escribir. Los archivos retirados se borran en el
+    ciclo siguiente para no romper a un lector que aún use el manifiesto anterior.
+
+    Opcionalmente genera el CSV maestro como vista de compatibilidad (Power BI).
+    """
+    def __init__(self, dataset_dir, file_format=None, csv_view_path=None):
+        self.dataset_dir = dataset_dir
+        if file_format is None:
+            file_format = "parquet" if PARQUET_AVAILABLE else "csv"
+        if file_format == "parquet" and not PARQUET_AVAILABLE:
+            print("WARN: pyarrow no está instalado; las particiones se escribirán en CSV.")
+            file_format = "csv"
+        self.file_format = file_format
+        self.csv_view_path = csv_view_path
+        self.manifest_path = os.path.join(dataset_dir, MANIFEST_NAME)
+
+    def _load_manifest(self):
+        return load_manifest(self.dataset_dir) or {'version': 1, 'partitions': {}, 'retired': []}
+
+    def _write_partition(self, part, ticker, year, digest):
+        rel_dir = f"ticker={ticker}/year={year}"
+        rel_path = f"{rel_dir}/part-{digest[:16]}.{self.file_format}"
+        abs_path = os.path.join(self.dataset_dir, rel_path)
+        os.makedirs(os.path.join(self.dataset_dir, rel_dir), exist_ok=True)
+
+        tmp_path = abs_path + ".tmp"
+        if self.file_format == "parquet":
+            part.to_parquet(tmp_path, index=False)
+        else:
+            part.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, abs_path)
+        METRICS.inc('bytes_written', os.path.getsize(abs_path), output='partition')
+        return rel_path
+
+    def _stage(self, partitions, df):
+        """
+        Escribe los archivos de las particiones de 'df' que cambiaron y actualiza 'partitions'
+        (en memoria). Devuelve (claves cambiadas, rutas retiradas). No toca el manifiesto.
+        """
+        dates = pd.to_datetime(df['Date'])
+        changed = []
+        retired = []
+        for (ticker, year), part in df.groupby([df['Ticker'], dates.dt.year], sort=True):
+            key = f"{ticker}/{year}"
+            part = part.reset_index(drop=True)
+            digest = content_hash(part)
+            current = partitions.get(key)
+            if current is not None and current['hash'] == digest and current['format'] == self.file_format:
+                continue
+
+            rel_path = self._write_partition(part, ticker, int(year), digest)
+            if current is not None and current['path'] != rel_path:
+                retired.append(current['path'])
+            part_dates = pd.to_datetime(part['Date'])
+            partitions[key] = {
+                'ticker': ticker,
+                'year': int(year),
+                'path': rel_path,
+                'format': self.file_format,
+                'hash': digest,
+                'rows': int(len(part)),
+                'columns': list(part.columns),
+                'min_date': part_dates.min().strftime('%Y-%m-%d'),
+                'max_date': part_dates.max().strftime('%Y-%m-%d'),
+            }
+            changed.append(key)
+
+        # Años que salieron de la ventana de historia de un ticker presente -> retirar partición
+        written_keys = {f"{t}/{y}" for t, y in zip(df['Ticker'], dates.dt.year)}
+        present = set(df['Ticker'].unique())
+        for key, entry in list(partitions.items()):
+            if entry['ticker'] in present and key not in written_keys:
+                retired.append(entry['path'])
+                del partitions[key]
+                changed.append(key)
+        return changed, retired
+
+    def _publish(self, manifest, changed, retired, columns, timestamp):
+        """
+        Borra los archivos retirados en el ciclo anterior (ya nadie los referencia, salvo que una
+        partición haya vuelto a un contenido anterior) y reemplaza el manifiesto de forma atómica.
+        """
+        live = {entry['path'] for entry in manifest['partitions'].values()}
+        for rel_path in manifest.get('retired', []):
+            if rel_path in live:
+                continue
+            try:
+                os.remove(os.path.join(self.dataset_dir, rel_path))
+            except FileNotFoundError:
+                pass
+
+        if changed or manifest.get('retired'):
+            manifest['retired'] = retired
+            manifest['format'] = self.file_format
+            manifest['updated_at'] = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            manifest.update(dataset_metadata(columns, timestamp))
+            os.makedirs(self.dataset_dir, exist_ok=True)
+            _atomic_write_json(self.manifest_path, manifest)
+        print(f"DATASET: {len(changed)} particiones actualizadas de {len(manifest['partitions'])}")
+
+    def write(self, df, refresh_view=True, timestamp=None):
+        """
+        Escribe las particiones que cambiaron. El manifiesto guarda la versión del esquema, los
+        tipos de columna y la marca de la ejecución ('timestamp') que produjo el cambio. Las particiones de tickers ausentes en 'df'
+        se conservan tal cual (permite escrituras parciales por grupos de tickers); las de
+        años que ya no aparecen para un ticker presente se retiran.
+        Devuelve la lista de claves de partición reescritas.
+        """
+        manifest = self._load_manifest()
+        changed, retired = self._stage(manifest['partitions'], df)
+        self._publish(manifest, changed, retired, df.columns, timestamp)
+
+        if refresh_view and self.csv_view_path and (changed or not os.path.exists(self.csv_view_path)):
+            self.refresh_csv_view()
+        return changed
+
+    # --- Escritura por lotes (un manifiesto por ciclo) ---
+
+    def begin(self):
+        """
+        Inicia una escritura por lotes: cada append() escribe sus archivos de partición (nuevos,
+        ningún manifiesto publicado los referencia todavía) y commit() publica un solo manifiesto.
+        Los lectores siguen viendo el manifiesto anterior completo hasta entonces.
+        """
+        self._batch = self._load_manifest()
+        self._batch_changed = []
+        self._batch_retired = []
+        self._batch_columns = None
+
+    def append(self, df):
+        """
+        Agrega las particiones de un lote (ej: un shard) al manifiesto pendiente. Todo o nada:
+        si falla a mitad, el manifiesto pendiente queda como estaba.
+        """
+        partitions = dict(self._batch['partitions'])
+        changed, retired = self._stage(partitions, df)
+        self._batch['partitions'] = partitions
+        self._batch_changed += changed
+        self._batch_retired += retired
+        self._batch_columns = list(df.columns)
+        return changed
+
+    def commit(self, timestamp=None):
+        """Publica el manifiesto del lote; los archivos retirados se borran en el commit siguiente."""
+        columns = self._batch_columns or self._batch.get('columns') or []
+        self._publish(self._batch, self._batch_changed, self._batch_retired, columns, timestamp)
+        changed = self._batch_changed
+        self._batch = None
+        return changed
+
+    def refresh_csv_view(self):
+        """Regenera el CSV de compatibilidad partición a partición (sin cargar todo en memoria)."""
+        if not self.csv_view_path:
+            return
+        manifest = load_manifest(self.dataset_dir)
+        if manifest is None:
+            return
+        view = CsvOutputWriter(self.csv_view_path)
+        view.begin()
+        for entry in select_partitions(manifest):
+            # Los valores se copian tal cual: no hace falta convertir tipos para reescribirlos
+            view.append(read_partition(self.dataset_dir, entry, typed=False))
+        view.commit(manifest.get(RUN_TIMESTAMP_KEY))
+
+
+def load_manifest(dataset_dir):
+    """Lee el manifiesto del dataset particionado (None si no existe)."""
+    path = os.path.join(dataset_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def select_partitions(manifest, tickers=None, years=None):
+    """Filtra las entradas del manifiesto por ticker y año (poda de particiones)."""
+    entries = []
+    for entry in manifest.get('partitions', {}).values():
+        if tickers is not None and entry['ticker'] not in tickers:
+            continue
+        if years is not None and entry['year'] not in years:
+            continue
+        entries.append(entry)
+    return sorted(entries, key=lambda e: (e['ticker'], e['year']))
+
+
+def read_partition(dataset_dir, entry, columns=None, typed=True):
+    path = os.path.join(dataset_dir, entry['path'])
+    if entry['format'] == "parquet":
+        # Parquet guarda los tipos (categóricos como diccionario, float32, int8)
+        if columns is None:
+            return pd.read_parquet(path)
+        names = pyarrow.parquet.read_schema(path).names
+        present = [c for c in columns if c in names]
+        if 'Signal_Code' in columns and 'Signal_Code' not in names and 'Signal_Trend' in names:
+            present.append('Signal_Trend')  # Partición de la versión 1: se deriva al leer
+        return complete_columns(pd.read_parquet(path, columns=present), columns)
+    # Las columnas guardadas en el manifiesto evitan leer el encabezado de cada partición
+    return read_csv(path, columns, header=entry.get('columns'), typed=typed)
+
+
+def read_dataset(dataset_dir, tickers=None, years=None, columns=None):
+    """
+    Lee solo las particiones necesarias del dataset (según tickers/años) y,
+    si se indica, solo las columnas pedidas.
+    """
+    manifest = load_manifest(dataset_dir)
+    if manifest is None:
+        raise FileNotFoundError(f"No existe un dataset en: {dataset_dir}")
+
+    entries = select_partitions(manifest, tickers, years)
+    # Los tipos del esquema se aplican una sola vez sobre el resultado unido (cada partición
+    # traería además sus propias categorías, que al concatenar vuelven a texto)
+    frames = [read_partition(dataset_dir, entry, columns, typed=False) for entry in entries]
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    return cast_columns(pd.concat(frames, ignore_index=True))
@@ -0,0 +1,285 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+import datetime
+import contextlib
+
+import pandas as pd
+
+from .data_providers import MarketDataProvider, normalize_ohlcv
+from .metrics import METRICS
+
+# TTL (segundos) de una respuesta cuyo rango incluye la barra actual (todavía abierta)
+DEFAULT_TTL_OPEN = {'1m': 30, '2m': 60, '5m': 120, '15m': 300, '30m': 600, '1h': 900, '1d': 240, '1wk': 3600}
+# TTL de una respuesta con solo barras cerradas (rango que termina antes de hoy)
+DEFAULT_TTL_CLOSED = {'1d': 7 * 86400, '1wk': 7 * 86400}
+DEFAULT_TTL_CLOSED_INTRADAY = 86400
+
+
+def closed_before():
+    """
+    Fecha desde la cual las barras todavía pueden cambiar. Se toma la fecha UTC (no la del
+    equipo, que al este de UTC adelanta un día a la sesión de EE.UU.) menos un día de margen:
+    la sesión en curso de cualquier bolsa (y la vela diaria UTC de cripto) queda siempre
+    después de este límite.
+    """
+    return pd.Timestamp(datetime.datetime.now(datetime.timezone.utc).date()) - pd.Timedelta(days=1)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    ticker TEXT NOT NULL,
+    interval TEXT NOT NULL,
+    file TEXT,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    expires REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_lru ON entries(last_access);
+CREATE TABLE IF NOT EXISTS stats (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+class CachedProvider(MarketDataProvider):
+    """
+    Caché en disco de respuestas del proveedor, compartida por todos los procesos del proyecto
+    (bot, force_sync...). Envuelve a cualquier MarketDataProvider sin cambiar su interfaz.
+
+    - Clave: (ticker, intervalo, inicio, fin). En una llamada con varios tickers solo se piden
+      al proveedor los que no están en caché (en una sola llamada).
+    - TTL por intervalo: corto si el rango incluye la barra actual (puede cambiar), largo si
+      solo contiene barras cerradas. Un pedido sin fin (el caso del bot) se divide en dos
+      entradas: barras anteriores a ayer en UTC (TTL largo) y las de ayer y hoy (TTL corto). El
+      vencimiento se fija al guardar la entrada.
+    - Tamaño máximo con desalojo LRU (por último acceso).
+    - Índice en SQLite (modo WAL, transacciones cortas) y archivos escritos de forma atómica:
+      varios procesos pueden leer y escribir a la vez; si un archivo desaparece (desalojado
+      por otro proceso) la lectura cuenta como fallo y se descarga de nuevo.
+    - Estadísticas de aciertos/fallos persistentes (stats()) y en METRICS.
+    """
+    name = "cached"
+
+    def __init__(self, provider, cache_dir, max_bytes=512 * 2 ** 20, ttl_open=None, ttl_closed=None,
+                 cache_empty=True):
+        self.provider = provider
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.ttl_open = dict(DEFAULT_TTL_OPEN, **(ttl_open or {}))
+        self.ttl_closed = dict(DEFAULT_TTL_CLOSED, **(ttl_closed or {}))
+        # Guardar también "sin datos" (evita repetir descargas de tickers inexistentes hasta el TTL)
+        self.cache_empty = cache_empty
+        self.name = f"cached:{getattr(provider, 'name', 'provider')}"
+        self.files_dir = os.path.join(cache_dir, "entries")
+        self.db_path = os.path.join(cache_dir, "index.sqlite")
+        os.makedirs(self.files_dir, exist_ok=True)
+        with self._connect() as db:
+            db.executescript(_SCHEMA)
+
+    @contextlib.contextmanager
+    def _connect(self):
+        """Conexión corta por operación (las conexiones SQLite no se comparten entre hilos)."""
+        db = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            yield db
+        finally:
+            db.close()
+
+    @staticmethod
+    def _key(ticker, interval, start, end):
+        start = pd.Timestamp(start).isoformat() if start is not None else ""
+        end = pd.Timestamp(end).isoformat() if end is not None else ""
+        return f"{ticker}|{interval}|{start}|{end}"
+
+    def ttl(self, interval, end):
+        """Segundos de validez de una respuesta según su intervalo y si incluye la barra abierta."""
+        if end is not None and pd.Timestamp(end) <= closed_before():
+            if interval in self.ttl_closed:
+                return self.ttl_closed[interval]
+            return DEFAULT_TTL_CLOSED_INTRADAY
+        return self.ttl_open.get(interval, 60)
+
+    def _file_path(self, key):
+        return os.path.join(self.files_dir, hashlib.sha1(key.encode('utf-8')).hexdigest() + ".pkl")
+
+    def _bump(self, db, **counts):
+        for name, value in counts.items():
+            if value:
+                db.execute("INSERT INTO stats(name, value) VALUES (?, ?) "
+                           "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value", (name, value))
+
+    def _get(self, keys, now):
+        """Lee las entradas vigentes. Devuelve {key: DataFrame o None (sin datos)}."""
+        found = {}
+        with self._connect() as db:
+            rows = []
+            # Por bloques: SQLite limita la cantidad de parámetros por consulta
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                rows += db.execute(
+                    f"SELECT key, file FROM entries WHERE expires > ? AND key IN ({','.join('?' * len(chunk))})",
+                    [now] + chunk).fetchall()
+            for key, file in rows:
+                if file is None:
+                    found[key] = None
+                    continue
+                try:
+                    found[key] = pd.read_pickle(os.path.join(self.files_dir, file))
+                except (OSError, EOFError, ValueError):
+                    continue  # Desalojada por otro proceso o escritura incompleta: fallo
+            if found:
+                db.executemany("UPDATE entries SET last_access = ? WHERE key = ?",
+                               [(now, key) for key in found])
+        return found
+
+    def _put(self, entries, interval, ttl, now):
+        """Guarda {(key, ticker): DataFrame o None} y aplica el límite de tamaño."""
+        rows = []
+        for (key, ticker), df in entries.items():
+            if df is None:
+                rows.append((key, ticker, interval, None, 0, now, now + ttl, now))
+                continue
+            path = self._file_path(key)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            df.to_pickle(tmp_path)
+            size = os.path.getsize(tmp_path)  # Otro proceso podría desalojar el archivo tras el replace
+            os.replace(tmp_path, path)
+            rows.append((key, ticker, interval, os.path.basename(path), size, now, now + ttl, now))
+        with self._connect() as db:
+            db.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        self.evict()
+
+    def evict(self):
+        """Desaloja entradas vencidas y, si se supera max_bytes, las de acceso más antiguo (LRU)."""
+        now = time.time()
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                doomed = [row[0] for row in db.execute(
+                    "SELECT file FROM entries WHERE expires <= ? AND file IS NOT NULL", (now,))]
+                db.execute("DELETE FROM entries WHERE expires <= ?", (now,))
+                total = db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+                evicted = 0
+                if total > self.max_bytes:
+                    for key, file, size in db.execute(
+                            "SELECT key, file, size FROM entries ORDER BY last_access").fetchall():
+                        if total <= self.max_bytes:
+                            break
+                        db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                        if file is not None:
+                            doomed.append(file)
+                        total -= size
+                        evicted += 1
+                self._bump(db, evictions=evicted)
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+        # Los archivos se borran fuera de la transacción (los lectores toleran que falten)
+        for file in doomed:
+            with contextlib.suppress(OSError):
+                os.remove(os.path.join(self.files_dir, file))
+        if evicted:
+            METRICS.inc('cache_evictions', evicted)
+
+    def fetch(self, tickers, start, end=None, interval="1d"):
+        tickers = list(tickers)
+        if not tickers:
+            return {}
+        split = closed_before()
+        if end is not None or start is None or pd.Timestamp(start) >= split:
+            return self._fetch_range(tickers, start, end, interval)
+
+        # Pedido hasta hoy: las barras cerradas (antes de closed_before()) se guardan con el TTL
+        # largo y solo las últimas, que todavía pueden cambiar, con el TTL corto
+        split = split.strftime('%Y-%m-%d')
+        closed = self._fetch_range(tickers, start, split, interval)
+        current = self._fetch_range(tickers, split, None, interval)
+        frames = {}
+        for ticker in tickers:
+            parts = [part[ticker] for part in (closed, current) if ticker in part]
+            if parts:
+                frames[ticker] = parts[0] if len(parts) == 1 else normalize_ohlcv(pd.concat(parts))
+        return frames
+
+    def _fetch_range(self, tickers, start, end, interval):
+        """Consulta la caché para un rango fijo y descarga solo los tickers que faltan."""
+        now = time.time()
+        keys = {ticker: self._key(ticker, interval, start, end) for ticker in tickers}
+        try:
+            cached = self._get(list(keys.values()), now)
+        except sqlite3.Error as e:
+            print(f"WARN: Caché de descargas no disponible ({e}); se descarga sin caché")
+            return self.provider.fetch(tickers, start, end=end, interval=interval)
+
+        frames = {}
+        missing = []
+        for ticker in tickers:
+            if keys[ticker] not in cached:
+                missing.append(ticker)
+            elif cached[keys[ticker]] is not None:
+                frames[ticker] = cached[keys[ticker]]
+
+        hits = len(tickers) - len(missing)
+        METRICS.inc('cache_hits', hits, interval=interval)
+        METRICS.inc('cache_misses', len(missing), interval=interval)
+        if hits:
+            print(f"CACHÉ: {hits}/{len(tickers)} tickers servidos desde la caché ({interval})")
+
+        if missing:
+            downloaded = self.provider.fetch(missing, start, end=end, interval=interval)
+            entries = {}
+            for ticker in missing:
+                df = downloaded.get(ticker)
+                if df is not None and not df.empty:
+                    frames[ticker] = df = normalize_ohlcv(df)
+                    entries[(keys[ticker], ticker)] = df
+                elif self.cache_empty:
+                    entries[(keys[ticker], ticker)] = None
+            try:
+                self._put(entries, interval, self.ttl(interval, end), now)
+            except (sqlite3.Error, OSError) as e:
+                print(f"WARN: No se pudo guardar en la caché de descargas: {e}")
+
+        with contextlib.suppress(sqlite3.Error), self._connect() as db:
+            self._bump(db, hits=hits, misses=len(missing))
+        return frames
+
+    def stats(self):
+        """Estadísticas acumuladas de todos los procesos: aciertos, fallos, desalojos y tamaño."""
+        with self._connect() as db:
+            stats = dict(db.execute("SELECT name, value FROM stats").fetchall())
+            entries, size = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        hits, misses = stats.get('hits', 0), stats.get('misses', 0)
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+            'evictions': stats.get('evictions', 0),
+            'entries': entries,
+            'size_mb': size / 2 ** 20,
+        }
+
+    def clear(self):
+        """Vacía la caché (las estadísticas se conservan)."""
+        with self._connect() as db:
+            files = [row[0] for row in db.execute("SELECT file FROM entries WHERE file IS NOT NULL")]
+            db.execute("DELETE FROM entries")
+        for file in files:
+            with contextlib.suppress(OSError):
+                os.remove(os.path.join(self.files_dir, file))
+
+
+def print_cache_stats(provider):
+    """Imprime las estadísticas de la caché si el proveedor es un CachedProvider."""
+    if isinstance(provider, CachedProvider):
+        s = provider.stats()
+        print(f"CACHÉ: {s['hits']} aciertos / {s['misses']} fallos ({s['hit_rate']:.0%}), "
+              f"{s['entries']} entradas, {s['size_mb']:.1f} MB, {s['evictions']} desalojos")
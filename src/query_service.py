@@ -0,0 +1,302 @@
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from .data_watcher import MarketDataSource
+from .metrics import METRICS
+from .output_writers import load_manifest
+from .schema import EXPORT_DECIMALS, RUN_TIMESTAMP_KEY, load_metadata
+from .signal_events import EVENT_COLUMNS, EVENT_TYPES, SignalEventLog
+
+FORMATS = {'csv': "text/csv", 'json': "application/json"}
+
+
+class QueryError(ValueError):
+    """Parámetros de consulta inválidos (respuesta 400)."""
+
+
+class DataSnapshot:
+    """
+    Versión inmutable del dataset publicada por el servicio: índice ticker/fecha y un hash del
+    contenido de cada ticker (suma de los hashes de sus filas). Las consultas de un ticker
+    cuyo contenido no cambió conservan su ETag aunque el ciclo haya actualizado otros tickers.
+    """
+    def __init__(self, index, timestamp=None, summary=""):
+        self.index = index
+        self.timestamp = timestamp
+        self.summary = summary
+        self.columns = [c for c in index.df.columns if c not in ('Year', 'Month')]
+        self.rows = len(index.df)
+
+        hashes = pd.util.hash_pandas_object(index.df[self.columns], index=False).to_numpy()
+        spans = index.runs.groupby('ticker', sort=False, observed=True).agg(start=('start', 'min'),
+                                                                             stop=('stop', 'max'))
+        self.spans = {str(ticker): (int(start), int(stop))
+                      for ticker, start, stop in spans.itertuples()}
+        starts = np.array([start for start, _ in self.spans.values()], dtype=np.int64)
+        digests = np.add.reduceat(hashes, starts) if len(starts) else []
+        self.digests = {ticker: f"{int(d):016x}" for ticker, d in zip(self.spans, digests)}
+        self.digest = hashlib.sha1("".join(self.digests.values()).encode()).hexdigest()[:16]
+
+    def tickers(self):
+        return list(self.spans)
+
+    def etag(self, query):
+        """ETag de una consulta: parámetros + contenido de los tickers involucrados."""
+        parts = [repr(sorted(query.items())), ",".join(self.columns)]
+        if query['tickers'] is None:
+            parts.append(self.digest)
+        else:
+            parts += [f"{t}:{self.digests.get(t, '-')}" for t in query['tickers']]
+        return '"' + hashlib.sha1("|".join(parts).encode()).hexdigest()[:24] + '"'
+
+    def select(self, query):
+        """Filas de la consulta: rangos contiguos por ticker y búsqueda binaria por fecha."""
+        df = self.index.df
+        tickers = query['tickers'] if query['tickers'] is not None else self.tickers()
+        parts = []
+        for ticker in tickers:
+            if ticker not in self.spans:
+                continue
+            start, stop = self.spans[ticker]
+            dates = df['Date'].to_numpy()[start:stop]
+            if query['start'] is not None:
+                start += int(np.searchsorted(dates, np.datetime64(query['start']), side='left'))
+            if query['end'] is not None:
+                stop = self.spans[ticker][0] + int(np.searchsorted(dates, np.datetime64(query['end']),
+                                                                   side='right'))
+            if stop > start:
+                parts.append((start, stop))
+        columns = list(query['columns'] or self.columns)
+        if len(parts) == 1:
+            return df.iloc[parts[0][0]:parts[0][1]][columns]
+        rows = np.concatenate([np.arange(a, b) for a, b in parts]) if parts else np.zeros(0, dtype=np.int64)
+        return df[columns].take(rows)
+
+
+def _serialize(df, fmt):
+    if fmt == 'json':
+        # to_json escribe los float32 con el ruido de su conversión a float64 (2.4073998928):
+        # se pasan a float64 redondeados a la precisión exportada, igual que en el CSV
+        float32 = [c for c in df.columns if df[c].dtype == np.float32]
+        if float32:
+            df = df.astype({c: np.float64 for c in float32}).round({c: EXPORT_DECIMALS for c in float32})
+        return df.to_json(orient='records', date_format='iso', date_unit='s')
+    return df.to_csv(index=False)
+
+
+class QueryService:
+    """
+    Servicio HTTP local de solo lectura sobre los últimos datos procesados (en memoria).
+
+    - GET /query?ticker=AAPL,MSFT&start=2024-01-01&end=2024-06-30&columns=Date,Close&format=csv|json
+      Todos los parámetros son opcionales (sin 'ticker' = todos los tickers).
+    - GET /status: versión publicada, marca del bot, filas y tickers.
+    - GET /events?ticker=AAPL&event=GOLDEN_CROSS&start=2024-01-01&format=json: eventos de señal
+      vigentes, leídos por el índice del registro (con 'events_path').
+
+    Cada respuesta lleva un ETag; con If-None-Match igual se responde 304 sin cuerpo. Un hilo
+    de fondo recarga los datos con MarketDataSource (stat del archivo cada 'poll_seconds', o
+    al instante con notify() al terminar un ciclo; con el dataset particionado solo relee las
+    particiones modificadas) y publica la nueva versión reemplazando una sola referencia:
+    cada consulta trabaja sobre la versión que tomó al empezar, nunca sobre datos a medias.
+    """
+    def __init__(self, data_path, dataset_dir, poll_seconds=10, cache_size=64, events_path=None):
+        self.source = MarketDataSource(data_path, dataset_dir)
+        self.events_path = events_path
+        self.poll_seconds = poll_seconds
+        self.snapshot = None
+        self.server = None
+        self._wake = threading.Event()
+        # Respuestas serializadas recientes (ETag, formato) -> bytes
+        self._responses = OrderedDict()
+        self._responses_lock = threading.Lock()
+        self.cache_size = cache_size
+
+    # --- Carga ---
+
+    def refresh(self):
+        """Carga los datos si cambiaron y publica la nueva versión. True si hubo cambio."""
+        if self.snapshot is not None and not self.source.changed():
+            return False
+        with METRICS.timer('query_service_load'):
+            index, summary = self.source.load(incremental=self.snapshot is not None)
+            if self.source.partitions is not None:
+                metadata = load_manifest(self.source.dataset_dir)
+            else:
+                metadata = load_metadata(self.source.data_path) or {}
+            snapshot = DataSnapshot(index, metadata.get(RUN_TIMESTAMP_KEY), summary)
+        self.snapshot = snapshot
+        with self._responses_lock:
+            self._responses.clear()
+        print(f"CONSULTAS: Datos publicados ({snapshot.rows} filas; {summary})")
+        return True
+
+    def notify(self):
+        """Avisa que terminó un ciclo: la recarga no espera al siguiente sondeo."""
+        self._wake.set()
+
+    def _watch(self):
+        while True:
+            self._wake.wait(self.poll_seconds)
+            self._wake.clear()
+            try:
+                self.refresh()
+            except FileNotFoundError:
+                pass  # El bot todavía no escribió datos
+            except Exception as e:
+                print(f"ERROR recargando datos del servicio de consultas: {e}")
+                METRICS.failure('query_service', e)
+
+    # --- Consultas ---
+
+    @staticmethod
+    def parse_query(params, columns):
+        """Normaliza los parámetros de /query. Lanza QueryError si alguno es inválido."""
+        def values(name):
+            return [v.strip() for raw in params.get(name, []) for v in raw.split(',') if v.strip()]
+
+        tickers = values('ticker') or None
+        requested = values('columns') or None
+        if requested:
+            unknown = [c for c in requested if c not in columns]
+            if unknown:
+                raise QueryError(f"Columnas desconocidas: {', '.join(unknown)}")
+        fmt = (values('format') or ['csv'])[0].lower()
+        if fmt not in FORMATS:
+            raise QueryError(f"Formato no soportado: {fmt} (csv o json)")
+        bounds = {}
+        for name in ('start', 'end'):
+            value = values(name)
+            try:
+                bounds[name] = pd.Timestamp(value[0]).isoformat() if value else None
+            except ValueError:
+                raise QueryError(f"Fecha inválida en '{name}': {value[0]}")
+        return {'tickers': tuple(tickers) if tickers else None, 'start': bounds['start'],
+                'end': bounds['end'], 'columns': tuple(requested) if requested else None, 'format': fmt}
+
+    def events(self, params):
+        """(ETag, función que serializa) de /events. El registro es append-only: su tamaño lo versiona."""
+        query = self.parse_query(params, EVENT_COLUMNS)
+        event = (params.get('event') or [None])[0]
+        if event is not None and event not in EVENT_TYPES:
+            raise QueryError(f"Evento desconocido: {event} ({', '.join(EVENT_TYPES)})")
+        if query['tickers'] is not None and len(query['tickers']) > 1:
+            raise QueryError("/events admite un solo ticker")
+        log = SignalEventLog(self.events_path, read_only=True)
+        key = repr(sorted(query.items())) + f"|{event}|{log.index.get('size', 0)}"
+        etag = '"' + hashlib.sha1(key.encode()).hexdigest()[:24] + '"'
+
+        def body():
+            df = log.query(query['tickers'][0] if query['tickers'] else None, event,
+                           query['start'], query['end'])
+            return _serialize(df[list(query['columns'] or EVENT_COLUMNS)], query['format']).encode('utf-8')
+        return query, etag, body
+
+    def response(self, snapshot, query, etag):
+        """Cuerpo serializado de la consulta (reutiliza el de una consulta idéntica reciente)."""
+        key = (etag, query['format'])
+        with self._responses_lock:
+            if key in self._responses:
+                self._responses.move_to_end(key)
+                return self._responses[key]
+        with METRICS.timer('query_service', output=query['format']):
+            body = _serialize(snapshot.select(query), query['format']).encode('utf-8')
+        with self._responses_lock:
+            self._responses[key] = body
+            if len(self._responses) > self.cache_size:
+                self._responses.popitem(last=False)
+        return body
+
+    def status(self, snapshot):
+        return {'version': snapshot.digest, RUN_TIMESTAMP_KEY: snapshot.timestamp,
+                'rows': snapshot.rows, 'columns': snapshot.columns, 'tickers': snapshot.tickers()}
+
+    # --- Servidor ---
+
+    def start(self, port=9110, host="127.0.0.1"):
+        """Carga inicial, hilo de recarga y servidor HTTP en hilos de fondo."""
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlsplit(self.path)
+                snapshot = service.snapshot  # Versión fija para toda la consulta
+                if url.path == "/events" and service.events_path:
+                    self._events(parse_qs(url.query))
+                    return
+                if url.path not in ("/query", "/status"):
+                    self.send_error(404)
+                    return
+                if snapshot is None:
+                    self.send_error(503, "Datos aún no disponibles")
+                    return
+                if url.path == "/status":
+                    self._send(200, json.dumps(service.status(snapshot)).encode('utf-8'),
+                               "application/json", f'"{snapshot.digest}"')
+                    return
+                try:
+                    query = service.parse_query(parse_qs(url.query), snapshot.columns)
+                except QueryError as e:
+                    self.send_error(400, str(e))
+                    return
+                etag = snapshot.etag(query)
+                if self._not_modified(etag):
+                    return
+                try:
+                    body = service.response(snapshot, query, etag)
+                except Exception as e:
+                    METRICS.failure('query_service', e)
+                    self.send_error(500, str(e))
+                    return
+                self._send(200, body, FORMATS[query['format']], etag, snapshot.timestamp)
+
+            def _events(self, params):
+                try:
+                    query, etag, body = service.events(params)
+                except QueryError as e:
+                    self.send_error(400, str(e))
+                    return
+                if self._not_modified(etag):
+                    return
+                self._send(200, body(), FORMATS[query['format']], etag)
+
+            def _not_modified(self, etag):
+                if etag not in [t.strip() for t in self.headers.get("If-None-Match", "").split(",")]:
+                    return False
+                METRICS.inc('query_service_not_modified')
+                self._send(304, None, None, etag)
+                return True
+
+            def _send(self, code, body, content_type, etag, timestamp=None):
+                self.send_response(code)
+                self.send_header("ETag", etag)
+                # Los clientes pueden guardar la respuesta pero deben revalidarla (304) en cada uso
+                self.send_header("Cache-Control", "no-cache")
+                if timestamp:
+                    self.send_header("X-Data-Timestamp", timestamp)
+                if body is not None:
+                    self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+                    self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if body is not None:
+                    self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Sin ruido en la consola del bot
+
+        try:
+            self.refresh()
+        except FileNotFoundError:
+            print("WARN: Servicio de consultas sin datos todavía; se cargarán al terminar el primer ciclo")
+        threading.Thread(target=self._watch, name="query-service-watch", daemon=True).start()
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self.server.serve_forever, name="query-service", daemon=True).start()
+        print(f"CONSULTAS: Servidor en http://{host}:{self.server.server_address[1]}/query")
+        return self.server
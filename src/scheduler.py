@@ -0,0 +1,161 @@
+import asyncio
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+from zoneinfo import ZoneInfo
+
+
+class MarketHours:
+    """
+    Horario de mercado en la zona horaria de la bolsa (por defecto NYSE/NASDAQ).
+    'post_close_minutes' permite un último escaneo después del cierre para capturar
+    el precio de cierre oficial. No contempla feriados bursátiles.
+    """
+    def __init__(self, tz="America/New_York", open_time="09:30", close_time="16:00",
+                 weekdays=(0, 1, 2, 3, 4), post_close_minutes=20):
+        self.tz = ZoneInfo(tz)
+        self.open_time = datetime.time.fromisoformat(open_time)
+        self.close_time = datetime.time.fromisoformat(close_time)
+        self.weekdays = set(weekdays)
+        self.post_close = datetime.timedelta(minutes=post_close_minutes)
+
+    def is_open(self, now=None):
+        now = (now or datetime.datetime.now(datetime.timezone.utc)).astimezone(self.tz)
+        if now.weekday() not in self.weekdays:
+            return False
+        opens = now.replace(hour=self.open_time.hour, minute=self.open_time.minute, second=0, microsecond=0)
+        closes = now.replace(hour=self.close_time.hour, minute=self.close_time.minute, second=0, microsecond=0)
+        return opens <= now <= closes + self.post_close
+
+
+class AssetClassSchedule:
+    """
+    Cadencia de escaneo para un grupo de activos.
+    market_hours=None significa mercado 24/7 (cripto).
+    """
+    def __init__(self, name, tickers, interval_minutes, market_hours=None):
+        self.name = name
+        self.tickers = list(tickers)
+        self.interval = interval_minutes * 60
+        self.market_hours = market_hours
+        # Hay un ciclo de este grupo en cola o en curso (fetch/compute)
+        self.busy = False
+        self.ticks = 0
+        self.skipped = 0
+        self.closed = 0
+
+    def is_active(self):
+        return self.market_hours is None or self.market_hours.is_open()
+
+
+class PipelineScheduler:
+    """
+    Planificador asyncio con cadencia fija (sin deriva) y tres etapas encadenadas por colas
+    acotadas: descarga -> cálculo -> publicación.
+
+    - Cada grupo de activos tiene su propio intervalo y, opcionalmente, horario de mercado.
+    - Los ticks se calculan sobre un reloj absoluto (inicio + n * intervalo), así que la
+      duración del trabajo no desplaza el siguiente escaneo.
+    - Si el ciclo anterior del grupo sigue en curso, el tick se omite (no se acumulan).
+    - La publicación se coalesce: si hay una pendiente, solo se publica el estado más reciente.
+
+    Cada etapa corre en su propio hilo (las operaciones de red, pandas y git son bloqueantes).
+    """
+    def __init__(self, schedules, fetch, compute, publish=None, run_immediately=True):
+        self.schedules = schedules
+        self.fetch = fetch
+        self.compute = compute
+        self.publish = publish
+        self.run_immediately = run_immediately
+        self._executors = {
+            stage: ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"stage-{stage}")
+            for stage in ('fetch', 'compute', 'publish')
+        }
+
+    async def _run_stage(self, stage, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executors[stage], func, *args)
+
+    async def _ticker(self, schedule, fetch_queue):
+        """Genera ticks con cadencia fija para un grupo de activos."""
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        first = True
+        while True:
+            if first and self.run_immediately:
+                # Primer escaneo siempre (incluso con mercado cerrado) para tener datos al arrancar
+                active = True
+            else:
+                active = schedule.is_active()
+            first = False
+
+            if not active:
+                schedule.closed += 1
+            elif schedule.busy:
+                schedule.skipped += 1
+                print(f"[{schedule.name}] Ciclo anterior en curso: se omite este tick "
+                      f"({schedule.skipped} omitidos)")
+            else:
+                schedule.busy = True
+                schedule.ticks += 1
+                fetch_queue.put_nowait(schedule)
+
+            # Siguiente tick sobre el reloj absoluto; si nos atrasamos, saltar los perdidos
+            next_tick += schedule.interval
+            now = loop.time()
+            if next_tick < now:
+                missed = int((now - next_tick) // schedule.interval) + 1
+                next_tick += missed * schedule.interval
+            await asyncio.sleep(next_tick - now)
+
+    async def _fetch_worker(self, fetch_queue, compute_queue):
+        while True:
+            schedule = await fetch_queue.get()
+            try:
+                payload = await self._run_stage('fetch', self.fetch, schedule.tickers)
+                # Cola acotada: si el cálculo va atrasado la descarga espera (contrapresión)
+                await compute_queue.put((schedule, payload))
+            except Exception as e:
+                print(f"[{schedule.name}] ERROR en descarga: {e}")
+                schedule.busy = False
+
+    async def _compute_worker(self, compute_queue, publish_queue):
+        while True:
+            schedule, payload = await compute_queue.get()
+            try:
+                success = await self._run_stage('compute', self.compute, payload)
+            except Exception as e:
+                print(f"[{schedule.name}] ERROR en cálculo: {e}")
+                success = False
+            finally:
+                schedule.busy = False
+
+            if success and self.publish is not None:
+                # Coalescer: si ya hay una publicación pendiente, basta con una
+                if publish_queue.full():
+                    publish_queue.get_nowait()
+                publish_queue.put_nowait(schedule.name)
+
+    async def _publish_worker(self, publish_queue):
+        while True:
+            name = await publish_queue.get()
+            try:
+                await self._run_stage('publish', self.publish)
+            except Exception as e:
+                print(f"[{name}] ERROR en publicación: {e}")
+
+    async def run(self):
+        fetch_queue = asyncio.Queue(maxsize=len(self.schedules))
+        compute_queue = asyncio.Queue(maxsize=1)
+        publish_queue = asyncio.Queue(maxsize=1)
+
+        tasks = [asyncio.create_task(self._ticker(s, fetch_queue)) for s in self.schedules]
+        tasks.append(asyncio.create_task(self._fetch_worker(fetch_queue, compute_queue)))
+        tasks.append(asyncio.create_task(self._compute_worker(compute_queue, publish_queue)))
+        tasks.append(asyncio.create_task(self._publish_worker(publish_queue)))
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            for executor in self._executors.values():
+                executor.shutdown(wait=False, cancel_futures=True)
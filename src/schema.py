@@ -0,0 +1,170 @@
+import os
+import json
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from .indicator_engine import SIGNAL_BEARISH, SIGNAL_BULLISH
+
+# Versión del esquema del dataset exportado. Cambios respecto a la versión 1:
+# - Ticker y Signal_Trend categóricos (diccionario en Parquet) + Signal_Code entero (0/1)
+# - retornos, RSI y volatilidad en float32; Volume entero
+# - Last_Updated ya no se repite en cada fila: es metadato del dataset (RUN_TIMESTAMP_KEY)
+SCHEMA_VERSION = 2
+RUN_TIMESTAMP_KEY = 'last_updated'
+RUN_TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Códigos de la señal de tendencia (Signal_Code) y categorías de Signal_Trend en ese orden
+SIGNAL_CATEGORIES = [SIGNAL_BEARISH, SIGNAL_BULLISH]
+SIGNAL_TREND_DTYPE = pd.CategoricalDtype(SIGNAL_CATEGORIES)
+
+# Decimales de los valores exportados (CSV, particiones y respuestas JSON)
+EXPORT_DECIMALS = 4
+# Columnas con valores acotados (porcentajes, oscilador 0-100): float32 conserva de sobra los
+# 4 decimales exportados. Los precios (y los indicadores en unidades de precio) siguen en
+# float64: un BTC de 100000.1234 necesita más dígitos de los que tiene float32.
+FLOAT32_COLUMNS = ['Daily_Return_Pct', 'Log_Return', 'Volatility_Annualized', 'RSI_14']
+CATEGORY_COLUMNS = ['Ticker', 'Timeframe', 'Ticker_B', 'Portfolio', 'Event']
+# Year/Month son nulos en las filas de totales ("Todos") del cubo de KPIs
+INTEGER_COLUMNS = {'Volume': 'int64', 'Signal_Code': 'int8', 'Year': 'Int16', 'Month': 'Int8',
+                   'Rows': 'int64', 'Return_Count': 'int64', 'Volatility_Count': 'int64',
+                   'Bullish_Count': 'int64', 'Observations': 'int64', 'Cancelled': 'int8',
+                   'Fast': 'int16', 'Slow': 'int16', 'RSI_Max': 'int16', 'Ticker_Count': 'int32',
+                   'Trades': 'int64'}
+DATE_COLUMNS = ['Date', 'First_Date', 'Last_Date', 'Logged_At']
+
+
+def column_dtype(name):
+    """Tipo de una columna del esquema (las columnas no listadas son float64)."""
+    if name in DATE_COLUMNS:
+        return 'datetime64[ns]'
+    if name == 'Signal_Trend':
+        return SIGNAL_TREND_DTYPE
+    if name in CATEGORY_COLUMNS:
+        return 'category'
+    if name in INTEGER_COLUMNS:
+        return INTEGER_COLUMNS[name]
+    if name in FLOAT32_COLUMNS:
+        return 'float32'
+    return 'float64'
+
+
+def schema_dtypes(columns):
+    """{columna: tipo} para 'columns' (como texto, para el manifiesto/metadatos)."""
+    return {c: str(column_dtype(c)) for c in columns}
+
+
+def add_signal_code(df):
+    """Agrega Signal_Code (1 = BULLISH, 0 = BEARISH) a partir de Signal_Trend."""
+    trend = df['Signal_Trend']
+    if not isinstance(trend.dtype, pd.CategoricalDtype) or list(trend.cat.categories) != SIGNAL_CATEGORIES:
+        trend = trend.astype(SIGNAL_TREND_DTYPE)
+    df['Signal_Code'] = trend.cat.codes.astype(np.int8)
+    return df
+
+
+def apply_schema(df, columns):
+    """
+    Selecciona 'columns' (las que existan), redondea a 4 decimales y convierte cada columna
+    a su tipo del esquema. Signal_Code se deriva de Signal_Trend si no viene calculado.
+    """
+    if 'Signal_Code' in columns and 'Signal_Code' not in df.columns and 'Signal_Trend' in df.columns:
+        df = add_signal_code(df.copy())
+    df = df[[c for c in columns if c in df.columns]].copy()
+    for column in df.columns:
+        dtype = column_dtype(column)
+        if column in DATE_COLUMNS:
+            df[column] = pd.to_datetime(df[column])
+        elif column == 'Volume':
+            # Barras sin volumen (índices, algunos FX) se exportan como 0
+            df[column] = df[column].fillna(0).round().astype(dtype)
+        elif dtype in ('float32', 'float64'):
+            df[column] = df[column].astype(float).round(EXPORT_DECIMALS).astype(dtype)
+        else:
+            df[column] = df[column].astype(dtype)
+    return df
+
+
+def cast_columns(df):
+    """Convierte cada columna de 'df' a su tipo del esquema (Date a datetime)."""
+    for column in df.columns:
+        if column in DATE_COLUMNS:
+            df[column] = pd.to_datetime(df[column], format='ISO8601')
+        elif df[column].dtype != column_dtype(column):
+            df[column] = df[column].astype(column_dtype(column))
+    return df
+
+
+def read_csv(path, columns=None, header=None, typed=True, float_precision=None):
+    """
+    Lee un CSV del dataset con tipos explícitos (sin inferencia). Con 'columns' solo se
+    parsean esas columnas. Archivos de la versión 1 (sin Signal_Code) se completan al leer.
+    'header' (columnas del archivo, ej: del manifiesto) evita leer el encabezado aparte.
+    Con typed=False solo se fijan las columnas de texto: para unir muchas particiones y
+    convertir una sola vez al final con cast_columns() (los tipos por archivo cuestan más).
+    float_precision='round_trip' recupera exactamente los float64 sin redondear (cubo de KPIs).
+    """
+    if header is None:
+        header = pd.read_csv(path, nrows=0).columns
+    wanted = list(columns or header)
+    present = [c for c in wanted if c in header]
+    if 'Signal_Code' in wanted and 'Signal_Code' not in header and 'Signal_Trend' in header:
+        present.append('Signal_Trend')
+
+    if not typed:
+        # Un ticker "NA" o "NAN" no debe leerse como valor faltante
+        text = {c: str for c in present if c in CATEGORY_COLUMNS}
+        return complete_columns(pd.read_csv(path, usecols=present, dtype=text), wanted)
+    dtypes = {c: column_dtype(c) for c in present if c not in DATE_COLUMNS}
+    dates = [c for c in present if c in DATE_COLUMNS] or None
+    df = pd.read_csv(path, usecols=present, dtype=dtypes, parse_dates=dates, date_format='ISO8601',
+                     float_precision=float_precision)
+    return complete_columns(df, wanted)
+
+
+def complete_columns(df, columns):
+    """Deriva Signal_Code si se pidió y falta (datos de la versión 1) y ordena las columnas."""
+    if 'Signal_Code' in columns and 'Signal_Code' not in df.columns and 'Signal_Trend' in df.columns:
+        df = add_signal_code(df)
+    order = [c for c in columns if c in df.columns]
+    return df if order == list(df.columns) else df[order]
+
+
+# --- Metadatos del dataset (una sola marca de tiempo por ejecución) ---
+
+def run_timestamp(now=None):
+    return (now or datetime.datetime.now()).strftime(RUN_TIMESTAMP_FORMAT)
+
+
+def dataset_metadata(columns, timestamp=None):
+    """Metadatos de una salida: versión del esquema, tipos de columna y marca de la ejecución."""
+    return {
+        'schema_version': SCHEMA_VERSION,
+        RUN_TIMESTAMP_KEY: timestamp or run_timestamp(),
+        'columns': schema_dtypes(columns),
+        'signal_codes': {str(code): label for code, label in enumerate(SIGNAL_CATEGORIES)},
+    }
+
+
+def metadata_path(csv_path):
+    """Archivo de metadatos que acompaña a un CSV (ej: financial_market_data.schema.json)."""
+    return os.path.splitext(csv_path)[0] + ".schema.json"
+
+
+def write_metadata(csv_path, columns, timestamp=None):
+    path = metadata_path(csv_path)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(dataset_metadata(columns, timestamp), f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_metadata(csv_path):
+    """Metadatos de un CSV (None si no existen: archivo de la versión 1 del esquema)."""
+    path = metadata_path(csv_path)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
@@ -0,0 +1,295 @@
+import os
+import time
+import datetime
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import pandas as pd
+
+from .metrics import METRICS
+from .ohlcv_store import OHLCVStore
+from .output_writers import PartitionedDatasetWriter, prepare_export
+from .vectorized_indicators import compute_indicators_vectorized, frames_to_long
+
+
+def load_universe(path):
+    """
+    Lee el archivo de universo: un ticker por línea (también se aceptan varios separados
+    por comas). Las líneas vacías y los comentarios (#) se ignoran; se eliminan duplicados.
+    """
+    tickers = []
+    seen = set()
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.split('#', 1)[0]
+            for ticker in line.replace(',', ' ').split():
+                ticker = ticker.strip().upper()
+                if ticker and ticker not in seen:
+                    seen.add(ticker)
+                    tickers.append(ticker)
+    return tickers
+
+
+def make_shards(tickers, shard_size):
+    """Divide la lista de tickers en bloques de 'shard_size'."""
+    return [tickers[i:i + shard_size] for i in range(0, len(tickers), shard_size)]
+
+
+def compute_shard(store_root, tickers, history_start, columns=None):
+    """
+    Trabajo de cómputo de un shard (se ejecuta en un proceso del pool).
+    Lee las barras del almacén local y calcula los indicadores pedidos de forma vectorizada.
+    """
+    store = OHLCVStore(store_root)
+    frames = {}
+    for ticker in tickers:
+        df = store.load(ticker, start=history_start)
+        if not df.empty:
+            frames[ticker] = df
+    if not frames:
+        return None
+    return compute_indicators_vectorized(frames_to_long(frames, tickers), columns)
+
+
+def _compute_shard_job(store_root, tickers, history_start, columns=None, delay=0.0):
+    """
+    Envoltura para el pool de procesos: devuelve (resultado, segundos de cálculo).
+    'delay' es la espera de un reintento (se cumple en el proceso de trabajo, no en el bucle principal).
+    """
+    if delay:
+        time.sleep(delay)
+    t0 = time.perf_counter()
+    df = compute_shard(store_root, tickers, history_start, columns)
+    return df, time.perf_counter() - t0
+
+
+class ShardResult:
+    """Resultado y tiempos de un shard para el resumen del ciclo."""
+    def __init__(self, shard_id, tickers):
+        self.shard_id = shard_id
+        self.tickers = tickers
+        self.fetch_seconds = 0.0
+        self.compute_seconds = 0.0
+        self.write_seconds = 0.0
+        self.rows = 0
+        self.attempts = 0
+        self.compute_attempts = 0
+        self.failed_tickers = []
+        self.error = None
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+class ShardedPipeline:
+    """
+    Pipeline para universos grandes (miles de tickers):
+
+    1. Divide el universo en shards de 'shard_size' tickers.
+    2. Descarga cada shard con concurrencia acotada ('fetch_workers' hilos).
+    3. Calcula cada shard en un pool de procesos ('compute_workers') con la ruta vectorizada.
+    4. Escribe cada shard en cuanto termina (nunca se junta el dataset completo en memoria) y
+       publica la salida una sola vez al final del ciclo (CSV o manifiesto del dataset).
+
+    Cada shard tiene reintentos propios con espera creciente, tanto en la descarga como en el
+    cálculo; si agota los reintentos se procesa ticker por ticker para aislar el símbolo
+    problemático sin abortar el ciclo. La escritura de un shard es todo o nada: si falla, el
+    shard no deja filas parciales ni actualiza el cubo de KPIs, los eventos ni las correlaciones.
+    """
+    def __init__(self, engine, shard_size=200, fetch_workers=4, compute_workers=None,
+                 max_retries=2, retry_backoff=2.0):
+        self.engine = engine
+        self.shard_size = shard_size
+        self.fetch_workers = fetch_workers
+        self.compute_workers = compute_workers or os.cpu_count() or 1
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+
+    # --- Etapas con reintentos ---
+
+    def _with_retries(self, func, *args):
+        last_error = None
+        for attempt in range(1, self.max_retries + 2):
+            try:
+                return func(*args), attempt
+            except Exception as e:
+                last_error = e
+                if attempt <= self.max_retries:
+                    time.sleep(self.retry_backoff * attempt)
+        raise last_error
+
+    def _fetch_shard(self, result, cycle=None):
+        """Descarga un shard; si falla tras los reintentos, aísla ticker por ticker."""
+        t0 = time.perf_counter()
+        # Los hilos del pool no heredan el ciclo activo: se pasa explícitamente
+        with METRICS.activate(cycle):
+            try:
+                _, result.attempts = self._with_retries(self.engine.update_store, result.tickers)
+            except Exception as e:
+                print(f"WARN: Shard {result.shard_id} falló la descarga ({e}); aislando tickers...")
+                METRICS.inc('shard_retries_exhausted', stage='download')
+                for ticker in result.tickers:
+                    try:
+                        self.engine.update_store([ticker])
+                    except Exception as ticker_error:
+                        print(f"ERROR: {ticker} excluido del ciclo: {ticker_error}")
+                        METRICS.failure('download', ticker_error, ticker)
+                        result.failed_tickers.append(ticker)
+        result.fetch_seconds = time.perf_counter() - t0
+        return result
+
+    def _compute_isolated(self, result, history_start):
+        """Cálculo ticker por ticker en el proceso principal (tras un fallo del shard)."""
+        frames = []
+        for ticker in result.tickers:
+            if ticker in result.failed_tickers:
+                continue
+            try:
+                df = compute_shard(self.engine.store.root_dir, [ticker], history_start,
+                                   self.engine.indicator_columns)
+                if df is not None:
+                    frames.append(df)
+            except Exception as e:
+                print(f"ERROR: {ticker} excluido del ciclo: {e}")
+                METRICS.failure('indicator', e, ticker)
+                result.failed_tickers.append(ticker)
+        return frames
+
+    # --- Ejecución ---
+
+    def run(self, tickers):
+        """Ejecuta un ciclo completo sobre 'tickers'. Devuelve el resumen del ciclo (dict)."""
+        cycle_start = time.perf_counter()
+        history_start = self.engine.history_start()
+        shards = [ShardResult(i, shard) for i, shard in enumerate(make_shards(tickers, self.shard_size))]
+        print(f"PIPELINE: {len(tickers)} tickers en {len(shards)} shards "
+              f"({self.fetch_workers} hilos de descarga, {self.compute_workers} procesos de cálculo)")
+
+        writer = self.engine.writer
+        # Ambos writers escriben por lotes: un shard por append() y una sola publicación al final
+        # (el CSV se reemplaza de forma atómica; el dataset publica un solo manifiesto por ciclo)
+        writer.begin()
+        run_timestamp = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        total_rows = 0
+        cycle = METRICS.current_cycle()
+
+        with ThreadPoolExecutor(max_workers=self.fetch_workers) as fetch_pool, \
+                ProcessPoolExecutor(max_workers=self.compute_workers) as compute_pool:
+            stages = {fetch_pool.submit(self._fetch_shard, shard, cycle): ('fetch', shard) for shard in shards}
+            pending = set(stages)
+
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, shard = stages.pop(future)
+
+                    if stage == 'fetch':
+                        # Cada shard descargado pasa directamente al pool de cálculo
+                        compute_future = self._submit_compute(compute_pool, shard, history_start)
+                        stages[compute_future] = ('compute', shard)
+                        pending.add(compute_future)
+                        continue
+
+                    # Cada shard calculado se escribe en cuanto termina
+                    try:
+                        df, shard.compute_seconds = future.result()
+                        frames = [df]
+                    except Exception as e:
+                        if shard.compute_attempts <= self.max_retries:
+                            print(f"WARN: Shard {shard.shard_id} falló el cálculo ({e}); "
+                                  f"reintento {shard.compute_attempts}/{self.max_retries}...")
+                            try:
+                                retry_future = self._submit_compute(
+                                    compute_pool, shard, history_start,
+                                    delay=self.retry_backoff * shard.compute_attempts)
+                                stages[retry_future] = ('compute', shard)
+                                pending.add(retry_future)
+                                continue
+                            except Exception as submit_error:
+                                e = submit_error  # Pool roto: se aísla en el proceso principal
+                        print(f"WARN: Shard {shard.shard_id} falló el cálculo ({e}); aislando tickers...")
+                        METRICS.inc('shard_retries_exhausted', stage='compute')
+                        t0 = time.perf_counter()
+                        frames = self._compute_isolated(shard, history_start)
+                        shard.compute_seconds = time.perf_counter() - t0
+                    # El cálculo corre en otro proceso: se registra el tiempo que devolvió el trabajo
+                    METRICS.observe('indicator', shard.compute_seconds, indicator='vectorized_shard')
+
+                    total_rows += self._write_shard(shard, frames, writer, run_timestamp)
+
+        with METRICS.timer('export', output='finalize'):
+            writer.commit(run_timestamp)
+            if isinstance(writer, PartitionedDatasetWriter):
+                writer.refresh_csv_view()
+        with METRICS.timer('kpi_cube'):
+            self.engine.kpi_cube.write(self.engine.data_timestamp())
+        # Correlaciones entre activos sobre el panel completo (cierres acumulados por shard)
+        self.engine.export_cross_asset()
+        METRICS.inc('rows_processed', total_rows)
+
+        summary = self._summary(shards, total_rows, time.perf_counter() - cycle_start)
+        self._print_summary(summary)
+        return summary
+
+    def _submit_compute(self, compute_pool, shard, history_start, delay=0.0):
+        shard.compute_attempts += 1
+        tickers_ok = [t for t in shard.tickers if t not in shard.failed_tickers]
+        return compute_pool.submit(_compute_shard_job, self.engine.store.root_dir, tickers_ok, history_start,
+                                   self.engine.indicator_columns, delay)
+
+    def _write_shard(self, shard, frames, writer, run_timestamp):
+        t0 = time.perf_counter()
+        try:
+            frames = [df for df in frames if df is not None and not df.empty]
+            if frames:
+                # Un solo lote por shard: la escritura es todo o nada (el CSV en streaming se
+                # recorta si falla; el manifiesto pendiente del dataset no incorpora el shard)
+                df = prepare_export(pd.concat(frames) if len(frames) > 1 else frames[0],
+                                    self.engine.export_columns)
+                writer.append(df)
+                shard.rows = len(df)
+                # Las salidas derivadas solo se actualizan con filas ya escritas.
+                # Cubo de KPIs: los tickers del shard se reagregan completos
+                self.engine.kpi_cube.update(df)
+                # Eventos de señal desde la última barra evaluada de cada ticker
+                self.engine.signal_events.update(df, timestamp=run_timestamp)
+                if self.engine.cross_asset is not None:
+                    self.engine.cross_asset.update_prices(df)
+        except Exception as e:
+            shard.error = str(e)
+            print(f"ERROR: No se pudo escribir el shard {shard.shard_id}: {e}")
+            METRICS.failure('export', e)
+        shard.write_seconds = time.perf_counter() - t0
+        METRICS.observe('export', shard.write_seconds, output='shard')
+        return shard.rows
+
+    def _summary(self, shards, total_rows, elapsed):
+        return {
+            'tickers': sum(len(s.tickers) for s in shards),
+            'shards': len(shards),
+            'rows': total_rows,
+            'seconds': round(elapsed, 3),
+            'failed_tickers': [t for s in shards for t in s.failed_tickers],
+            'failed_shards': [s.shard_id for s in shards if not s.ok],
+            'shard_timings': [
+                {
+                    'shard': s.shard_id,
+                    'tickers': len(s.tickers),
+                    'attempts': s.attempts,
+                    'compute_attempts': s.compute_attempts,
+                    'fetch_s': round(s.fetch_seconds, 3),
+                    'compute_s': round(s.compute_seconds, 3),
+                    'write_s': round(s.write_seconds, 3),
+                    'rows': s.rows,
+                }
+                for s in shards
+            ],
+        }
+
+    def _print_summary(self, summary):
+        print(f"{'Shard':>6} {'Tickers':>8} {'Descarga':>9} {'Cálculo':>8} {'Escritura':>10} {'Filas':>8}")
+        for t in summary['shard_timings']:
+            print(f"{t['shard']:>6} {t['tickers']:>8} {t['fetch_s']:>8.2f}s {t['compute_s']:>7.2f}s "
+                  f"{t['write_s']:>9.2f}s {t['rows']:>8}")
+        print(f"PIPELINE: {summary['rows']} filas en {summary['seconds']:.2f}s; "
+              f"tickers fallidos: {len(summary['failed_tickers'])}, shards fallidos: {len(summary['failed_shards'])}")
@@ -0,0 +1,266 @@
+import os
+import csv
+import json
+
+import numpy as np
+import pandas as pd
+
+from .metrics import METRICS
+from .schema import cast_columns, run_timestamp
+
+# Tipos de evento: cruces de medias (SMA_50 vs SMA_200) y cruces de los umbrales del RSI_14
+GOLDEN_CROSS = 'GOLDEN_CROSS'        # SMA_50 pasa por encima de SMA_200
+DEATH_CROSS = 'DEATH_CROSS'          # SMA_50 pasa por debajo de SMA_200
+RSI_ABOVE_70 = 'RSI_ABOVE_70'        # entra en sobrecompra
+RSI_BELOW_70 = 'RSI_BELOW_70'        # sale de sobrecompra
+RSI_BELOW_30 = 'RSI_BELOW_30'        # entra en sobreventa
+RSI_ABOVE_30 = 'RSI_ABOVE_30'        # sale de sobreventa
+EVENT_TYPES = [GOLDEN_CROSS, DEATH_CROSS, RSI_ABOVE_70, RSI_BELOW_70, RSI_BELOW_30, RSI_ABOVE_30]
+RSI_OVERBOUGHT = 70
+RSI_OVERSOLD = 30
+# Antigüedad máxima de una barra revisada respecto de la última evaluada (ver _active)
+REVISION_MARGIN = pd.Timedelta(days=60)
+
+# Value = diferencia SMA_50 - SMA_200 (cruces de medias) o RSI_14 (umbrales).
+# Cancelled = 1 anula un evento anterior (misma fecha/tipo) que desapareció con un cierre revisado
+EVENT_COLUMNS = ['Date', 'Ticker', 'Event', 'Close', 'Value', 'Cancelled', 'Logged_At']
+
+
+def detect_events(df):
+    """
+    Eventos de las filas de un ticker ordenadas por fecha (Date, Close, SMA_50, SMA_200,
+    RSI_14). Cada fila se compara con la anterior: la primera fila solo aporta el estado previo.
+    Un cruce exige ambos valores definidos (sin eventos falsos cuando SMA_200 empieza a existir).
+    """
+    spread = (df['SMA_50'].to_numpy(dtype=np.float64) - df['SMA_200'].to_numpy(dtype=np.float64))
+    rsi = df['RSI_14'].to_numpy(dtype=np.float64)
+    prev_spread, cur_spread = spread[:-1], spread[1:]
+    prev_rsi, cur_rsi = rsi[:-1], rsi[1:]
+    with np.errstate(invalid='ignore'):
+        masks = [
+            (GOLDEN_CROSS, (prev_spread <= 0) & (cur_spread > 0), cur_spread),
+            (DEATH_CROSS, (prev_spread > 0) & (cur_spread <= 0), cur_spread),
+            (RSI_ABOVE_70, (prev_rsi <= RSI_OVERBOUGHT) & (cur_rsi > RSI_OVERBOUGHT), cur_rsi),
+            (RSI_BELOW_70, (prev_rsi > RSI_OVERBOUGHT) & (cur_rsi <= RSI_OVERBOUGHT), cur_rsi),
+            (RSI_BELOW_30, (prev_rsi >= RSI_OVERSOLD) & (cur_rsi < RSI_OVERSOLD), cur_rsi),
+            (RSI_ABOVE_30, (prev_rsi < RSI_OVERSOLD) & (cur_rsi >= RSI_OVERSOLD), cur_rsi),
+        ]
+    dates = pd.to_datetime(df['Date']).to_numpy()[1:]
+    closes = df['Close'].to_numpy(dtype=np.float64)[1:]
+    events = []
+    for event, mask, values in masks:
+        for i in np.flatnonzero(mask):
+            events.append((pd.Timestamp(dates[i]), event, closes[i], values[i]))
+    events.sort(key=lambda e: (e[0], EVENT_TYPES.index(e[1])))
+    return events
+
+
+class SignalEventLog:
+    """
+    Detector de eventos de señal en streaming con registro append-only.
+
+    - Estado por ticker: fecha de la última barra evaluada. En cada ciclo solo se evalúan las
+      barras desde esa fecha (la barra del día sigue abierta y se reevalúa) o desde la primera
+      barra revisada ('since'), comparando con la barra anterior: nunca se recorre la historia.
+      La primera vez que aparece un ticker se registra su historia completa (una sola vez).
+    - Registro: data/signal_events.csv, solo se agregan líneas. Si un cierre revisado hace
+      desaparecer un evento ya registrado se agrega una línea con Cancelled = 1.
+    - Índice: data/signal_events.index.json con el desplazamiento (byte) de cada línea por
+      ticker y tipo de evento, más el estado por ticker. query() lee solo las líneas pedidas.
+      Si el registro y el índice no coinciden (corte a mitad de escritura) se reconstruye.
+      Con read_only=True (lectores de otros procesos) se usa el índice tal cual: sus
+      desplazamientos siguen siendo válidos aunque el bot esté agregando líneas.
+    """
+    def __init__(self, path, read_only=False):
+        self.path = path
+        self.index_path = os.path.splitext(path)[0] + ".index.json"
+        self.index = {'size': 0, 'tickers': {}}
+        self.read_only = read_only
+        self.load()
+
+    # --- Persistencia ---
+
+    def load(self):
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                self.index = json.load(f)
+        if not self.read_only and self.index.get('size') != size:
+            print("WARN: Índice de eventos desfasado; reconstruyendo desde el registro")
+            self._rebuild(size)
+
+    def _rebuild(self, size):
+        """Índice a partir del registro (conserva el estado por ticker del índice anterior)."""
+        last_dates = {t: entry.get('last_date') for t, entry in self.index.get('tickers', {}).items()}
+        self.index = {'size': 0, 'tickers': {}}
+        if size:
+            with open(self.path, 'rb') as f:
+                f.readline()  # encabezado
+                offset = f.tell()
+                for line in iter(f.readline, b''):
+                    if not line.endswith(b'\n'):
+                        break  # línea incompleta (corte a mitad de escritura): se descarta
+                    record = self._parse(line)
+                    self._add(record['Ticker'], record['Event'], offset)
+                    entry = self.index['tickers'][record['Ticker']]
+                    if not last_dates.get(record['Ticker']) and record['Date'] > (entry.get('last_date') or ''):
+                        entry['last_date'] = record['Date']
+                    offset = f.tell()
+            if offset != size:
+                with open(self.path, 'r+b') as f:
+                    f.truncate(offset)
+        for ticker, last_date in last_dates.items():
+            if last_date:
+                self.index['tickers'].setdefault(ticker, {'last_date': None, 'events': {}})['last_date'] = last_date
+        self.index['size'] = offset if size else 0
+        self._save_index()
+
+    def _save_index(self):
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f)
+        os.replace(tmp_path, self.index_path)
+
+    def _add(self, ticker, event, offset):
+        entry = self.index['tickers'].setdefault(ticker, {'last_date': None, 'events': {}})
+        entry['events'].setdefault(event, []).append(offset)
+
+    @staticmethod
+    def _parse(line):
+        return dict(zip(EVENT_COLUMNS, next(csv.reader([line.decode('utf-8')]))))
+
+    def _read(self, offsets):
+        """Registros de las líneas en 'offsets' (lectura directa con seek, sin recorrer el archivo)."""
+        records = []
+        with open(self.path, 'rb') as f:
+            for offset in offsets:
+                f.seek(offset)
+                records.append(self._parse(f.readline()))
+        return records
+
+    # --- Detección ---
+
+    def _active(self, ticker, start):
+        """
+        {(fecha, evento): registro} vigentes del ticker con fecha >= 'start'. Se lee el índice
+        desde el final: las líneas se escriben casi en orden de fecha (una revisión puede agregar
+        una fecha algo anterior), así que la lectura se corta 'REVISION_MARGIN' antes de 'start'.
+        """
+        active = {}
+        stop = (pd.Timestamp(start) - REVISION_MARGIN).strftime('%Y-%m-%d')
+        for event, offsets in self.index['tickers'].get(ticker, {}).get('events', {}).items():
+            recent = []
+            for offset in reversed(offsets):
+                record = self._read([offset])[0]
+                if record['Date'] < stop:
+                    break
+                if record['Date'] >= start:
+                    recent.append(record)
+            # En orden de escritura: la última línea de cada (fecha, evento) decide si está vigente
+            for record in reversed(recent):
+                key = (record['Date'], event)
+                if record['Cancelled'] == '1':
+                    active.pop(key, None)
+                else:
+                    active[key] = record
+        return active
+
+    def update(self, df, since=None, timestamp=None):
+        """
+        Evalúa las barras nuevas o revisadas de los tickers de 'df' (filas exportadas) y agrega
+        al registro los eventos nuevos y las anulaciones. 'since' es {ticker: primera fecha
+        nueva o revisada}. Devuelve la lista de eventos nuevos (sin la historia inicial).
+        """
+        if df is None or df.empty:
+            return []
+        logged_at = timestamp or run_timestamp()
+        lines = []
+        alerts = []
+        backfilled = 0
+        for ticker, rows in df.groupby(df['Ticker'].astype(str), sort=False):
+            dates = pd.to_datetime(rows['Date'])
+            order = np.argsort(dates.to_numpy(), kind='stable')
+            rows, dates = rows.iloc[order], dates.iloc[order]
+            entry = self.index['tickers'].get(ticker)
+            last_date = entry.get('last_date') if entry else None
+            if last_date is None:
+                start = dates.iloc[0]
+            else:
+                start = pd.Timestamp(last_date)
+                if since and ticker in since:
+                    start = min(start, pd.Timestamp(since[ticker]))
+            first = int(np.searchsorted(dates.to_numpy(), start.to_datetime64(), side='left'))
+            # La barra anterior a 'start' aporta el estado previo
+            window = rows.iloc[max(first - 1, 0):]
+            start_key = start.strftime('%Y-%m-%d')
+            fresh = {(date.strftime('%Y-%m-%d'), event): (close, value)
+                     for date, event, close, value in detect_events(window)
+                     if date >= start}
+            active = self._active(ticker, start_key) if last_date is not None else {}
+
+            for key in sorted(active.keys() - fresh.keys()):
+                record = active[key]
+                lines.append([key[0], ticker, key[1], record['Close'], record['Value'], 1, logged_at])
+                print(f"SEÑAL: {ticker} {key[1]} del {key[0]} anulada (cierre revisado)")
+            for key in sorted(fresh.keys() - active.keys()):
+                close, value = fresh[key]
+                lines.append([key[0], ticker, key[1], round(close, 4), round(value, 4), 0, logged_at])
+                if last_date is None:
+                    backfilled += 1
+                else:
+                    alerts.append((ticker, key[1], key[0], float(close), float(value)))
+            self.index['tickers'].setdefault(ticker, {'last_date': None, 'events': {}})['last_date'] = \
+                dates.iloc[-1].strftime('%Y-%m-%d')
+
+        if lines:
+            self._append(lines)
+        self._save_index()
+        for ticker, event, date, close, value in alerts:
+            print(f"SEÑAL: {ticker} {event} el {date} (cierre {close:.2f}, valor {value:.2f})")
+            METRICS.inc('signal_events', event=event)
+        if backfilled:
+            print(f"SEÑAL: {backfilled} eventos históricos registrados para tickers nuevos")
+        return alerts
+
+    def _append(self, lines):
+        """Agrega las líneas al registro y sus desplazamientos al índice."""
+        new_file = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        with open(self.path, 'ab') as f:
+            if new_file:
+                f.write((",".join(EVENT_COLUMNS) + "\n").encode('utf-8'))
+            for line in lines:
+                offset = f.tell()
+                f.write(_csv_line(line))
+                self._add(line[1], line[2], offset)
+            self.index['size'] = f.tell()
+
+    # --- Consulta ---
+
+    def query(self, ticker=None, event=None, start=None, end=None, include_cancelled=False):
+        """
+        Eventos por ticker y/o tipo (None = todos) en [start, end], leyendo solo las líneas del
+        índice. Sin include_cancelled solo devuelve los eventos vigentes (sin las anulaciones).
+        """
+        tickers = [ticker] if ticker is not None else list(self.index['tickers'])
+        offsets = []
+        for t in tickers:
+            events = self.index['tickers'].get(t, {}).get('events', {})
+            for e in ([event] if event is not None else list(events)):
+                offsets += events.get(e, [])
+        records = self._read(sorted(offsets)) if offsets else []
+        df = pd.DataFrame(records, columns=EVENT_COLUMNS)
+        if not include_cancelled and len(df):
+            # Descartar anulaciones y los eventos que anulan (última línea de cada fecha/tipo)
+            last = df.drop_duplicates(['Ticker', 'Date', 'Event'], keep='last')
+            df = last[last['Cancelled'] == '0']
+        df = cast_columns(df.astype({'Close': float, 'Value': float, 'Cancelled': int}))
+        if start is not None:
+            df = df[df['Date'] >= pd.Timestamp(start)]
+        if end is not None:
+            df = df[df['Date'] <= pd.Timestamp(end)]
+        return df.sort_values(['Date', 'Ticker'], kind='stable').reset_index(drop=True)
+
+
+def _csv_line(values):
+    return (",".join("" if v is None or (isinstance(v, float) and np.isnan(v)) else str(v)
+                     for v in values) + "\n").encode('utf-8')
@@ -0,0 +1,135 @@
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from .data_providers import MarketDataProvider, OHLCV_COLUMNS
+
+# Fecha de origen del calendario sintético: todas las series se generan desde aquí para que
+# una misma fecha tenga siempre el mismo precio, sin importar el rango solicitado
+SYNTHETIC_ORIGIN = "2000-01-03"
+
+
+def _ticker_seed(seed, ticker):
+    """Semilla estable por ticker (no depende del orden ni de PYTHONHASHSEED)."""
+    return (seed * 1_000_003 + zlib.crc32(ticker.encode('utf-8'))) % (2 ** 32)
+
+
+def _is_crypto(ticker):
+    return ticker.upper().endswith("-USD")
+
+
+def generate_ohlcv(ticker, start=None, end=None, seed=42, gap_ratio=0.0, origin=SYNTHETIC_ORIGIN):
+    """
+    Genera barras diarias OHLCV sintéticas (paseo aleatorio log-normal) para un ticker.
+
+    - Reproducible: la serie depende solo de (seed, ticker, origin).
+    - Calendario de días hábiles para acciones y de 7 días para cripto (tickers '-USD').
+    - 'gap_ratio' elimina esa fracción de barras (huecos de datos, siempre las mismas fechas).
+    - 'start' inclusive y 'end' exclusivo (None = hoy), como MarketDataProvider.fetch().
+    """
+    end_ts = pd.Timestamp(end) if end is not None else pd.Timestamp.today().normalize() + pd.Timedelta(days=1)
+    # Calendario con NumPy (pd.date_range con freq='B' es lento para décadas de historia)
+    days = np.arange(np.datetime64(origin, 'D'), np.datetime64(end_ts.date(), 'D'))
+    if not _is_crypto(ticker):
+        days = days[np.is_busday(days)]
+    dates = pd.DatetimeIndex(days.astype('datetime64[ns]'), name='Date')
+    n = len(dates)
+    if n == 0:
+        return pd.DataFrame(columns=OHLCV_COLUMNS, index=pd.DatetimeIndex([], name='Date'))
+
+    rng = np.random.default_rng(_ticker_seed(seed, ticker))
+    vol = 0.035 if _is_crypto(ticker) else 0.018
+    base = rng.uniform(20, 500)
+    close = base * np.exp(np.cumsum(rng.normal(0.0003, vol, size=n)))
+    spread = np.abs(rng.normal(0, vol / 2, size=n))
+    df = pd.DataFrame({
+        'Open': close * (1 + rng.normal(0, vol / 4, size=n)),
+        'High': close * (1 + spread),
+        'Low': close * (1 - spread),
+        'Close': close,
+        'Volume': rng.integers(100_000, 50_000_000, size=n).astype(float),
+    }, index=dates)
+    df['High'] = df[['Open', 'High', 'Close']].max(axis=1)
+    df['Low'] = df[['Open', 'Low', 'Close']].min(axis=1)
+
+    if gap_ratio > 0:
+        keep = rng.random(n) >= gap_ratio
+        keep[-1] = True  # La última barra siempre existe (el ticker sigue "vivo")
+        df = df[keep]
+    if start is not None:
+        df = df[df.index >= pd.Timestamp(start)]
+    return df
+
+
+def synthetic_wide_frame(n_tickers, n_days, seed=42):
+    """Genera un DataFrame ancho (ticker, campo) como el de yf.download(group_by='ticker')."""
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=n_days, name='Date')
+    tickers = [f"SYN{i:05d}" for i in range(n_tickers)]
+
+    returns = rng.normal(0.0003, 0.02, size=(n_days, n_tickers))
+    close = 100 * np.exp(np.cumsum(returns, axis=0))
+    spread = np.abs(rng.normal(0, 0.01, size=(n_days, n_tickers)))
+    fields = {
+        'Open': close * (1 + rng.normal(0, 0.005, size=(n_days, n_tickers))),
+        'High': close * (1 + spread),
+        'Low': close * (1 - spread),
+        'Close': close,
+        'Volume': rng.integers(1_000_000, 50_000_000, size=(n_days, n_tickers)).astype(float),
+    }
+    columns = pd.MultiIndex.from_product([tickers, list(fields)], names=['Ticker', 'Price'])
+    values = np.stack([fields[f] for f in fields], axis=2).reshape(n_days, -1)
+    return tickers, pd.DataFrame(values, index=dates, columns=columns)
+
+
+def synthetic_tickers(n_tickers, crypto_ratio=0.0):
+    """Lista de tickers sintéticos (una fracción puede ser cripto, calendario de 7 días)."""
+    n_crypto = int(round(n_tickers * crypto_ratio))
+    stocks = [f"SYN{i:05d}" for i in range(n_tickers - n_crypto)]
+    crypto = [f"SYC{i:04d}-USD" for i in range(n_crypto)]
+    return stocks + crypto
+
+
+class SyntheticDataProvider(MarketDataProvider):
+    """
+    Proveedor fuera de línea con datos sintéticos reproducibles (benchmarks y pruebas).
+    Sustituye a YahooFinanceProvider sin tocar el resto del pipeline.
+
+    - 'gap_ratio': fracción de barras faltantes por ticker.
+    - 'missing_ratio': fracción de tickers que el proveedor "no encuentra" (sin datos).
+    - 'latency_seconds': espera simulada por llamada (latencia de red).
+    """
+    name = "synthetic"
+
+    def __init__(self, seed=42, gap_ratio=0.0, missing_ratio=0.0, latency_seconds=0.0,
+                 origin=SYNTHETIC_ORIGIN):
+        self.seed = seed
+        self.gap_ratio = gap_ratio
+        self.missing_ratio = missing_ratio
+        self.latency_seconds = latency_seconds
+        self.origin = origin
+        self.calls = 0
+
+    def _is_missing(self, ticker):
+        if self.missing_ratio <= 0:
+            return False
+        return np.random.default_rng(_ticker_seed(self.seed + 1, ticker)).random() < self.missing_ratio
+
+    def fetch(self, tickers, start, end=None, interval="1d"):
+        if interval != "1d":
+            raise ValueError(f"SyntheticDataProvider solo genera barras diarias (interval='{interval}')")
+        self.calls += 1
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+
+        frames = {}
+        for ticker in tickers:
+            if self._is_missing(ticker):
+                continue
+            df = generate_ohlcv(ticker, start, end, seed=self.seed, gap_ratio=self.gap_ratio,
+                                origin=self.origin)
+            if not df.empty:
+                frames[ticker] = df
+        return frames
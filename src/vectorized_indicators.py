@@ -0,0 +1,172 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+OHLCV_FIELDS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+
+def wide_to_long(data, tickers=None):
+    """
+    Convierte el DataFrame ancho de yf.download(group_by='ticker') (columnas ticker/campo)
+    a formato largo (una fila por ticker y fecha) con un solo reshape de NumPy, sin copias
+    por ticker. Las filas con algún campo OHLCV vacío se descartan (equivale al dropna por ticker).
+    """
+    if not isinstance(data.columns, pd.MultiIndex):
+        raise ValueError("Se esperaba un DataFrame con columnas (ticker, campo)")
+
+    available = data.columns.get_level_values(0).unique()
+    order = [t for t in (tickers if tickers is not None else sorted(available)) if t in available]
+    fields = [f for f in OHLCV_FIELDS if f in data.columns.get_level_values(1)]
+    data = data.reindex(columns=pd.MultiIndex.from_product([order, fields]))
+
+    n_days, n_tickers = len(data.index), len(order)
+    # (fecha, ticker, campo) -> (ticker, fecha, campo): el resultado ya queda ordenado por ticker
+    values = data.to_numpy(dtype=float).reshape(n_days, n_tickers, len(fields)).transpose(1, 0, 2)
+    long_df = pd.DataFrame(values.reshape(-1, len(fields)), columns=fields)
+    long_df.insert(0, 'Date', np.tile(pd.DatetimeIndex(data.index).tz_localize(None).to_numpy(), n_tickers))
+    long_df.insert(1, 'Ticker', pd.Categorical.from_codes(
+        np.repeat(np.arange(n_tickers), n_days), categories=order))
+    return long_df.dropna().reset_index(drop=True)
+
+
+def frames_to_long(frames, tickers=None):
+    """Convierte {ticker: DataFrame OHLCV} en un único DataFrame largo ordenado."""
+    long_df = pd.concat(frames, names=['Ticker', 'Date']).dropna().reset_index()
+    return sort_long(long_df, tickers)
+
+
+def sort_long(long_df, tickers=None):
+    """Ordena por ticker (en el orden dado) y fecha; el ticker queda como categoría."""
+    categories = list(tickers) if tickers is not None else sorted(long_df['Ticker'].unique())
+    long_df['Ticker'] = pd.Categorical(long_df['Ticker'], categories=categories)
+    long_df = long_df.dropna(subset=['Ticker'])
+    return long_df.sort_values(['Ticker', 'Date'], kind='stable').reset_index(drop=True)
+
+
+def group_layout(codes):
+    """
+    Para códigos de grupo ordenados devuelve (fila, posición, forma): la fila y la posición
+    dentro del grupo ubican cada registro en una matriz 2-D (ticker x barra).
+    """
+    n = len(codes)
+    if n == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, (0, 0)
+    is_start = np.r_[True, codes[1:] != codes[:-1]]
+    starts = np.flatnonzero(is_start)
+    lengths = np.diff(np.r_[starts, n])
+    rows = np.cumsum(is_start) - 1
+    pos = np.arange(n) - np.repeat(starts, lengths)
+    return rows, pos, (len(starts), int(lengths.max()))
+
+
+def to_matrix(values, rows, pos, shape):
+    """Distribuye un vector largo en una matriz (ticker x barra) rellena con NaN."""
+    matrix = np.full(shape, np.nan)
+    matrix[rows, pos] = values
+    return matrix
+
+
+def rolling_sums(matrix):
+    """
+    Sumas acumuladas por filas de los valores, de los NaN y de los valores no nulos.
+    Se calculan una vez y sirven para medias móviles de cualquier ventana (window_mean).
+    """
+    n_rows = matrix.shape[0]
+    isnan = np.isnan(matrix)
+    filled = np.where(isnan, 0.0, matrix)
+    zeros = np.zeros((n_rows, 1))
+    cs = np.hstack([zeros, np.cumsum(filled, axis=1)])
+    nan_cs = np.hstack([zeros, np.cumsum(isnan, axis=1)])
+    nonzero_cs = np.hstack([zeros, np.cumsum(filled != 0, axis=1)])
+    return cs, nan_cs, nonzero_cs
+
+
+def window_mean(sums, window):
+    """
+    Media móvil a partir de rolling_sums() (O(n) independiente de la ventana).
+    NaN si la ventana no está completa o contiene NaN; 0 exacto si todos los valores son 0.
+    """
+    cs, nan_cs, nonzero_cs = sums
+    n_rows, n_cols = cs.shape[0], cs.shape[1] - 1
+    out = np.full((n_rows, n_cols), np.nan)
+    if n_cols < window:
+        return out
+
+    total = cs[:, window:] - cs[:, :-window]
+    nans = nan_cs[:, window:] - nan_cs[:, :-window]
+    nonzero = nonzero_cs[:, window:] - nonzero_cs[:, :-window]
+    means = np.where(nonzero == 0, 0.0, total / window)
+    out[:, window - 1:] = np.where(nans == 0, means, np.nan)
+    return out
+
+
+def rolling_mean_2d(matrix, window):
+    """Media móvil por filas (ver window_mean)."""
+    if matrix.shape[1] < window:
+        return np.full(matrix.shape, np.nan)
+    return window_mean(rolling_sums(matrix), window)
+
+
+def rolling_std_2d(matrix, window):
+    """Desviación estándar móvil por filas (ddof=1), NaN si la ventana contiene NaN."""
+    out = np.full(matrix.shape, np.nan)
+    if matrix.shape[1] < window:
+        return out
+    windows = sliding_window_view(matrix, window, axis=1)
+    out[:, window - 1:] = np.std(windows, axis=-1, ddof=1)
+    return out
+
+
+def lag_2d(matrix):
+    """Desplaza una barra hacia adelante dentro de cada fila (equivale a shift(1))."""
+    out = np.full(matrix.shape, np.nan)
+    out[:, 1:] = matrix[:, :-1]
+    return out
+
+
+def ewm_2d(matrix, alpha, min_periods=0):
+    """
+    Media móvil exponencial por filas, equivalente a ewm(alpha=..., adjust=False).mean() de
+    pandas: recorre las barras una vez con operaciones vectorizadas sobre todos los tickers.
+    Los NaN no actualizan la media; 'min_periods' cuenta observaciones válidas.
+    """
+    n_rows, n_cols = matrix.shape
+    out = np.full(matrix.shape, np.nan)
+    if n_cols == 0:
+        return out
+    valid = ~np.isnan(matrix)
+    prev = np.full(n_rows, np.nan)
+    for j in range(n_cols):
+        x = matrix[:, j]
+        updated = np.where(np.isnan(prev), x, prev + alpha * (x - prev))
+        prev = np.where(valid[:, j], updated, prev)
+        out[:, j] = np.where(valid[:, j], prev, np.nan)
+    if min_periods > 1:
+        out[np.cumsum(valid, axis=1) < min_periods] = np.nan
+    return out
+
+
+def compute_indicators_vectorized(long_df, columns=None):
+    """
+    Calcula los indicadores pedidos ('columns'; por defecto los del esquema de exportación)
+    para todos los tickers a la vez con el grafo de indicator_registry. 'long_df' debe venir
+    ordenado por (Ticker, Date) (ver wide_to_long / frames_to_long).
+    Devuelve el mismo DataFrame con las columnas añadidas.
+    """
+    from .indicator_registry import REGISTRY, export_indicators
+
+    rows, pos, shape = group_layout(long_df['Ticker'].cat.codes.to_numpy())
+    if shape[0] == 0:
+        return long_df
+    columns = list(columns) if columns is not None else export_indicators()
+
+    # Ubicar cada fila en la matriz (ticker x barra) y calcular todo en 2-D
+    base = {field: to_matrix(long_df[field].to_numpy(dtype=float), rows, pos, shape)
+            for field in REGISTRY.required_inputs(columns)}
+    results = REGISTRY.compute(base, columns)
+
+    # Volver de la matriz al formato largo
+    for name in columns:
+        long_df[name] = REGISTRY.to_column(name, results[name][rows, pos])
+    return long_df
@@ -0,0 +1,181 @@
+import tkinter as tk
+from tkinter import ttk
+
+import numpy as np
+
+
+def _format_float(fmt):
+    def formatter(values):
+        return ["" if v != v else fmt.format(v) for v in values]  # v != v -> NaN
+    return formatter
+
+
+def _format_date(values):
+    return list(np.datetime_as_string(values.astype('datetime64[D]'), unit='D'))
+
+
+def _format_text(values):
+    return [str(v) for v in values]
+
+
+# Formatos predefinidos por columna (el resto se muestra como texto)
+DEFAULT_FORMATTERS = {
+    'Date': _format_date,
+    'Close': _format_float("{:.2f}"),
+    'Daily_Return_Pct': _format_float("{:.2f}%"),
+    'RSI_14': _format_float("{:.1f}"),
+    'Volatility_Annualized': _format_float("{:.2f}%"),
+}
+
+
+class VirtualTable(tk.Frame):
+    """
+    Tabla con scroll virtual sobre un Treeview: solo existen como widgets las filas visibles.
+    Los datos se guardan como arreglos por columna y cada fila se formatea al mostrarse,
+    así se puede navegar el historial filtrado completo (100k+ filas) sin bloquear la UI.
+    El orden por columna (clic en el encabezado) usa un argsort calculado una vez por columna.
+    """
+    def __init__(self, parent, columns, formatters=None, row_height=25, bg=None):
+        super().__init__(parent, bg=bg)
+        self.columns = list(columns)
+        self.formatters = dict(DEFAULT_FORMATTERS, **(formatters or {}))
+        self.row_height = row_height
+
+        self.arrays = {c: np.empty(0) for c in self.columns}
+        self.n_rows = 0
+        self.order = np.empty(0, dtype=np.int64)
+        self._sort_cache = {}
+        self.sort_column = None
+        self.sort_descending = False
+        self.offset = 0
+        self.visible = 0
+
+        self.tree = ttk.Treeview(self, columns=self.columns, show="headings", height=1)
+        for col in self.columns:
+            self.tree.heading(col, text=col, command=lambda c=col: self.sort_by(c))
+            self.tree.column(col, width=120, anchor="center")
+
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self._on_scrollbar)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.tree.bind("<Configure>", self._on_resize)
+        self.tree.bind("<MouseWheel>", self._on_wheel)        # Windows / macOS
+        self.tree.bind("<Button-4>", lambda e: self.scroll(-3))  # Linux
+        self.tree.bind("<Button-5>", lambda e: self.scroll(3))
+        for key, delta in (("<Up>", -1), ("<Down>", 1), ("<Prior>", "page-"), ("<Next>", "page+")):
+            self.tree.bind(key, lambda e, d=delta: self._on_key(d))
+
+    # --- Datos ---
+
+    def set_data(self, df, sort_by=None, descending=None):
+        """Carga un DataFrame (solo se extraen arreglos de columnas, sin iterar filas)."""
+        self.arrays = {c: df[c].to_numpy() for c in self.columns if c in df.columns}
+        self.n_rows = len(df)
+        self._sort_cache = {}
+        if sort_by is not None:
+            self.sort_column = sort_by
+        if descending is not None:
+            self.sort_descending = descending
+        self._apply_sort()
+
+    def _sort_indices(self, column):
+        """argsort estable de una columna, calculado una sola vez por conjunto de datos."""
+        if column not in self._sort_cache:
+            values = self.arrays[column]
+            if values.dtype == object:
+                values = values.astype(str)
+            self._sort_cache[column] = np.argsort(values, kind='stable')
+        return self._sort_cache[column]
+
+    def _apply_sort(self):
+        if self.sort_column in self.arrays:
+            order = self._sort_indices(self.sort_column)
+            self.order = order[::-1] if self.sort_descending else order
+        else:
+            self.order = np.arange(self.n_rows)
+        self.offset = 0
+        self._render()
+
+    def sort_by(self, column):
+        """Clic en encabezado: ordena por la columna (un segundo clic invierte el orden)."""
+        if self.sort_column == column:
+            self.sort_descending = not self.sort_descending
+        else:
+            self.sort_column = column
+            self.sort_descending = False
+        for col in self.columns:
+            arrow = (" ▼" if self.sort_descending else " ▲") if col == column else ""
+            self.tree.heading(col, text=col + arrow)
+        self._apply_sort()
+
+    # --- Scroll ---
+
+    def _max_offset(self):
+        return max(0, self.n_rows - self.visible)
+
+    def scroll(self, rows):
+        self.offset = min(max(0, self.offset + rows), self._max_offset())
+        self._render()
+
+    def _on_scrollbar(self, action, value, unit=None):
+        if action == "moveto":
+            self.offset = int(round(float(value) * self.n_rows))
+            self.offset = min(max(0, self.offset), self._max_offset())
+            self._render()
+        elif action == "scroll":
+            step = self.visible if unit == "pages" else 1
+            self.scroll(int(value) * step)
+
+    def _on_wheel(self, event):
+        self.scroll(-3 if event.delta > 0 else 3)
+
+    def _on_key(self, delta):
+        if delta == "page-":
+            self.scroll(-self.visible)
+        elif delta == "page+":
+            self.scroll(self.visible)
+        else:
+            self.scroll(delta)
+        return "break"
+
+    def _on_resize(self, event):
+        # Cabecera aprox. una fila; el resto son filas visibles
+        visible = max(1, int(event.height // self.row_height) - 1)
+        if visible != self.visible:
+            self.visible = visible
+            self.tree.configure(height=visible)
+            self.offset = min(self.offset, self._max_offset())
+            self._render()
+
+    # --- Dibujo ---
+
+    def _render(self):
+        """Actualiza solo las filas visibles reutilizando los mismos items del Treeview."""
+        items = self.tree.get_children()
+        needed = min(self.visible, max(0, self.n_rows - self.offset))
+
+        # Ajustar la cantidad de items (solo cambia al redimensionar o con pocos datos)
+        for iid in items[needed:]:
+            self.tree.delete(iid)
+        for i in range(len(items), needed):
+            self.tree.insert("", "end", iid=f"row{i}")
+
+        if needed:
+            rows = self.order[self.offset:self.offset + needed]
+            formatted = []
+            for col in self.columns:
+                values = self.arrays.get(col)
+                if values is None:
+                    formatted.append([""] * needed)
+                else:
+                    formatted.append(self.formatters.get(col, _format_text)(values[rows]))
+            for i, row_values in enumerate(zip(*formatted)):
+                self.tree.item(f"row{i}", values=row_values)
+
+        if self.n_rows:
+            first = self.offset / self.n_rows
+            last = min(1.0, (self.offset + max(needed, 1)) / self.n_rows)
+        else:
+            first, last = 0.0, 1.0
+        self.scrollbar.set(first, last)